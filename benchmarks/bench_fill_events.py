@@ -0,0 +1,91 @@
+"""
+成交事件分配基准
+开启实时持久化时连续买入成交同一证券，对比事件数据使用浅拷贝快照与原有深拷贝的每笔成交耗时及内存分配
+运行：python -m benchmarks.bench_fill_events [成交笔数]（需要Python 3.9以上）
+"""
+import sys
+import copy
+import tracemalloc
+from time import perf_counter
+
+from paper_trading.utility.model import Order
+from paper_trading.utility.constant import LoadDataMode
+from paper_trading.trade.account import Trader
+
+
+class EventSink:
+    """保留推送的事件数据，deep为True时模拟原有的深拷贝"""
+
+    def __init__(self, deep: bool):
+        self.deep = deep
+        self.events = []
+
+    def put(self, event):
+        self.events.append(copy.deepcopy(event.data) if self.deep else event.data)
+
+
+def make_trader(sink):
+    account = {
+        "account_id": "token",
+        "assets": 1e12,
+        "available": 1e12,
+        "market_value": 0.0,
+        "capital": 1e12,
+        "cost": 0.0003,
+        "tax": 0.001,
+        "slippoint": 0.0,
+        "account_info": "",
+    }
+    return Trader(sink, account, True, LoadDataMode.CREAT, None)
+
+
+def make_orders(trader, n: int):
+    """生成已到达的买入订单"""
+    orders = []
+    for _ in range(n):
+        order = Order(code="000001", exchange="SZSE", account_id="token", order_type="buy", trade_type="t0", order_price=10.0, volume=100)
+        _, order = trader.on_orders_arrived(order)
+        order.trade_price = 10.0
+        order.traded = 100
+        orders.append(order)
+    return orders
+
+
+def measure(deep: bool, n: int):
+    """每笔成交的耗时（微秒）、推送的事件数及成交过程中的内存峰值增量（字节）"""
+    sink = EventSink(deep)
+    trader = make_trader(sink)
+    orders = make_orders(trader, n)
+    sink.events.clear()
+
+    start = perf_counter()
+    for order in orders:
+        trader.on_order_deal(order)
+    elapsed = perf_counter() - start
+    events = len(sink.events) / n
+
+    # 事件数据交给持久化后释放，只统计单笔成交过程中临时分配的峰值
+    trader = make_trader(sink)
+    orders = make_orders(trader, n)
+    tracemalloc.start()
+    peak = 0
+    for order in orders:
+        sink.events.clear()
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        trader.on_order_deal(order)
+        peak += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+
+    return elapsed / n * 1e6, events, peak / n
+
+
+def main(n: int = 20000):
+    print(f"成交笔数：{n}")
+    for name, deep in (("深拷贝", True), ("浅拷贝快照", False)):
+        us, events, peak = measure(deep, n)
+        print(f"{name}：{us:.1f} us/笔，{events:.1f} 事件/笔，峰值 {peak:.0f} B/笔")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,69 @@
+"""
+订单对象内存占用基准
+模拟从数据库加载历史订单，对比使用__slots__及字符串共用的Order与普通对象的每单内存占用
+运行：python -m benchmarks.bench_order_memory [订单数]
+"""
+import sys
+import tracemalloc
+
+from paper_trading.trade.account import order_generate
+
+SYMBOLS = 500
+
+
+def make_docs(n: int):
+    """生成数据库中的订单文档，每个字段都是独立的字符串对象，与pymongo解码结果一致"""
+    docs = []
+    for i in range(n):
+        docs.append(
+            {
+                "code": "".join(f"{i % SYMBOLS:06d}"),
+                "exchange": "".join(["SZ", "SE"]),
+                "account_id": "".join(["a" * 19, "1"]),
+                "order_id": f"{1600000000 + i}.{i % 1000000:06d}",
+                "order_type": "".join(["b", "uy"]),
+                "price_type": "".join(["li", "mit"]),
+                "trade_type": "".join(["t", "1"]),
+                "order_price": 10.0 + i % 100 / 100,
+                "trade_price": 10.0 + i % 100 / 100,
+                "volume": 100,
+                "traded": 100,
+                "status": "".join(["全部", "成交"]),
+                "order_date": "".join(["2020", "0102"]),
+                "order_time": f"09:{i % 60:02d}:00",
+                "error_msg": None if i % 10 == 0 else "".join([""]),
+            }
+        )
+    return docs
+
+
+class PlainOrder:
+    """未使用__slots__、未共用字符串的订单对象，作为对照"""
+
+    def __init__(self, d: dict):
+        self.__dict__.update(d)
+        self.pt_symbol = f"{d['code']}.{d['exchange']}"
+
+
+def measure(factory, n: int):
+    """加载完成、数据库文档释放后，每个订单占用的字节数"""
+    tracemalloc.start()
+    docs = make_docs(n)
+    orders = [factory(d) for d in docs]
+    del docs
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return size / len(orders)
+
+
+def main(n: int = 100000):
+    plain = measure(PlainOrder, n)
+    slotted = measure(order_generate, n)
+    print(f"订单数：{n}")
+    print(f"普通对象：{plain:.0f} B/单")
+    print(f"Order：{slotted:.0f} B/单（{slotted / plain:.0%}）")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
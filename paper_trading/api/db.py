@@ -1,5 +1,5 @@
 from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, OperationFailure
+from pymongo.errors import ConnectionFailure, OperationFailure, BulkWriteError
 
 from ..utility.model import DBData
 
@@ -60,7 +60,7 @@ class MongoDBService:
             db = self.db_client[pt_db.db_name]
             cl = db[pt_db.db_cl]
             data = pt_db.raw_data["data"]
-            row = data.__dict__
+            row = data.to_dict()
             cl.insert_one(row)
             return True
         except:
@@ -84,12 +84,24 @@ class MongoDBService:
             cl = db[pt_db.db_cl]
             flt = pt_db.raw_data["flt"]
             data = pt_db.raw_data["data"]
-            row = data.__dict__
+            row = data.to_dict()
             cl.replace_one(flt, row, True)
             return True
         except:
             raise OperationFailure("MongoDB数据库replace数据失败")
 
+    def on_bulk_write(self, pt_db: DBData):
+        """数据库批量写入操作，按顺序执行"""
+        try:
+            db = self.db_client[pt_db.db_name]
+            cl = db[pt_db.db_cl]
+            requests = pt_db.raw_data["data"]
+            return cl.bulk_write(requests, ordered=True)
+        except BulkWriteError:
+            raise
+        except:
+            raise OperationFailure("MongoDB数据库批量写入数据失败")
+
     def on_update(self, pt_db: DBData):
         """数据库更新操作"""
         try:
@@ -127,6 +139,43 @@ class MongoDBService:
         except:
             raise OperationFailure("MongoDB数据库分组查询数据失败")
 
+    def on_distinct(self, pt_db: DBData):
+        """查询字段的不同取值"""
+        try:
+            db = self.db_client[pt_db.db_name]
+            cl = db[pt_db.db_cl]
+            flt = pt_db.raw_data["flt"]
+            key = pt_db.raw_data["key"]
+
+            return cl.distinct(key, flt)
+        except:
+            raise OperationFailure("MongoDB数据库查询字段取值失败")
+
+    def on_create_index(self, pt_db: DBData):
+        """创建索引，索引已存在时不重复创建"""
+        try:
+            db = self.db_client[pt_db.db_name]
+            cl = db[pt_db.db_cl]
+            keys = pt_db.raw_data["keys"]
+
+            return cl.create_index(keys, **pt_db.raw_data.get("options", {}))
+        except:
+            raise OperationFailure("MongoDB数据库创建索引失败")
+
+    def on_explain(self, pt_db: DBData):
+        """查询执行计划"""
+        try:
+            db = self.db_client[pt_db.db_name]
+            cl = db[pt_db.db_cl]
+            flt = pt_db.raw_data["flt"]
+            cursor = cl.find(flt)
+            if pt_db.raw_data.get("sort"):
+                cursor = cursor.sort(pt_db.raw_data["sort"])
+
+            return cursor.explain()
+        except:
+            raise OperationFailure("MongoDB数据库查询执行计划失败")
+
     def on_collections_query(self, pt_db: DBData):
         """获取集合列表"""
         try:
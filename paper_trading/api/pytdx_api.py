@@ -1,25 +1,303 @@
 import random
+from time import monotonic
+from datetime import datetime, timedelta
+from threading import Lock
+from concurrent.futures import Future
 
+import numpy as np
 import pandas as pd
 from pytdx.config.hosts import hq_hosts
 from pytdx.hq import TdxHq_API
 from pytdx.pool.hqpool import TdxHqPool_API
 from pytdx.pool.ippool import AvailableIPPool
 
+from .pytdx_async import AsyncTdxQuoteClient, QUOTES_BATCH_SIZE, random_hosts
+from ..utility.setting import SETTINGS
+
 # 市场代码对照表
 exchange_map = {}
 exchange_map["SH"] = 1
 exchange_map["SZ"] = 0
+market_map = {v: k for k, v in exchange_map.items()}
+
+# 通达信行情中的价格字段
+PRICE_COLUMNS = [
+    "price",
+    "last_close",
+    "open",
+    "high",
+    "low",
+    "ask1",
+    "bid1",
+    "ask2",
+    "bid2",
+    "ask3",
+    "bid3",
+    "ask4",
+    "bid4",
+    "ask5",
+    "bid5",
+]
+
+# 通达信行情中的成交量及盘口挂单量字段
+VOLUME_COLUMNS = [
+    "vol",
+    "amount",
+    "ask_vol1",
+    "bid_vol1",
+    "ask_vol2",
+    "bid_vol2",
+    "ask_vol3",
+    "bid_vol3",
+    "ask_vol4",
+    "bid_vol4",
+    "ask_vol5",
+    "bid_vol5",
+]
+
+# 行情快照的数据结构，价格字段在前
+QUOTE_COLUMNS = PRICE_COLUMNS + VOLUME_COLUMNS
+QUOTE_DTYPE = np.dtype([(col, "f8") for col in QUOTE_COLUMNS])
+
+
+class QuoteSnapshot:
+    """
+    行情快照
+    以结构化数组保存多只证券的行情，通过pt_symbol索引到行，撮合及清算无需经过pandas
+    """
+
+    def __init__(self, symbols: list, data: np.ndarray):
+        self.symbols = symbols  # 证券列表
+        self.data = data  # 结构化数组，字段见QUOTE_DTYPE
+        self.index = {symbol: i for i, symbol in enumerate(symbols)}  # pt_symbol: 行号
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self.index
+
+    def get(self, symbol: str):
+        """查询某只证券的行情"""
+        i = self.index.get(symbol)
+        if i is not None:
+            return self.data[i]
+
+    def items(self):
+        """遍历证券及行情"""
+        return zip(self.symbols, self.data)
+
+    def to_df(self):
+        """转换为以pt_symbol为索引的DataFrame"""
+        return pd.DataFrame(self.data, index=self.symbols)
+
+    @classmethod
+    def from_records(cls, records: dict):
+        """由{pt_symbol: 行情}组装快照"""
+        symbols = list(records.keys())
+        data = np.array(list(records.values()), dtype=QUOTE_DTYPE)
+        return cls(symbols, data)
+
+
+def normalize_quotes(df: pd.DataFrame, decimal_points: np.ndarray):
+    """
+    批量规整行情数据
+    通达信基金（价格3位小数）的价格数据是实际价格的10倍，按行生成缩放向量，一次广播完成所有价格字段的处理
+    :param df: 多只证券的行情数据
+    :param decimal_points: 每行证券的价格小数位数
+    :return: 结构化数组，字段见QUOTE_DTYPE
+    """
+    data = np.zeros(len(df), dtype=QUOTE_DTYPE)
+    values = data.view(np.float64).reshape(len(df), len(QUOTE_COLUMNS))
+    values[:] = df[QUOTE_COLUMNS].to_numpy(dtype=np.float64)
+
+    scale = np.where(decimal_points == 3, 0.1, 1.0)
+    values[:, : len(PRICE_COLUMNS)] *= scale[:, np.newaxis]
+
+    return data
+
+
+class SecurityMaster:
+    """
+    证券主数据
+    1、将tasks.stocks.sync_data写入数据库的证券列表加载到内存，按(市场代码, 证券代码)索引；
+    2、同时加载证券列表的同步时间，证券列表为空或长时间未同步时不能据此判断证券不存在
+    """
+
+    def __init__(self):
+        self.securities = dict()  # (市场代码, 证券代码): 证券信息
+        self.loaded = False  # 是否已加载
+        self.synced_at = None  # 证券列表的同步时间
+
+    def __len__(self):
+        return len(self.securities)
+
+    def load(self, client):
+        """从数据库加载证券列表"""
+        securities = dict()
+        for d in client["stocks"]["security"].find({}, {"_id": 0}):
+            securities[(int(d["market"]), d["code"])] = d
+        meta = client["stocks"]["meta"].find_one({"name": "security"})
+
+        # 整体替换，读取方无需加锁
+        self.securities = securities
+        self.synced_at = meta.get("synced_at") if meta else None
+        self.loaded = True
+
+    def is_fresh(self, max_days: float):
+        """证券列表是否不为空且在max_days天内同步过"""
+        if not self.securities or self.synced_at is None:
+            return False
+        return datetime.now() - self.synced_at <= timedelta(days=max_days)
+
+    def get(self, market: int, code: str):
+        """查询证券信息"""
+        return self.securities.get((market, code))
+
+    def get_by_symbol(self, symbol: str):
+        """按pt_symbol查询证券信息"""
+        try:
+            code, exchange = symbol.split(".")
+            return self.get(exchange_map[exchange], code)
+        except (AttributeError, ValueError, KeyError):
+            return None
+
+    def exists(self, symbol: str):
+        """证券是否存在"""
+        return self.get_by_symbol(symbol) is not None
+
+    def decimal_point(self, market: int, code: str):
+        """价格小数位数"""
+        data = self.get(market, code)
+        return data.get("decimal_point", 2) if data else 2
+
+
+# 证券主数据实例，行情服务与web共用
+security_master = SecurityMaster()
+
+
+class QuoteCache:
+    """
+    行情快照缓存
+    1、按pt_symbol缓存行情，有效期内的请求直接使用缓存；
+    2、同一证券的并发请求合并为一次获取，获取失败时等待的请求抛出同一异常；
+    3、超过闲置时间未被请求的证券定期清理；
+    4、统计缓存命中、未命中、合并请求、获取失败及清理的次数
+    """
+
+    def __init__(self, ttl: float, idle: float = None):
+        """
+        :param ttl: 缓存有效期（秒）
+        :param idle: 闲置时间（秒），超过该时间未获取的行情被清理，为空时取有效期的10倍
+        """
+        self.ttl = ttl  # 缓存有效期（秒）
+        self.idle = idle if idle is not None else ttl * 10  # 闲置时间（秒）
+        self.hits = 0  # 命中次数
+        self.misses = 0  # 未命中次数
+        self.coalesced = 0  # 合并请求次数
+        self.errors = 0  # 获取失败次数
+        self.evicted = 0  # 清理的证券数
+
+        self._data = dict()  # pt_symbol: (获取时间, 行情)
+        self._pending = dict()  # pt_symbol: 正在进行的获取，Future结果为{pt_symbol: 行情}
+        self._last_evict = monotonic()  # 上次清理时间
+        self._lock = Lock()
+
+    def get(self, symbols: list, fetch):
+        """
+        获取行情
+        :param symbols: 证券列表
+        :param fetch: 行情获取函数，接收未缓存的证券列表，返回{pt_symbol: 行情}
+        :return: {pt_symbol: 行情}
+        """
+        result = dict()
+        fetching = []
+        waiting = []
+        future = None
+
+        now = monotonic()
+        with self._lock:
+            self._evict(now)
+            for symbol in symbols:
+                cached = self._data.get(symbol)
+                if cached and now - cached[0] < self.ttl:
+                    self.hits += 1
+                    result[symbol] = cached[1]
+                elif symbol in self._pending:
+                    self.coalesced += 1
+                    waiting.append((symbol, self._pending[symbol]))
+                else:
+                    self.misses += 1
+                    if future is None:
+                        future = Future()
+                    self._pending[symbol] = future
+                    fetching.append(symbol)
+
+        if fetching:
+            try:
+                data = fetch(fetching)
+            except BaseException as e:
+                with self._lock:
+                    self.errors += 1
+                    for symbol in fetching:
+                        self._pending.pop(symbol)
+                future.set_exception(e)
+                raise
+
+            with self._lock:
+                for symbol, hq in data.items():
+                    self._data[symbol] = (now, hq)
+                for symbol in fetching:
+                    self._pending.pop(symbol)
+            future.set_result(data)
+            result.update(data)
+
+        # 等待其他请求获取的行情，获取失败时抛出相同的异常
+        for symbol, pending in waiting:
+            data = pending.result()
+            if symbol in data:
+                result[symbol] = data[symbol]
+
+        return result
+
+    def _evict(self, now: float):
+        """清理闲置的行情，每个闲置周期最多执行一次，调用方持有锁"""
+        if now - self._last_evict < self.idle:
+            return
+
+        self._last_evict = now
+        expired = [symbol for symbol, (fetched, _) in self._data.items() if now - fetched >= self.idle]
+        for symbol in expired:
+            del self._data[symbol]
+        self.evicted += len(expired)
+
+    def stats(self):
+        """缓存统计"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "evicted": self.evicted,
+            "size": len(self._data),
+        }
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
 
 
 class PYTDXService:
     """pytdx数据服务类"""
 
-    def __init__(self, client):
+    def __init__(self, client, quote_cache: QuoteCache = None):
         """Constructor"""
         self.connected = False  # 数据服务连接状态
         self.hq_api = None  # 行情API
+        self.async_api = None  # 异步行情API，用于批量获取实时行情
         self.client = client  # mongo client
+        self.quote_cache = quote_cache or QuoteCache(SETTINGS["PERIOD"], SETTINGS["QUOTE_CACHE_IDLE"])  # 行情缓存
 
     def connect_api(self):
         """连接API"""
@@ -38,6 +316,12 @@ class PYTDXService:
                 # 生成hqpool对象，第一个参数为TdxHq_API后者 TdxExHq_API里的一个，第二个参数为ip池对象。
                 self.hq_api = TdxHqPool_API(TdxHq_API, ippool)
                 self.hq_api.connect(primary_ip, hot_backup_ip)
+
+                # 异步行情客户端：多服务器并行获取实时行情
+                if SETTINGS["TDX_ASYNC"]:
+                    hosts = SETTINGS["TDX_ASYNC_HOSTS"] or random_hosts(SETTINGS["TDX_ASYNC_HOST_NUM"])
+                    self.async_api = AsyncTdxQuoteClient(hosts, SETTINGS["TDX_ASYNC_CONNECTIONS"]).start()
+
                 self.connected = True
             return True
         except Exception:
@@ -45,31 +329,42 @@ class PYTDXService:
 
     def get_realtime_data(self, symbol: str):
         """获取股票实时数据"""
+        snapshot = self.get_realtime_quotes([symbol])
+        if not len(snapshot):
+            raise ValueError("股票数据获取失败")
+        return pd.DataFrame(snapshot.data)
+
+    def get_realtime_quotes(self, symbols: list):
+        """
+        批量获取股票实时数据
+        优先使用行情缓存，返回行情快照
+        """
+        records = self.quote_cache.get(symbols, self.fetch_quotes)
+        return QuoteSnapshot.from_records(records)
+
+    def fetch_quotes(self, symbols: list):
+        """
+        从行情服务器获取股票实时数据
+        按pytdx单次请求上限分批获取，返回{pt_symbol: 行情}
+        """
         try:
-            symbols = self.generate_symbols(symbol)
-            df = self.hq_api.to_df(self.hq_api.get_security_quotes(symbols))
-            data = self.client["stocks"]["security"].find_one({"code": symbols[0][1], "market": str(symbols[0][0])})
+            stocks = self.generate_symbols(symbols)
+            if self.async_api:
+                data = self.async_api.get_security_quotes(stocks)
+            else:
+                data = []
+                for i in range(0, len(stocks), QUOTES_BATCH_SIZE):
+                    data.extend(self.hq_api.get_security_quotes(stocks[i : i + QUOTES_BATCH_SIZE]))
+            df = pd.DataFrame(data)
+
             # 处理基金价格：通达信基金数据是实际价格的10倍
-            if data["decimal_point"] == 3:
-                for val in [
-                    "price",
-                    "last_close",
-                    "open",
-                    "high",
-                    "low",
-                    "ask1",
-                    "bid1",
-                    "ask2",
-                    "bid2",
-                    "ask3",
-                    "bid3",
-                    "ask4",
-                    "bid4",
-                    "ask5",
-                    "bid5",
-                ]:
-                    df[val] = df[val] / 10
-            return df
+            if not security_master.loaded:
+                security_master.load(self.client)
+            pairs = list(zip(df["market"], df["code"]))
+            decimal_points = np.array([security_master.decimal_point(market, code) for market, code in pairs])
+            quotes = normalize_quotes(df, decimal_points)
+
+            return {f"{code}.{market_map[market]}": quotes[i] for i, (market, code) in enumerate(pairs)}
         except Exception:
             raise ValueError("股票数据获取失败")
 
@@ -97,11 +392,15 @@ class PYTDXService:
         return df
 
     @staticmethod
-    def generate_symbols(symbol: str):
+    def generate_symbols(symbols):
         """组装symbols数据，pytdx接收的是以市场代码和标的代码组成的元祖的list"""
+        if isinstance(symbols, str):
+            symbols = [symbols]
+
         new_symbols = []
-        code, exchange = symbol.split(".")
-        new_symbols.append((exchange_map[exchange], code))
+        for symbol in symbols:
+            code, exchange = symbol.split(".")
+            new_symbols.append((exchange_map[exchange], code))
 
         return new_symbols
 
@@ -120,3 +419,7 @@ class PYTDXService:
         """数据服务关闭"""
         self.connected = False
         self.hq_api.disconnect()
+
+        if self.async_api:
+            self.async_api.close()
+            self.async_api = None
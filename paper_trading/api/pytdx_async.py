@@ -0,0 +1,216 @@
+import asyncio
+import random
+import struct
+import zlib
+from time import monotonic
+from threading import Thread
+from collections import deque
+
+from pytdx.config.hosts import hq_hosts
+from pytdx.parser.base import RSP_HEADER_LEN
+from pytdx.parser.get_security_quotes import GetSecurityQuotesCmd
+from pytdx.parser.setup_commands import SetupCmd1, SetupCmd2, SetupCmd3
+
+# pytdx单次行情请求最多支持的证券数量
+QUOTES_BATCH_SIZE = 80
+
+# 连接及请求超时时间（秒）
+TIMEOUT = 3
+
+# 延迟样本数量
+LATENCY_SAMPLES = 200
+
+# 没有延迟样本时的补发请求等待时间（秒）
+HEDGE_DELAY = 0.5
+
+# 补发请求的延迟分位数
+HEDGE_QUANTILE = 0.95
+
+
+class TdxConnection:
+    """
+    TDX行情服务器的异步长连接
+    通达信协议为一问一答，同一连接同时只处理一个请求
+    """
+
+    def __init__(self, host: str, port: int, timeout: float = TIMEOUT):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+        self.latency = deque(maxlen=LATENCY_SAMPLES)  # 请求延迟样本
+        self._lock = asyncio.Lock()
+
+    @property
+    def busy(self):
+        """是否有请求正在处理"""
+        return self._lock.locked()
+
+    async def connect(self):
+        """连接服务器并发送初始化命令，连接及初始化整体超时，失败时断开连接"""
+        try:
+            await asyncio.wait_for(self._handshake(), self.timeout)
+        except BaseException:
+            self.close()
+            raise
+
+    async def _handshake(self):
+        """建立连接并发送初始化命令"""
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        for cmd_cls in (SetupCmd1, SetupCmd2, SetupCmd3):
+            cmd = cmd_cls(None)
+            cmd.setup()
+            await self._call(cmd)
+
+    async def _call(self, cmd):
+        """发送请求并解析返回数据"""
+        self.writer.write(bytes(cmd.send_pkg))
+        await self.writer.drain()
+
+        head_buf = await self.reader.readexactly(RSP_HEADER_LEN)
+        _, _, _, zipsize, unzipsize = struct.unpack("<IIIHH", head_buf)
+        body_buf = await self.reader.readexactly(zipsize)
+        if zipsize != unzipsize:
+            body_buf = zlib.decompress(body_buf)
+
+        return cmd.parseResponse(body_buf)
+
+    async def get_security_quotes(self, stocks: list):
+        """获取行情"""
+        async with self._lock:
+            try:
+                if not self.writer:
+                    await self.connect()
+
+                cmd = GetSecurityQuotesCmd(None)
+                cmd.setParams(stocks)
+
+                start = monotonic()
+                data = await asyncio.wait_for(self._call(cmd), self.timeout)
+                self.latency.append(monotonic() - start)
+
+                return data
+            except BaseException:
+                # 请求失败或被取消时连接中的数据已不完整，断开后下次请求重连
+                self.close()
+                raise
+
+    def close(self):
+        """断开连接"""
+        if self.writer:
+            self.writer.close()
+        self.reader = None
+        self.writer = None
+
+
+class AsyncTdxQuoteClient:
+    """
+    异步TDX行情客户端
+    1、与多个行情服务器保持长连接，在独立线程的事件循环中运行；
+    2、证券按批次分片到各连接并行请求；
+    3、请求超过延迟p95仍未返回时，向另一连接补发请求，使用最先返回的结果
+    """
+
+    def __init__(self, hosts: list, connections: int = 1, timeout: float = TIMEOUT):
+        """
+        :param hosts: 行情服务器列表[(ip, port)]
+        :param connections: 每个服务器的连接数
+        :param timeout: 连接及请求超时时间（秒）
+        """
+        self.hosts = hosts
+        self.connections_per_host = connections
+        self.timeout = timeout
+        self.connections = []  # 所有连接
+        self.loop = None  # 事件循环
+        self._thread = None  # 事件循环线程
+
+    def start(self):
+        """启动事件循环并连接所有服务器"""
+        self.loop = asyncio.new_event_loop()
+        self._thread = Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+        self._run(self._connect_all())
+        return self
+
+    def close(self):
+        """关闭所有连接并停止事件循环"""
+        if self.loop:
+            self._run(self._close_all())
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+            self.loop.close()
+            self.loop = None
+
+    def _run(self, coro):
+        """在事件循环中执行协程并等待结果"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    async def _connect_all(self):
+        """连接所有服务器，连接失败的服务器在首次请求时重连"""
+        self.connections = [TdxConnection(host, port, self.timeout) for host, port in self.hosts for _ in range(self.connections_per_host)]
+        await asyncio.gather(*[conn.connect() for conn in self.connections], return_exceptions=True)
+
+    async def _close_all(self):
+        """关闭所有连接"""
+        for conn in self.connections:
+            conn.close()
+
+    def get_security_quotes(self, stocks: list):
+        """获取行情，接口与pytdx一致"""
+        return self._run(self.fetch(stocks))
+
+    async def fetch(self, stocks: list):
+        """分批并行获取行情"""
+        batches = [stocks[i : i + QUOTES_BATCH_SIZE] for i in range(0, len(stocks), QUOTES_BATCH_SIZE)]
+        offset = random.randrange(len(self.connections))
+        results = await asyncio.gather(*[self._hedged(batch, offset + n) for n, batch in enumerate(batches)])
+        return [d for data in results for d in data]
+
+    def hedge_delay(self):
+        """补发请求的等待时间，取所有连接延迟样本的p95"""
+        samples = sorted(t for conn in self.connections for t in conn.latency)
+        if not samples:
+            return HEDGE_DELAY
+        return samples[int(HEDGE_QUANTILE * (len(samples) - 1))]
+
+    def _backup(self, primary: TdxConnection):
+        """选择补发请求的连接，优先选择其他服务器上的空闲连接"""
+        others = [conn for conn in self.connections if conn is not primary]
+        if not others:
+            return primary
+        return min(others, key=lambda conn: (conn.host == primary.host and conn.port == primary.port, conn.busy))
+
+    async def _hedged(self, batch: list, n: int):
+        """获取一批行情，超时或失败时向另一连接补发请求"""
+        primary = self.connections[n % len(self.connections)]
+        tasks = {asyncio.ensure_future(primary.get_security_quotes(batch))}
+
+        done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay())
+        for task in done:
+            if not task.exception():
+                return task.result()
+
+        tasks -= done
+        tasks.add(asyncio.ensure_future(self._backup(primary).get_security_quotes(batch)))
+
+        error = None
+        try:
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if not task.exception():
+                        return task.result()
+                    error = task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        raise ConnectionError("pytdx行情获取失败") from error
+
+
+def random_hosts(n: int):
+    """从pytdx内置的服务器列表中随机选择n个服务器"""
+    hosts = [(v[1], v[2]) for v in hq_hosts]
+    random.shuffle(hosts)
+    return hosts[:n]
@@ -47,6 +47,13 @@ class TushareService:
         except ConnectionError:
             raise Exception("交易日信息获取失败")
 
+    def get_trade_calendar(self, start_date: str, end_date: str):
+        """获取上交所交易日历，返回cal_date及is_open"""
+        try:
+            return self.pro_api.trade_cal(exchange="SSE", start_date=start_date, end_date=end_date, fields="cal_date,is_open")
+        except ConnectionError:
+            raise Exception("交易日历获取失败")
+
     def close(self):
         """数据服务关闭"""
         self.connected = False
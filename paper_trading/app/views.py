@@ -2,6 +2,7 @@ import json
 from flask import Blueprint, request, jsonify, render_template
 
 from ..api.db import MongoDBService
+from ..api.pytdx_api import security_master
 from ..trade.data_center import get_stock_daily_qfq, get_stock_mtime
 from ..trade.account import new_order_generate, cancel_order_generate
 from ..trade.db_model import on_account_exist, on_account_delete, query_account_list, query_orders_by_symbol, query_order_status, query_order_one, query_orders
@@ -39,6 +40,10 @@ def init_blue(app, engine):
     # 连接行情源
     tdx = main_engine.creat_hq_api()
 
+    # 加载证券主数据
+    if not security_master.loaded:
+        security_master.load(db.db_client)
+
     # 连接测试行情数据库
     test_db = MongoDBService(SETTINGS["HQ_MONGO_HOST"], SETTINGS["HQ_MONGO_PORT"])
     test_db.connect_db()
@@ -212,19 +217,45 @@ def orders_query():
         token = request.form["token"]
         start_date = request.form.get("start_date")
         end_date = request.form.get("end_date")
-        if start_date and end_date:
-            flt = {"order_date": {"$gte": start_date, "$lte": end_date}}
-        else:
-            flt = {}
+        symbol = request.form.get("symbol")
+        order_status = request.form.get("order_status")
+
+        # 与原有接口一致，同时指定开始及结束日期时才按日期筛选
+        if not (start_date and end_date):
+            start_date = end_date = None
+
         try:
-            data = query_orders(token, db, flt)
-        except Exception as e:
+            offset = int(request.form.get("offset") or 0)
+            limit = int(request.form.get("limit") or 0)
+        except ValueError:
+            offset = limit = -1
+
+        if offset < 0 or limit < 0:
             status = False
-            data = "查询订单失败"
+            data = "分页参数错误"
+        # 内存中有全部订单时直接从订单流水查询
+        elif account_engine.orders_in_memory(token):
+            status, data = account_engine.query_orders(token, start_date, end_date, symbol, order_status, offset, limit)
+            if not isinstance(data, list):
+                data = []
         else:
-            status = True
+            flt = {}
+            if start_date:
+                flt["order_date"] = {"$gte": start_date, "$lte": end_date}
+            if symbol:
+                flt["pt_symbol"] = symbol
+            if order_status:
+                flt["status"] = order_status
+            try:
+                data = query_orders(token, db, flt) or []
+            except Exception as e:
+                status = False
+                data = "查询订单失败"
+            else:
+                status = True
+                data = data[offset : offset + limit] if limit else data[offset:]
         rps["status"] = status
-        rps["data"] = data or []
+        rps["data"] = data
     else:
         rps["status"] = False
         rps["data"] = "请求参数错误"
@@ -260,7 +291,11 @@ def order_arrived():
         data = request.form["order"]
         data = json.loads(data)
         order = new_order_generate(data)
-        if order:
+        # 证券列表近期同步过时检查证券是否存在，证券列表为空或过期时不拒单，避免拒绝新上市的证券
+        if order and security_master.is_fresh(SETTINGS["SECURITY_MAX_DAYS"]) and not security_master.exists(order.pt_symbol):
+            rps["status"] = False
+            rps["data"] = "证券代码不存在"
+        elif order:
             result, msg = main_engine.on_orders_arrived(order)
             if result:
                 # 将订单送入交易引擎
@@ -289,7 +324,11 @@ def order_cancel():
         if request.form.get("order_id"):
             token = request.form["token"]
             order_id = request.form["order_id"]
-            result, order = query_order_one(token, order_id, db)
+            # 优先从内存中查询，定时持久化模式下数据库中的订单可能尚未写入
+            order = account_engine.query_order(token, order_id)
+            result = bool(order)
+            if not result:
+                result, order = query_order_one(token, order_id, db)
             if not result:
                 rps["status"] = False
                 rps["data"] = "查询订单失败"
@@ -320,7 +359,11 @@ def get_status():
         if request.form.get("order_id"):
             token = request.form["token"]
             order_id = request.form["order_id"]
-            result, order_status = query_order_status(token, order_id, db)
+            order = account_engine.query_order(token, order_id)
+            if order:
+                result, order_status = True, order["status"]
+            else:
+                result, order_status = query_order_status(token, order_id, db)
             if result:
                 rps["data"] = order_status
             else:
@@ -457,7 +500,7 @@ def orders_for_page():
     rps = []
     if request.form.get("token"):
         token = request.form["token"]
-        orders = account_engine.query_orders(token)
+        status, orders = account_engine.query_orders(token)
         if orders:
             if isinstance(orders, list):
                 rps = orders
@@ -515,6 +558,27 @@ def get_pos_record_for_page():
 """stock data"""
 
 
+@blue.route("/security", methods=["POST"])
+def get_security():
+    """查询证券信息"""
+    rps = {}
+    rps["status"] = True
+
+    if request.form.get("symbol"):
+        symbol = request.form["symbol"]
+        data = security_master.get_by_symbol(symbol)
+        if data:
+            rps["data"] = data
+        else:
+            rps["status"] = False
+            rps["data"] = "证券代码不存在"
+    else:
+        rps["status"] = False
+        rps["data"] = "请求参数错误"
+
+    return jsonify(rps)
+
+
 @blue.route("/test_hq_page", methods=["POST"])
 def get_test_hq_for_page():
     """获取测试用k线数据"""
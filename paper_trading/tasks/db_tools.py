@@ -0,0 +1,143 @@
+import logging
+import argparse
+
+from pymongo import InsertOne
+
+from ..api.db import MongoDBService
+from ..utility.setting import SETTINGS
+from ..utility.constant import Status
+from ..trade.db_model import ACCOUNT_DATA_DBS, single_collections, ensure_indexes, make_db_data, query_account_list
+
+# 需要使用索引的查询：名称, 数据库, 条件, 排序
+QUERY_SHAPES = [
+    ("query_order_one", "TRADE_DB", {"order_id": ""}, None),
+    ("query_orders_today", "TRADE_DB", {"order_date": ""}, None),
+    ("/orders日期筛选", "TRADE_DB", {"order_date": {"$gte": "", "$lte": ""}}, None),
+    ("query_orders_by_symbol", "TRADE_DB", {"pt_symbol": ""}, None),
+    ("query_open_orders", "TRADE_DB", {"status": {"$in": [Status.SUBMITTING.value, Status.NOTTRADED.value, Status.PARTTRADED.value]}}, None),
+    ("query_max_order_id", "TRADE_DB", {}, [("order_id", -1)]),
+    ("query_position_one", "POSITION_DB", {"pt_symbol": ""}, None),
+    ("account_record_creat", "ACCOUNT_RECORD", {"check_date": ""}, None),
+    ("pos_record_update", "POS_RECORD", {"pt_symbol": "", "is_clear": 0}, None),
+    ("query_pos_records_not_clear", "POS_RECORD", {"is_clear": 0}, None),
+    ("query_pos_records", "POS_RECORD", {"first_buy_date": {"$gte": ""}}, None),
+]
+
+
+def connect_db(host: str = None, port: int = None):
+    """连接数据库，未指定地址时使用MONGO_HOST、MONGO_PORT设置，设置为空时连接本机默认端口"""
+    host = host or SETTINGS["MONGO_HOST"] or "localhost"
+    port = port or SETTINGS["MONGO_PORT"] or 27017
+    ms = MongoDBService(host, port)
+    ms.connect_db()
+    return ms
+
+
+def plan_stages(plan: dict):
+    """执行计划中的所有阶段"""
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("inputStage", "queryPlan"):
+        yield from plan_stages(plan.get(key))
+    for child in plan.get("inputStages", []):
+        yield from plan_stages(child)
+
+
+def explain_queries(token: str = None, ms=None):
+    """
+    对每种查询执行explain，检查是否仍为全集合扫描
+    :param token: 检查的账户，为空时使用第一个账户
+    :param ms: 数据库实例，为空时按设置连接
+    :return: [(查询名称, 执行计划阶段, 是否全集合扫描)]
+    """
+    ms = ms or connect_db()
+    if not token:
+        accounts = query_account_list(ms)
+        token = accounts[0] if accounts else ""
+
+    result = []
+    for name, db_key, flt, sort in QUERY_SHAPES:
+        db_data = make_db_data(SETTINGS[db_key], token, {"flt": dict(flt), "sort": sort})
+        plan = ms.on_explain(db_data)["queryPlanner"]["winningPlan"]
+        stages = list(plan_stages(plan))
+        result.append((name, stages, "COLLSCAN" in stages))
+    ms.close()
+
+    return result
+
+
+def migrate_to_single(drop: bool = False, batch_size: int = 1000, ms=None):
+    """
+    将按账户分集合的数据迁移为单集合布局
+    1、逐个账户复制各数据库中的集合到实体集合，缺少account_id的数据补充账户编号；
+    2、复制前先删除实体集合中该账户的数据，可重复执行；
+    3、drop为True时复制完成后删除原集合
+    :param ms: 数据库实例，为空时按设置连接
+    :return: 迁移的账户数
+    """
+    ms = ms or connect_db()
+
+    collections = single_collections()
+    tokens = [name for name in ms.db_client[SETTINGS["ACCOUNT_DB"]].list_collection_names() if name not in collections.values()]
+
+    for n, token in enumerate(tokens, 1):
+        for db_key in ACCOUNT_DATA_DBS:
+            db = ms.db_client[SETTINGS[db_key]]
+            target = db[collections[SETTINGS[db_key]]]
+            target.delete_many({"account_id": token})
+
+            batch = []
+            for doc in db[token].find():
+                del doc["_id"]
+                doc.setdefault("account_id", token)
+                batch.append(InsertOne(doc))
+                if len(batch) >= batch_size:
+                    target.bulk_write(batch, ordered=False)
+                    batch = []
+            if batch:
+                target.bulk_write(batch, ordered=False)
+
+            if drop:
+                db[token].drop()
+
+        logging.warning(f"[{n}/{len(tokens)}] 账户{token}迁移完成")
+
+    ensure_indexes(ms, single=True)
+    ms.close()
+
+    return len(tokens)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="数据库维护工具")
+    parser.add_argument("--host", default=None, help="数据库地址，默认使用MONGO_HOST设置或localhost")
+    parser.add_argument("--port", type=int, default=None, help="数据库端口，默认使用MONGO_PORT设置或27017")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate = commands.add_parser("migrate", help="账户数据迁移为单集合布局")
+    migrate.add_argument("--drop", action="store_true", help="迁移完成后删除原有的账户集合")
+
+    indexes = commands.add_parser("indexes", help="按DB_LAYOUT设置创建查询所需的索引")
+    indexes.add_argument("--token", default=None, help="只创建指定账户的索引")
+
+    explain = commands.add_parser("explain", help="检查各查询的执行计划，标记全集合扫描")
+    explain.add_argument("--token", default=None, help="检查的账户，默认为第一个账户")
+
+    args = parser.parse_args()
+    ms = connect_db(args.host, args.port)
+
+    if args.command == "migrate":
+        count = migrate_to_single(args.drop, ms=ms)
+        logging.warning(f"共迁移账户{count}个，请将DB_LAYOUT设置为single")
+    elif args.command == "indexes":
+        count = ensure_indexes(ms, args.token)
+        ms.close()
+        logging.warning(f"共检查索引{count}个")
+    elif args.command == "explain":
+        scans = 0
+        for name, stages, collscan in explain_queries(args.token, ms):
+            scans += collscan
+            print(f"{'COLLSCAN' if collscan else 'OK':<8} {name:<28} {' <- '.join(stages)}")
+        print(f"全集合扫描的查询：{scans}个")
@@ -1,9 +1,12 @@
 import logging
+from datetime import datetime
 
 from pymongo import UpdateOne
 from pytdx.hq import TdxHq_API
 
 from ..api.db import MongoDBService
+from ..api.pytdx_api import security_master
+from ..trade.session import trading_calendar
 from ..utility.setting import SETTINGS
 
 
@@ -30,3 +33,47 @@ def sync_data():
                 n += 1
             if batch_list:
                 collection.bulk_write(batch_list, ordered=False)
+
+    # 记录同步时间，用于判断证券列表是否过期
+    ms.db_client["stocks"]["meta"].update_one({"name": "security"}, {"$set": {"name": "security", "synced_at": datetime.now()}}, upsert=True)
+
+    # 刷新内存中的证券主数据
+    security_master.load(ms.db_client)
+
+    # 同步交易日历
+    try:
+        sync_calendar(ms.db_client)
+    except Exception as e:
+        logging.warning(f"交易日历同步失败：{e}")
+
+
+def sync_calendar(client, years: int = 2):
+    """
+    将上交所交易日历同步到数据库，从今年开始同步years年
+    通达信只有历史K线，无法得到未来的休市日期，交易日历使用tushare的trade_cal
+    """
+    if not SETTINGS["TUSHARE_TOKEN"]:
+        logging.warning("未设置TUSHARE_TOKEN，跳过交易日历同步")
+        return
+
+    # tushare为可选依赖，只在同步交易日历时导入
+    from ..api.tushare_api import TushareService
+
+    api = TushareService()
+    api.connect_api()
+    year = datetime.now().year
+    df = api.get_trade_calendar(f"{year}0101", f"{year + years - 1}1231")
+    api.close()
+
+    collection = client["stocks"]["calendar"]
+    batch_list = [
+        UpdateOne({"date": d}, {"$set": {"date": d, "year": int(d[:4]), "is_open": int(is_open)}}, upsert=True)
+        for d, is_open in zip(df["cal_date"], df["is_open"])
+    ]
+    if batch_list:
+        collection.bulk_write(batch_list, ordered=False)
+        collection.create_index([("year", 1), ("is_open", 1)])
+    logging.warning(f"交易日历同步完成：{len(batch_list)}天")
+
+    # 清空交易日历缓存
+    trading_calendar.clear()
@@ -1,35 +1,80 @@
 import copy
-import time
-import pandas as pd
+from sys import intern
 
 from ..event import Event
+from .record_store import RecordStore
+from .ledger import Ledger, to_fixed, to_output, amount
+from .order_id import OrderIdGenerator
+from .order_journal import OrderJournal
 from ..utility.event import *
 from ..utility.setting import SETTINGS
-from ..trade.db_model import query_position, query_orders, query_orders_today, query_account_record, query_pos_records, query_pos_records_not_clear
+from ..trade.db_model import query_position, query_orders_today, query_open_orders, query_history, query_max_order_id, query_pos_records_not_clear
 from ..utility.constant import Status, OrderType, TradeType, PriceType, LoadDataMode
 from ..utility.model import Account, AccountRecord, Position, PosRecord, Order
 
 
-# 小数点保留位数
-P = SETTINGS["POINT"]
+# 账户记录字段
+ACCOUNT_RECORD_COLUMNS = {
+    "account_id": object,
+    "check_date": object,
+    "assets": "f8",
+    "available": "f8",
+    "market_value": "f8",
+}
+
+# 持仓记录字段
+POS_RECORD_COLUMNS = {
+    "code": object,
+    "exchange": object,
+    "account_id": object,
+    "first_buy_date": object,
+    "last_sell_date": object,
+    "max_vol": "i8",
+    "buy_price_mean": "f8",
+    "sell_price_mean": "f8",
+    "profit": "f8",
+    "is_clear": "i8",
+    "pt_symbol": object,
+}
+
+# 按需加载的历史数据类型及其日期字段
+HISTORY_DATE_FIELDS = {"orders": "order_date", "account_record": "check_date", "pos_record": "first_buy_date"}
+
+# 批量成交时同一数据只推送最新状态的事件，及取得数据键的方法
+BATCH_EVENT_KEYS = {
+    EVENT_ACCOUNT_UPDATE: lambda d: d["token"],
+    EVENT_POS_UPDATE: lambda d: d.pt_symbol,
+    EVENT_POS_RECORD_BUY: lambda d: d["symbol"],
+    EVENT_POS_RECORD_SELL: lambda d: d["symbol"],
+    EVENT_ORDER_UPDATE: lambda d: d.order_id,
+}
 
 
 class Trader:
     """交易员"""
 
-    def __init__(self, event_engine, account_dict: dict, pst_active, load_data_mode, db):
+    def __init__(self, event_engine, account_dict: dict, pst_active, load_data_mode, db, order_id_generator: OrderIdGenerator = None):
         """构造函数"""
         self.event_engine = event_engine  # 事件引擎
         self.__pst_active = pst_active  # 数据持久化开关
+        self.order_id_generator = order_id_generator or OrderIdGenerator()  # 订单编号生成器
         account = account_generate(account_dict)
         self.token = account.account_id
         self.account = account
+        self.ledger = Ledger(account)  # 资金账本
 
         self.pos = dict()  # 持仓数据
         self.orders = dict()  # 订单数据
+        self.order_journal = OrderJournal()  # 订单流水
+        self.full_history = load_data_mode != LoadDataMode.TRADING  # 内存中是否为全部历史数据
+        self.history_pending = load_data_mode == LoadDataMode.BACKTEST  # 历史数据是否尚未全部加载
+        self.history_from = dict.fromkeys(HISTORY_DATE_FIELDS)  # 各类历史数据已加载的起始日期，None为未加载，""为已全部加载
+        self.__db = db  # 数据库实例，用于按需加载历史数据
         self.orders_today = dict()  # 今日订单数据
-        self.account_record = pd.DataFrame()  # 账户记录
-        self.pos_record = pd.DataFrame()  # 持仓记录
+        self.account_record = RecordStore(ACCOUNT_RECORD_COLUMNS, index="check_date")  # 账户记录，按清算日期索引
+        self.pos_record = RecordStore(POS_RECORD_COLUMNS)  # 持仓记录
+        self.open_pos_record = dict()  # 未清仓的持仓记录索引 pt_symbol: 行号
+        self.__batch = None  # 批量成交期间暂存的事件 (事件名, 键): (数据, 是否复制快照)
 
         # 加载数据
         self.__load_data(load_data_mode, db)
@@ -39,20 +84,41 @@ class Trader:
         # 新建模式：不用加载数据
         if load_data_mode == LoadDataMode.CREAT:
             pass
-        # 回测模式：加载所有数据
+        # 回测模式：加载当前持仓、未完成的订单及未清仓的持仓记录，历史数据在首次查询时加载
         elif load_data_mode == LoadDataMode.BACKTEST:
             self.__load_pos(db)
-            self.__load_orders(db)
-            self.__load_account_records(db)
-            self.__load_pos_records(db)
+            self.__load_open_orders(db)
+            self.__load_pos_records_not_clear(db)
+            self.__seed_order_id(db)
+            self.__track_open_orders()
         # 交易模式：加载当前持仓，当日的订单及未清仓的持仓记录
         elif load_data_mode == LoadDataMode.TRADING:
             self.__load_pos(db)
             self.__load_today_orders(db)
             self.__load_pos_records_not_clear(db)
+            self.__seed_order_id(db)
+            self.__track_open_orders()
         else:
             raise ValueError("数据加载模式错误")
 
+    def __seed_order_id(self, db):
+        """以已持久化的最大订单编号作为订单编号生成器的起点"""
+        self.order_id_generator.seed(query_max_order_id(self.token, db))
+
+    def __track_open_orders(self):
+        """
+        按未完成订单重建冻结记录，冻结的资金已包含在持久化的账户数据中，只记录归属的订单
+        市价买入的预留价格不持久化，此类订单的冻结资金在清算时解冻
+        """
+        open_status = [Status.SUBMITTING.value, Status.NOTTRADED.value, Status.PARTTRADED.value]
+        for order in self.orders.values():
+            if order.status in open_status:
+                remaining = order.volume - order.traded
+                if order.order_type == OrderType.BUY.value:
+                    self.ledger.track_order(order.order_id, self.ledger.buy_need(remaining, order.order_price), remaining)
+                else:
+                    self.ledger.freeze_shares(order.pt_symbol, remaining)
+
     def __load_pos(self, db):
         """加载持仓"""
         data = query_position(self.token, db)
@@ -61,13 +127,14 @@ class Trader:
                 pos = pos_generate(d)
                 self.pos[pos.pt_symbol] = pos
 
-    def __load_orders(self, db):
-        """加载所有订单数据"""
-        data = query_orders(self.token, db)
+    def __load_open_orders(self, db):
+        """加载未完成的订单"""
+        data = query_open_orders(self.token, db)
         if isinstance(data, list):
             for d in data:
                 order = order_generate(d)
                 self.orders[order.order_id] = order
+            self.order_journal.extend(self.orders.values())
 
     def __load_today_orders(self, db):
         """加载当日订单"""
@@ -76,58 +143,140 @@ class Trader:
             for d in data:
                 order = order_generate(d)
                 self.orders[order.order_id] = order
+            self.order_journal.extend(self.orders.values())
+
+    def ensure_history(self, start: str = None, kinds: list = None):
+        """
+        回测模式下按查询范围加载历史数据
+        每类数据只读取尚未加载的日期区间[start, 已加载的起始日期)，start为空时加载剩余的全部数据
+        :param start: 查询的开始日期YYYYMMDD
+        :param kinds: 加载的数据类型，为空时加载所有类型
+        """
+        if not self.history_pending:
+            return
+
+        loaders = {"orders": self.__load_history_orders, "account_record": self.__load_history_account_records, "pos_record": self.__load_history_pos_records}
+        for kind in kinds or HISTORY_DATE_FIELDS:
+            loaded_from = self.history_from[kind]
+            if loaded_from == "" or (start and loaded_from is not None and loaded_from <= start):
+                continue
+
+            date_range = {}
+            if start:
+                date_range["$gte"] = start
+            if loaded_from:
+                date_range["$lt"] = loaded_from
+            loaders[kind](self.__db, {HISTORY_DATE_FIELDS[kind]: date_range} if date_range else {})
+            self.history_from[kind] = start or ""
+
+        self.history_pending = any(loaded_from != "" for loaded_from in self.history_from.values())
+
+    def __load_history_orders(self, db, flt: dict):
+        """加载历史订单，历史订单均早于内存中已有的订单，排在前面"""
+        orders = dict()
+        for d in query_history(SETTINGS["TRADE_DB"], self.token, db, flt):
+            if d["order_id"] not in self.orders:
+                order = order_generate(d)
+                orders[order.order_id] = order
+        orders.update(self.orders)
 
-    def __load_account_records(self, db):
-        """加载账户记录"""
-        account_record = query_account_record(self.token, db)
-        if account_record:
-            self.account_record = pd.DataFrame(account_record, index=[i for i in range(len(account_record))])
+        self.orders = orders
+        self.order_journal.clear()
+        self.order_journal.extend(orders.values())
 
-    def __load_pos_records(self, db):
-        """加载所有持仓记录"""
-        pos_record = query_pos_records(self.token, db)
-        if pos_record:
-            self.pos_record = pd.DataFrame(pos_record, index=[i for i in range(len(pos_record))])
+    def __load_history_account_records(self, db, flt: dict):
+        """加载历史账户记录，同一检查日期以登录后生成的记录为准"""
+        account_record = RecordStore(ACCOUNT_RECORD_COLUMNS, index="check_date")
+        account_record.extend(list(query_history(SETTINGS["ACCOUNT_RECORD"], self.token, db, flt)))
+        account_record.extend(self.account_record.to_records())
+
+        self.account_record = account_record
+
+    def __load_history_pos_records(self, db, flt: dict):
+        """加载已清仓的历史持仓记录，与内存中的记录按证券及首次买入日期去重"""
+        keys = set(zip(self.pos_record.column("pt_symbol").tolist(), self.pos_record.column("first_buy_date").tolist()))
+        history = query_history(SETTINGS["POS_RECORD"], self.token, db, dict(flt, is_clear=1))
+        pos_record = RecordStore(POS_RECORD_COLUMNS)
+        pos_record.extend([d for d in history if (d.get("pt_symbol"), d.get("first_buy_date")) not in keys])
+        pos_record.extend(self.pos_record.to_records())
+
+        self.pos_record = pos_record
+        self.__index_open_pos_records()
 
     def __load_pos_records_not_clear(self, db):
         """加载未清仓的持仓记录数据"""
         pos_record = query_pos_records_not_clear(self.token, db)
         if pos_record:
-            self.pos_record = pd.DataFrame(pos_record, index=[i for i in range(len(pos_record))])
-
-    def __make_event(self, event_name, data):
-        """制造事件"""
+            self.pos_record.extend(pos_record)
+            self.__index_open_pos_records()
+
+    def __index_open_pos_records(self):
+        """建立未清仓的持仓记录索引"""
+        self.open_pos_record.clear()
+        for i in self.pos_record.find(is_clear=0).tolist():
+            self.open_pos_record.setdefault(self.pos_record.get(i, "pt_symbol"), i)
+
+    def __make_event(self, event_name, data, snapshot: bool = True):
+        """
+        制造事件
+        模型字段均为不可变类型，推送浅拷贝即为完整快照；字典及不再修改的新建对象直接推送
+        :param snapshot: 是否需要复制快照
+        """
         if self.__pst_active:
-            new_data = copy.deepcopy(data)
-            event = Event(event_name, new_data)
-            self.event_engine.put(event)
+            if self.__batch is not None:
+                key_fn = BATCH_EVENT_KEYS.get(event_name)
+                key = (event_name, key_fn(data) if key_fn else object())
+                # 同一数据的事件移到最后，保证与其他事件的先后顺序
+                self.__batch.pop(key, None)
+                self.__batch[key] = (data, snapshot)
+                return
+
+            self.__put_event(event_name, data, snapshot)
+
+    def __put_event(self, event_name, data, snapshot: bool):
+        """推送事件"""
+        if snapshot and not isinstance(data, dict):
+            data = copy.copy(data)
+        event = Event(event_name, data)
+        self.event_engine.put(event)
+
+    def on_orders_arrived(self, order: Order, reserve_price: float = None):
+        """
+        订单到达
+        :param reserve_price: 市价买入时冻结资金使用的预留价格，如涨停价
+        """
+        # 生成订单ID，冻结资金按订单记录
+        order.order_id = self.order_id_generator.next()
 
-    def on_orders_arrived(self, order: Order):
-        """订单到达"""
         # 接收订单前的验证
         if SETTINGS["VERIFICATION"]:
-            result, msg = self.__on_front_verification(order)
+            result, msg = self.__on_front_verification(order, reserve_price)
             if not result:
                 return result, msg
 
-        # 生成订单ID
-        order.order_id = str(time.time())
-
         # 补充订单信息
         if order.order_price == 0:
             order.price_type = PriceType.MARKET.value
         else:
             order.price_type = PriceType.LIMIT.value
 
-        self.orders[order.order_id] = order
+        # 交易所持有传入的订单并在撮合时修改，账户保存自己的副本
+        own = copy.copy(order)
+        self.orders[own.order_id] = own
+        self.order_journal.record(own)
 
         # 推送订单保存事件
-        self.__make_event(EVENT_ORDER_INSERT, order)
+        self.__make_event(EVENT_ORDER_INSERT, own)
 
         return True, order
 
     def on_order_deal(self, order: Order):
-        """订单成交处理"""
+        """
+        订单成交处理
+        传入的订单属于交易所，复制后由账户持有，之后交易所对原订单的修改不影响账户数据
+        """
+        order = copy.copy(order)
+
         # 买入处理
         if order.order_type == OrderType.BUY.value:
             pos_val_diff = self.__on_position_append(order)
@@ -143,12 +292,33 @@ class Trader:
             order.status = Status.PARTTRADED.value
 
         # 订单更新
-        new_order = copy.copy(order)
-        self.orders[order.order_id] = new_order
+        self.orders[order.order_id] = order
+        self.order_journal.record(order)
 
         # 订单更新事件
         self.__make_event(EVENT_ORDER_UPDATE, order)
 
+    def on_orders_deal(self, orders: list):
+        """
+        订单批量成交处理
+        账户、持仓、持仓记录及订单的更新事件在批量结束后按数据合并推送，每条数据只推送最新状态
+        :return: 成交失败的订单及异常列表
+        """
+        failed = []
+        self.__batch = dict()
+        try:
+            for order in orders:
+                try:
+                    self.on_order_deal(order)
+                except Exception as e:
+                    failed.append((order, e))
+        finally:
+            batch, self.__batch = self.__batch, None
+            for (event_name, _), (data, snapshot) in batch.items():
+                self.__put_event(event_name, data, snapshot)
+
+        return failed
+
     def on_order_cancel(self, order: Order):
         """取消订单"""
         order.status = Status.CANCELLED.value
@@ -159,6 +329,7 @@ class Trader:
         # 更新订单
         self.orders[order.order_id].status = order.status
         self.orders[order.order_id].error_msg = order.error_msg
+        self.order_journal.record(self.orders[order.order_id])
 
         # 推送订单状态修改事件
         self.__make_event(EVENT_ORDER_STATUS_UPDATE, {"token": order.account_id, "id": order.order_id, "status": order.status, "msg": order.error_msg})
@@ -171,63 +342,57 @@ class Trader:
     def on_order_status_update(self, order: Order):
         """更新订单状态信息"""
         self.orders[order.order_id].status = order.status
+        self.order_journal.record(self.orders[order.order_id])
 
         # 推送订单状态修改事件
         self.__make_event(EVENT_ORDER_STATUS_UPDATE, {"token": order.account_id, "id": order.order_id, "status": order.status, "msg": order.error_msg})
 
-    def __on_account_buy(self, order: Order, pos_val_diff):
+    def __on_account_buy(self, order: Order, pos_val_diff: int):
         """买入成交后账户操作"""
-        old_pos_val = self.account.market_value
-        market_value = round((old_pos_val + pos_val_diff), P)
-        frozen_all = self.account.assets - self.account.available - old_pos_val
-        frozen = (order.volume * order.order_price) * (1 + self.account.cost)
-        pay = (order.traded * order.trade_price) * (1 + self.account.cost)
-
-        available = round((self.account.available + frozen - pay), P)
-        frozen_all = frozen_all - frozen
-        assets = round((available + market_value + frozen_all), P)
+        pay = self.ledger.buy_need(order.traded, order.trade_price)
 
-        # 更新账户信息
-        self.account.market_value = market_value
-        self.account.available = available
-        self.account.assets = assets
+        # 更新账户信息，释放成交部分冻结的资金
+        self.ledger.release_order(order.order_id, order.traded)
+        self.ledger.available -= pay
+        self.ledger.market_value += pos_val_diff
+        self.ledger.sync(self.account)
 
         # 推送账户更新事件
-        self.__make_event(EVENT_ACCOUNT_UPDATE, {"token": self.token, "avl": available, "market_value": market_value, "assets": assets})
+        self.__make_event(
+            EVENT_ACCOUNT_UPDATE,
+            {"token": self.token, "avl": self.account.available, "market_value": self.account.market_value, "assets": self.account.assets},
+        )
 
-    def __on_account_sell(self, order: Order, pos_val_diff):
+    def __on_account_sell(self, order: Order, pos_val_diff: int):
         """卖出成交后账户操作"""
-        old_pos_val = self.account.market_value
-        market_value = round((old_pos_val + pos_val_diff), P)
-        frozen = self.account.assets - self.account.available - old_pos_val
-        order_val = order.traded * order.trade_price
-        cost = order_val * self.account.cost
-        tax = order_val * self.account.tax
-        available = round((self.account.available + order_val - cost - tax), P)
-        assets = round((available + market_value + frozen), P)
+        order_val = amount(order.traded, order.trade_price)
+        cost = self.ledger.commission(order_val)
+        tax = self.ledger.stamp_tax(order_val)
 
         # 更新账户信息
-        self.account.market_value = market_value
-        self.account.available = available
-        self.account.assets = assets
+        self.ledger.available += order_val - cost - tax
+        self.ledger.market_value += pos_val_diff
+        self.ledger.unfreeze_shares(order.pt_symbol, order.traded)
+        self.ledger.sync(self.account)
 
         # 推送账户更新事件
-        self.__make_event(EVENT_ACCOUNT_UPDATE, {"token": self.token, "avl": available, "market_value": market_value, "assets": assets})
+        self.__make_event(
+            EVENT_ACCOUNT_UPDATE,
+            {"token": self.token, "avl": self.account.available, "market_value": self.account.market_value, "assets": self.account.assets},
+        )
 
-    def __on_account_assets_update(self, value: float):
+    def __on_account_assets_update(self, value: int):
         """账户资产更新"""
-        assets = self.account.assets + value
-        market_value = self.account.market_value + value
         # 更新账户市值
-        self.account.assets = assets
-        self.account.market_value = market_value
+        self.ledger.market_value += value
+        self.ledger.sync(self.account)
 
         # 推送账户市值变更事件
-        self.__make_event(EVENT_ACCOUNT_ASSETS_UPDATE, {"token": self.token, "market_value": market_value, "assets": assets})
+        self.__make_event(EVENT_ACCOUNT_ASSETS_UPDATE, {"token": self.token, "market_value": self.account.market_value, "assets": self.account.assets})
 
-    def __on_position_insert(self, order: Order, cost: float):
+    def __on_position_insert(self, order: Order, cost: int):
         """持仓增加"""
-        profit = round((cost * -1), P)
+        profit = to_output(-cost)
         available = order.traded
         if order.trade_type == TradeType.T_PLUS1.value:
             available = 0
@@ -244,8 +409,8 @@ class Trader:
             profit=profit,
         )
 
-        self.pos[order.pt_symbol] = copy.copy(pos)
-        pos_val = pos.volume * pos.now_price
+        self.pos[order.pt_symbol] = pos
+        pos_val = amount(pos.volume, pos.now_price)
 
         # 推送持仓新建事件
         self.__make_event(EVENT_POS_INSERT, pos)
@@ -262,53 +427,47 @@ class Trader:
             sell_price_mean=0.0,
             profit=pos.profit,
         )
-        df = pd.DataFrame(pos_record.__dict__, index=[len(self.pos_record)])
-        self.pos_record = self.pos_record.append(df)
+        self.open_pos_record[pos_record.pt_symbol] = self.pos_record.append(pos_record.to_dict())
 
         # 推送持仓记录新建事件
-        self.__make_event(EVENT_POS_RECORD_INSERT, pos_record)
+        self.__make_event(EVENT_POS_RECORD_INSERT, pos_record, snapshot=False)
 
         return pos_val
 
     def __on_position_append(self, order: Order):
         """持仓增长"""
-        cost = order.volume * order.trade_price * self.account.cost
+        cost = self.ledger.commission(amount(order.volume, order.trade_price))
 
         # 有标的持仓
         old_pos = self.pos.get(order.pt_symbol, None)
         if old_pos:
-            old_pos_val = old_pos.volume * old_pos.now_price
+            old_pos_val = amount(old_pos.volume, old_pos.now_price)
             volume = old_pos.volume + order.traded
             now_price = order.trade_price
-            profit = round(((order.trade_price - old_pos.now_price) * old_pos.volume + old_pos.profit - cost), P)
+            profit = to_output(amount(old_pos.volume, order.trade_price) - old_pos_val + to_fixed(old_pos.profit) - cost)
             available = old_pos.available + order.traded
 
             if order.trade_type == TradeType.T_PLUS1.value:
                 available = old_pos.available
 
-            buy_price = round((((old_pos.volume * old_pos.buy_price) + (order.traded * order.trade_price)) / volume), P)
+            buy_price = to_output(round((amount(old_pos.volume, old_pos.buy_price) + amount(order.traded, order.trade_price)) / volume))
 
             # 更新持仓信息
-            new_pos = copy.copy(old_pos)
-            new_pos.volume = volume
-            new_pos.now_price = now_price
-            new_pos.buy_price = buy_price
-            new_pos.available = available
-            new_pos.profit = profit
-            self.pos[order.pt_symbol] = new_pos
-            new_pos_val = volume * now_price
+            old_pos.volume = volume
+            old_pos.now_price = now_price
+            old_pos.buy_price = buy_price
+            old_pos.available = available
+            old_pos.profit = profit
+            new_pos_val = amount(volume, now_price)
             pos_val_diff = new_pos_val - old_pos_val
 
             # 推送持仓更新事件
-            self.__make_event(EVENT_POS_UPDATE, new_pos)
+            self.__make_event(EVENT_POS_UPDATE, old_pos)
 
             # 持仓记录更新
-            index = self.pos_record.loc[(self.pos_record["pt_symbol"] == order.pt_symbol) & (self.pos_record["is_clear"] == 0)].index.tolist()
-            if index:
-                i = index[0]
-                self.pos_record.loc[i, "max_vol"] = volume
-                self.pos_record.loc[i, "buy_price_mean"] = buy_price
-                self.pos_record.loc[i, "profit"] = profit
+            i = self.open_pos_record.get(order.pt_symbol)
+            if i is not None:
+                self.pos_record.set(i, max_vol=volume, buy_price_mean=buy_price, profit=profit)
 
                 # 推送持仓增加记录事件
                 pos_info = {"token": order.account_id, "symbol": order.pt_symbol, "max_vol": volume, "buy_price_mean": buy_price, "profit": profit}
@@ -323,36 +482,32 @@ class Trader:
         """持仓减少"""
         old_pos = self.pos.get(order.pt_symbol)
 
-        old_pos_val = old_pos.volume * old_pos.now_price
+        old_pos_val = amount(old_pos.volume, old_pos.now_price)
 
         volume = old_pos.volume - order.volume
         now_price = order.trade_price
-        cost = order.volume * order.trade_price * self.account.cost
-        tax = order.volume * order.trade_price * self.account.tax
-        profit = round(((order.trade_price - old_pos.now_price) * old_pos.volume + old_pos.profit - cost - tax), P)
+        order_val = amount(order.volume, order.trade_price)
+        cost = self.ledger.commission(order_val)
+        tax = self.ledger.stamp_tax(order_val)
+        profit = to_output(amount(old_pos.volume, order.trade_price) - old_pos_val + to_fixed(old_pos.profit) - cost - tax)
 
         # 更新
-        new_pos = copy.copy(old_pos)
-        new_pos.volume = volume
-        new_pos.now_price = now_price
-        new_pos.profit = profit
-        self.pos[order.pt_symbol] = new_pos
-        new_pos_val = volume * now_price
+        old_pos.volume = volume
+        old_pos.now_price = now_price
+        old_pos.profit = profit
+        new_pos_val = amount(volume, now_price)
         pos_val_diff = new_pos_val - old_pos_val
 
         # 推送持仓更新事件
-        self.__make_event(EVENT_POS_UPDATE, new_pos)
+        self.__make_event(EVENT_POS_UPDATE, old_pos)
 
         # 持仓记录更新
-        index = self.pos_record.loc[(self.pos_record["pt_symbol"] == order.pt_symbol) & (self.pos_record["is_clear"] == 0)].index.tolist()
-        if index:
-            i = index[0]
-            max_vol = int(self.pos_record.loc[i, "max_vol"])
-            sell_price_mean = float(self.pos_record.loc[i, "sell_price_mean"])
+        i = self.open_pos_record.get(order.pt_symbol)
+        if i is not None:
+            max_vol = int(self.pos_record.get(i, "max_vol"))
+            sell_price_mean = float(self.pos_record.get(i, "sell_price_mean"))
             new_sell_price_mean = sell_price_mean + ((order.volume / max_vol) * now_price)
-            self.pos_record.loc[i, "sell_price_mean"] = new_sell_price_mean
-            self.pos_record.loc[i, "last_sell_date"] = order.order_date
-            self.pos_record.loc[i, "profit"] = profit
+            self.pos_record.set(i, sell_price_mean=new_sell_price_mean, last_sell_date=order.order_date, profit=profit)
 
             # 推送持仓记录更新
             pos_info = {
@@ -370,11 +525,8 @@ class Trader:
         """更新持仓价格"""
         volume = pos.volume
         if volume:
-            old_value = pos.volume * pos.now_price
-            new_value = pos.volume * price
-            value_diff = new_value - old_value
-
-            profit = round((price - pos.now_price) * volume + pos.profit, P)
+            value_diff = amount(volume, price) - amount(volume, pos.now_price)
+            profit = to_output(to_fixed(pos.profit) + value_diff)
 
             # 更新持仓价格
             pos.now_price = price
@@ -390,6 +542,7 @@ class Trader:
     def __on_position_frozen_cancel(self, symbol):
         """持仓解除冻结"""
         volume = self.pos[symbol].volume
+        self.ledger.frozen_shares.pop(symbol, None)
         if volume:
             # 更新
             self.pos[symbol].available = volume
@@ -404,9 +557,9 @@ class Trader:
             self.__make_event(EVENT_POS_DELETE, {"token": self.token, "symbol": symbol})
 
             # 持仓记录更新
-            index = self.pos_record.loc[(self.pos_record["pt_symbol"] == symbol) & (self.pos_record["is_clear"] == 0)].index.tolist()
-            if index:
-                self.pos_record.loc[index[0], "is_clear"] = 1
+            i = self.open_pos_record.pop(symbol, None)
+            if i is not None:
+                self.pos_record.set(i, is_clear=1)
 
             # 推送持仓增加记录事件
             pos_info = {"token": self.token, "symbol": symbol}
@@ -414,28 +567,28 @@ class Trader:
 
     """验证"""
 
-    def __on_front_verification(self, order: Order):
+    def __on_front_verification(self, order: Order, reserve_price: float = None):
         """订单前置验证"""
         # 对订单的准确性验证
         # TODO
 
         if order.order_type == OrderType.BUY.value:
-            return self.__account_verification(order)
+            return self.__account_verification(order, reserve_price)
         else:
             return self.__position_verification(order)
 
-    def __account_verification(self, order: Order):
-        """订单账户资金验证"""
+    def __account_verification(self, order: Order, reserve_price: float = None):
+        """订单账户资金验证，市价买入按预留价格冻结资金"""
         # 查询账户信息
-        money_need = order.volume * order.order_price * (1 + self.account.cost)
+        money_need = self.ledger.buy_need(order.volume, order.order_price or reserve_price or 0)
 
-        if self.account.available >= money_need:
+        if self.ledger.available >= money_need:
             # 资金冻结
-            avl_diff = self.account.available - money_need
-            self.account.available = avl_diff
+            self.ledger.freeze_order(order.order_id, money_need, order.volume)
+            self.ledger.sync(self.account)
 
             # 推送账户资金冻结事件
-            self.__make_event(EVENT_ACCOUNT_AVL_UPDATE, {"token": self.token, "avl": avl_diff})
+            self.__make_event(EVENT_ACCOUNT_AVL_UPDATE, {"token": self.token, "avl": self.account.available})
 
             return True, ""
         else:
@@ -446,10 +599,13 @@ class Trader:
         pos_need = order.volume
         pos = self.pos.get(order.pt_symbol, None)
         if pos:
-            if pos.available >= pos_need:
+            # 所有未完成卖单冻结的股份不能超过持仓数量
+            frozen = self.ledger.frozen_shares.get(order.pt_symbol, 0)
+            if pos.available >= pos_need and frozen + pos_need <= pos.volume:
                 # 更新
                 avl_diff = pos.available - pos_need
                 self.pos[order.pt_symbol].available = avl_diff
+                self.ledger.freeze_shares(order.pt_symbol, pos_need)
 
                 # 推送股份冻结事件
                 self.__make_event(EVENT_POS_AVL_UPDATE, {"token": pos.account_id, "symbol": pos.pt_symbol, "avl": avl_diff})
@@ -462,15 +618,12 @@ class Trader:
 
     def __on_buy_cancel(self, order: Order):
         """买入订单取消"""
-        pay = (order.volume - order.traded) * order.order_price * (1 + self.account.cost)
-
-        available = self.account.available + pay
-
-        # 更新可用资金
-        self.account.available = available
+        # 释放未成交部分冻结的资金
+        self.ledger.release_order(order.order_id, order.volume - order.traded)
+        self.ledger.sync(self.account)
 
         # 推送资金解冻事件
-        self.__make_event(EVENT_ACCOUNT_AVL_UPDATE, {"token": self.token, "avl": available})
+        self.__make_event(EVENT_ACCOUNT_AVL_UPDATE, {"token": self.token, "avl": self.account.available})
 
     def __on_sell_cancel(self, order: Order):
         """卖出取消"""
@@ -479,6 +632,7 @@ class Trader:
 
         # 股份解冻
         self.pos[order.pt_symbol].available = available
+        self.ledger.unfreeze_shares(order.pt_symbol, order.volume - order.traded)
 
         # 推送股份解冻事件
         self.__make_event(EVENT_POS_AVL_UPDATE, {"token": pos.account_id, "symbol": pos.pt_symbol, "avl": available})
@@ -497,24 +651,23 @@ class Trader:
         account_daily = AccountRecord(
             account_id=self.token, check_date=liq_date, assets=self.account.assets, available=self.account.available, market_value=self.account.market_value
         )
-        df = pd.DataFrame(account_daily.__dict__, index=[liq_date])
-        self.account_record = self.account_record.append(df)
+        self.account_record.append(account_daily.to_dict())
 
         # 推送账户记录创建事件
-        self.__make_event(EVENT_ACCOUNT_RECORD_INSERT, account_daily)
+        self.__make_event(EVENT_ACCOUNT_RECORD_INSERT, account_daily, snapshot=False)
 
-        return True
+        return account_daily
 
     def __on_account_liquidation(self):
         """账户清算"""
         # 解除冻结
-        available = self.account.assets - self.account.market_value
+        self.ledger.unfreeze_all()
 
         # 更新账户可用资金
-        self.account.available = available
+        self.ledger.sync(self.account)
 
         # 推送资金解冻事件
-        self.__make_event(EVENT_ACCOUNT_AVL_UPDATE, {"token": self.token, "avl": available})
+        self.__make_event(EVENT_ACCOUNT_AVL_UPDATE, {"token": self.token, "avl": self.account.available})
 
     def __on_position_liquidation(self, price_dict: dict = None):
         """持仓清算"""
@@ -537,9 +690,9 @@ def account_generate(d: dict):
     """订单生成器"""
     account = Account(
         account_id=d["account_id"],
-        assets=round(d["assets"], P),
-        available=round(d["available"], P),
-        market_value=round(d["market_value"], P),
+        assets=d["assets"],
+        available=d["available"],
+        market_value=d["market_value"],
         capital=d["capital"],
         cost=d["cost"],
         tax=d["tax"],
@@ -585,25 +738,31 @@ def new_order_generate(d: dict):
         raise ValueError("订单数据有误")
 
 
+def intern_str(value):
+    """字符串共用同一对象，历史数据中的None等非字符串值原样返回"""
+    return intern(value) if isinstance(value, str) else value
+
+
 def order_generate(d: dict):
     """订单生成器"""
     try:
+        # 取值较少的字段共用字符串对象，降低大量历史订单的内存占用
         order = Order(
-            code=d["code"],
-            exchange=d["exchange"],
-            account_id=d["account_id"],
+            code=intern_str(d["code"]),
+            exchange=intern_str(d["exchange"]),
+            account_id=intern_str(d["account_id"]),
             order_id=d["order_id"],
-            order_type=d["order_type"],
-            price_type=d["price_type"],
-            trade_type=d["trade_type"],
+            order_type=intern_str(d["order_type"]),
+            price_type=intern_str(d["price_type"]),
+            trade_type=intern_str(d["trade_type"]),
             order_price=d["order_price"],
             trade_price=d["trade_price"],
             volume=d["volume"],
             traded=d["traded"],
-            status=d["status"],
-            order_date=d["order_date"],
+            status=intern_str(d["status"]),
+            order_date=intern_str(d["order_date"]),
             order_time=d["order_time"],
-            error_msg=d["error_msg"],
+            error_msg=intern_str(d["error_msg"]),
         )
         return order
     except Exception:
@@ -1,27 +1,55 @@
+import copy
 import logging
+from time import perf_counter
+from threading import Event as Signal
 
 from ..utility.model import LogData
-from ..utility.constant import Status, LoadDataMode
+from ..utility.setting import SETTINGS
+from ..utility.constant import Status, LoadDataMode, PersistanceMode
 from ..event import Event
 from ..utility.event import *
 from ..trade.db_model import *
 from ..trade.account import Trader, order_generate
+from ..trade.order_id import OrderIdGenerator
+from ..trade.shard import ShardExecutor
+from ..trade.pst_pool import PersistencePool
 
 
 class AccountEngine:
     """账户引擎"""
 
-    def __init__(
-        self, event_engine, pst_active, load_data_mode, db,
-    ):
+    def __init__(self, event_engine, pst_active, load_data_mode, db, pst_mode=None):
         self.event_engine = event_engine  # 事件引擎
         self.db = db  # 数据库实例
         self.pst_active = pst_active  # 数据持久化开关
         self.load_data_mode = load_data_mode  # 加载数据的模式
 
+        # 持久化工作线程池，实时持久化模式下每批写入一次，定时持久化模式下按时间间隔写入
+        self.pst_mode = pst_mode
+        interval = SETTINGS["P_TIMING"] if pst_mode == PersistanceMode.TIMING else 0
+        self.pst_pool = PersistencePool(
+            db,
+            SETTINGS["PST_WORKERS"],
+            SETTINGS["PST_QUEUE_SIZE"],
+            SETTINGS["PST_BATCH_SIZE"],
+            interval,
+            lambda msg: self.write_log(msg, logging.ERROR),
+            SETTINGS["PST_OVERFLOW_LIMIT"],
+        )
+        self.pst_timer = 0  # 距上次检查持久化延迟的秒数
+
         # 交易账户字典
         self.trader_dict = dict()  # 交易账户字典
 
+        # 收盘至下次开市期间冻结所有账户，不接收新订单，web线程与撮合线程共用
+        self.frozen = Signal()
+
+        # 订单编号生成器，所有账户共用，保证引擎内订单编号不重复
+        self.order_id_generator = OrderIdGenerator()
+
+        # 账户分片执行器，账户数据的所有修改都在所属分片的线程内顺序执行
+        self.shards = ShardExecutor(SETTINGS["ACCOUNT_WORKERS"])
+
         # 注册事件监听
         self.event_register()
 
@@ -46,12 +74,51 @@ class AccountEngine:
         self.event_engine.register(EVENT_POS_RECORD_SELL, self.process_pos_record_sell)
         self.event_engine.register(EVENT_POS_RECORD_CLEAR, self.process_pos_record_clear)
 
+        # 只有定时持久化时才需要定期检查写缓冲的延迟
+        if self.pst_mode == PersistanceMode.TIMING:
+            self.event_engine.register(EVENT_TIMER, self.process_timer)
+
     def start(self):
         """引擎初始化"""
         self.write_log("账户引擎：启动")
 
+        # 按当前数据库布局确保查询所需的索引存在，索引已存在时不重复创建
+        if SETTINGS["ENSURE_INDEXES"]:
+            start = perf_counter()
+            count = ensure_indexes(self.db)
+            self.write_log(f"账户引擎：检查索引{count}个，耗时{perf_counter() - start:.3f}秒")
+
         return self
 
+    def close(self):
+        """
+        引擎关闭，等待所有账户任务执行完毕，再写入所有持久化任务
+        收盘后仍需处理查询、手动清算及持久化请求，分片及持久化线程池只排空不关闭
+        """
+        self.shards.drain()
+        self.flush_persistence()
+
+        self.write_log("账户引擎：关闭")
+
+    def flush_persistence(self):
+        """等待已提交的持久化任务全部写入"""
+        self.pst_pool.flush()
+
+    def persistence_stats(self):
+        """持久化统计：队列长度、延迟、合并及写入次数"""
+        stats = self.pst_pool.stats()
+        stats.pop("workers")
+        return stats
+
+    def process_timer(self, event):
+        """定期检查持久化延迟"""
+        self.pst_timer += 1
+        if self.pst_timer >= SETTINGS["PST_LAG_WARNING"]:
+            self.pst_timer = 0
+            stats = self.persistence_stats()
+            if stats["lag"] > SETTINGS["PST_LAG_WARNING"] + SETTINGS["P_TIMING"]:
+                self.write_log(f"持久化延迟过高：{stats}", logging.WARNING)
+
     def load_data(self):
         """
         加载数据
@@ -80,7 +147,7 @@ class AccountEngine:
         account = query_account_one(account_id, self.db)
 
         if isinstance(account, dict):
-            trader = Trader(self.event_engine, account, self.pst_active, LoadDataMode.TRADING, self.db)
+            trader = Trader(self.event_engine, account, self.pst_active, LoadDataMode.TRADING, self.db, self.order_id_generator)
             self.trader_dict[account_id] = trader
 
     def creat(self, info: dict):
@@ -89,7 +156,7 @@ class AccountEngine:
         if account_dict:
             token = account_dict["account_id"]
             if not self.trader_dict.get(token):
-                account = Trader(self.event_engine, account_dict, self.pst_active, LoadDataMode.CREAT, self.db)
+                account = Trader(self.event_engine, account_dict, self.pst_active, LoadDataMode.CREAT, self.db, self.order_id_generator)
                 self.trader_dict[token] = account
                 return account_dict
 
@@ -108,69 +175,156 @@ class AccountEngine:
             # 查询账户
             account_dict = query_account_one(token, self.db)
             if account_dict:
-                account = Trader(self.event_engine, account_dict, self.pst_active, self.load_data_mode, self.db)
+                account = Trader(self.event_engine, account_dict, self.pst_active, self.load_data_mode, self.db, self.order_id_generator)
                 self.trader_dict[token] = account
                 return account_dict
             else:
                 return False
         else:
-            account = copy.deepcopy(trader.account)
-            return account.__dict__
+            return trader.account.to_dict()
 
     def logout(self, token: str):
         """账户登出"""
         if self.trader_dict.get(token, None):
             del self.trader_dict[token]
 
-    def orders_arrived(self, order: Order):
-        """订单到达处理"""
+    def orders_arrived(self, order: Order, reserve_price: float = None):
+        """
+        订单到达处理
+        :param reserve_price: 市价买入时冻结资金使用的预留价格
+        """
+        if self.frozen.is_set():
+            return False, "账户清算中，暂停接收订单"
+
         trader = self.trader_dict.get(order.account_id)
         if trader:
-            status, msg = trader.on_orders_arrived(order)
+            status, msg = self.shards.call(trader.token, trader.on_orders_arrived, order, reserve_price)
             return status, msg
         else:
             return False, "交易账户未登陆"
 
+    def order_call(self, order: Order, name: str, action: str):
+        """
+        在订单所属账户的分片内执行Trader的订单处理函数
+        账户未登录或处理失败时记录日志，不影响撮合线程及其他账户
+        :param name: Trader的函数名
+        :param action: 日志中的操作名称
+        """
+        trader = self.trader_dict.get(order.account_id)
+        if not trader:
+            self.write_log(f"{action}：账户{order.account_id}未登录，跳过订单{order.order_id}", logging.ERROR)
+            return
+
+        try:
+            return self.shards.call(trader.token, getattr(trader, name), order)
+        except Exception as e:
+            self.write_log(f"{action}：账户{order.account_id}订单{order.order_id}处理失败：{e}", logging.ERROR)
+
     def orders_deal(self, order: Order):
         """订单成交处理"""
-        trader = self.trader_dict.get(order.account_id)
-        trader.on_order_deal(order)
+        self.order_call(order, "on_order_deal", "订单成交")
+
+    def orders_deal_batch(self, orders: list):
+        """订单批量成交处理，按账户分组后提交到各自的分片并行成交"""
+        account_orders = dict()
+        for order in orders:
+            account_orders.setdefault(order.account_id, []).append(order)
+
+        futures = list()
+        for token, order_list in account_orders.items():
+            trader = self.trader_dict.get(token)
+            if not trader:
+                self.write_log(f"批量成交：账户{token}未登录，跳过订单{[o.order_id for o in order_list]}", logging.ERROR)
+                continue
+            futures.append((token, self.shards.submit(token, trader.on_orders_deal, order_list)))
+
+        # 单个账户或订单的异常只记录日志，不影响其他账户
+        for token, future in futures:
+            try:
+                failed = future.result()
+            except Exception as e:
+                self.write_log(f"批量成交：账户{token}处理失败：{e}", logging.ERROR)
+                continue
+            for order, e in failed:
+                self.write_log(f"批量成交：账户{token}订单{order.order_id}处理失败：{e}", logging.ERROR)
 
     def orders_cancel(self, order: Order):
-        """订单成交处理"""
-        trader = self.trader_dict.get(order.account_id)
-        trader.on_order_cancel(order)
+        """订单撤销处理"""
+        self.order_call(order, "on_order_cancel", "订单撤销")
 
     def orders_refused(self, order: Order):
-        """订单成交处理"""
-        trader = self.trader_dict.get(order.account_id)
-        trader.on_order_refuse(order)
+        """订单拒单处理"""
+        self.order_call(order, "on_order_refuse", "订单拒单")
 
     def orders_status_update(self, order: Order):
-        """订单成交处理"""
-        trader = self.trader_dict.get(order.account_id)
-        trader.on_order_status_update(order)
+        """订单状态更新处理"""
+        self.order_call(order, "on_order_status_update", "订单状态更新")
 
     def liquidation(self, hq_client):
-        """清算"""
+        """
+        清算
+        先汇总所有账户持仓的证券，一次批量获取收盘行情，再统一更新持仓并清算
+        获取行情前冻结账户，清算完成后保持冻结，直到下次开市时交易市场解除
+        """
+        self.frozen.set()
         today = datetime.now().strftime("%Y%m%d")
+        start = perf_counter()
+
+        # 批量获取所有持仓证券的收盘价
+        symbols = {symbol for trader in self.trader_dict.values() for symbol in trader.pos.keys()}
+        price_dict = dict()
+        if symbols:
+            snapshot = hq_client.get_realtime_quotes(list(symbols))
+            price_dict = {symbol: round(float(hq["price"]), 5) for symbol, hq in snapshot.items()}
+        fetch_end = perf_counter()
+
+        # 在各账户的分片内并行清算，单个账户清算失败只记录日志
+        futures = [
+            (trader.token, self.shards.submit(trader.token, self.trader_liquidation, trader, today, price_dict)) for trader in list(self.trader_dict.values())
+        ]
+        results = []
+        for token, future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                self.write_log(f"清算：账户{token}清算失败：{e}", logging.ERROR)
+        liq_end = perf_counter()
+
+        mark_time = sum(r[0] for r in results)
+        record_time = sum(r[1] for r in results)
+        self.write_log(
+            f"清算完成：账户{len(results)}个，证券{len(symbols)}只，行情获取{fetch_end - start:.3f}秒，"
+            f"并行清算{liq_end - fetch_end:.3f}秒（持仓估值累计{mark_time:.3f}秒，账户记录累计{record_time:.3f}秒）"
+        )
+
+        return [r[2] for r in results]
+
+    @staticmethod
+    def trader_liquidation(trader, liq_date: str, price_dict: dict):
+        """
+        单个账户清算
+        :return: 持仓估值耗时，账户记录耗时，账户记录
+        """
+        start = perf_counter()
 
-        for token, trader in self.trader_dict.items():
-            for symbol, pos in trader.pos.items():
-                hq = hq_client.get_realtime_data(symbol)
-                if hq is not None:
-                    now_price = round(hq.loc[0, "price"], 5)
-                    # 更新收盘行情
-                    trader.on_position_update_price(pos, now_price)
-            # 清算
-            trader.on_liquidation(today)
+        # 更新收盘行情
+        for symbol, pos in list(trader.pos.items()):
+            if symbol in price_dict:
+                trader.on_position_update_price(pos, price_dict[symbol])
+        mark_end = perf_counter()
+
+        # 清算并创建账户记录
+        account_record = trader.on_liquidation(liq_date)
+        record_end = perf_counter()
+
+        return mark_end - start, record_end - mark_end, account_record
 
     def liq_manual(self, token, liq_date, price_dict):
         """手工清算"""
         trader = self.trader_dict.get(token)
 
         if trader:
-            if trader.on_liquidation(liq_date, price_dict):
+            if self.shards.call(token, trader.on_liquidation, liq_date, price_dict):
                 return True
         # 账户未登陆
         else:
@@ -185,8 +339,7 @@ class AccountEngine:
         """
         trader = self.trader_dict.get(token, None)
         if trader:
-            account = trader.account
-            return True, account.__dict__
+            return True, self.shards.call(token, lambda: trader.account.to_dict())
         else:
             return False, "账户未登录"
 
@@ -199,22 +352,21 @@ class AccountEngine:
         """
         trader = self.trader_dict.get(token, None)
         if trader:
-            pos = copy.copy(trader.pos)
-            if pos:
-                pos_data = [d.__dict__ for d in pos.values()]
-                return True, pos_data
-            else:
-                return True, []
+            pos_data = self.shards.call(token, lambda: [d.to_dict() for d in trader.pos.values()])
+            return True, pos_data
         else:
             return False, "账户未登录"
 
+    def load_history(self, trader, start: str = None, kinds: list = None):
+        """在账户分片内按查询范围加载历史数据，参数见Trader.ensure_history"""
+        if trader.history_pending:
+            self.shards.call(trader.token, trader.ensure_history, start, kinds)
+
     def query_orders_today(self, token: str):
         """查询当天交易订单"""
         trader = self.trader_dict.get(token, None)
         if trader:
-            orders = list()
-            for d in trader.orders.values():
-                orders.append(d.__dict__)
+            orders = self.shards.call(token, self.read_orders_today, trader)
 
             if orders:
                 return True, orders
@@ -223,14 +375,38 @@ class AccountEngine:
         else:
             return False, "账户未登录"
 
-    def query_orders(self, token: str):
-        """查询所有订单"""
+    def read_orders_today(self, trader):
+        """在账户分片内读取当天订单"""
+        self.load_history(trader)
+        return [d.to_dict() for d in trader.orders.values()]
+
+    def query_order(self, token: str, order_id: str):
+        """从内存中查询订单，账户未登录或订单不在内存中时返回None"""
+        trader = self.trader_dict.get(token, None)
+        if trader:
+            order = self.shards.call(token, trader.orders.get, order_id)
+            if order:
+                return order.to_dict()
+
+    def orders_in_memory(self, token: str):
+        """账户是否已登录且内存中保存了全部订单"""
+        trader = self.trader_dict.get(token, None)
+        return bool(trader) and trader.full_history
+
+    def query_orders(self, token: str, start=None, end=None, symbol=None, status=None, offset: int = 0, limit: int = None):
+        """
+        查询订单，通过订单流水筛选及分页
+        :param start: 开始日期YYYYMMDD
+        :param end: 结束日期YYYYMMDD
+        :param symbol: pt_symbol
+        :param status: 订单状态
+        :param offset: 分页起始位置
+        :param limit: 分页大小，为空时返回全部
+        """
         # 检查账户登录情况
         trader = self.trader_dict.get(token, None)
         if trader:
-            orders = list()
-            for d in trader.orders.values():
-                orders.append(d.__dict__)
+            orders = self.shards.call(token, self.read_orders, trader, start, end, symbol, status, offset, limit)
 
             if orders:
                 return True, orders
@@ -239,12 +415,23 @@ class AccountEngine:
         else:
             return False, "账户未登录"
 
+    def read_orders(self, trader, start, end, symbol, status, offset, limit):
+        """在账户分片内通过订单流水筛选订单，订单流水与订单字典同时读取"""
+        self.load_history(trader, start, ["orders"])
+        _, order_ids = trader.order_journal.query(start, end, symbol, status, offset, limit)
+        return [trader.orders[order_id].to_dict() for order_id in order_ids]
+
+    def read_records(self, trader, kind: str, start=None):
+        """在账户分片内读取账户记录或持仓记录，返回DataFrame"""
+        self.load_history(trader, start, [kind])
+        return getattr(trader, kind).to_frame()
+
     def query_account_record(self, token: str, start=None, end=None):
         """查询账户记录"""
         trader = self.trader_dict.get(token, None)
         if trader:
             records = list()
-            df = trader.account_record
+            df = self.shards.call(token, self.read_records, trader, "account_record", start)
             if len(df):
                 if start and end:
                     df = df.loc[(df["check_date"] >= start) & (df["check_date"] <= end)]
@@ -268,7 +455,7 @@ class AccountEngine:
         trader = self.trader_dict.get(token, None)
         if trader:
             records = list()
-            df = trader.pos_record
+            df = self.shards.call(token, self.read_records, trader, "pos_record", start)
             if len(df):
                 if start and end:
                     df = df.loc[(df["first_buy_date"] >= start) & (df["last_sell_date"] <= end)]
@@ -291,115 +478,132 @@ class AccountEngine:
         """持久化数据"""
         trader = self.trader_dict.get(token)
         if trader:
+            # 先写入已提交的持久化任务，避免较早的操作覆盖快照数据
+            self.flush_persistence()
+
+            # 在账户分片内生成数据快照，数据库写入不占用分片
+            account, pos_list, orders, account_record_list, pos_record_list = self.shards.call(token, self.trader_snapshot, trader)
+
             # 持久化账户数据
-            account = trader.account
             on_account_update({"token": account.account_id, "avl": account.available, "market_value": account.market_value, "assets": account.assets}, self.db)
 
             # 持久化持仓数据
             on_position_clear(token, self.db)
-            for symbol, pos in trader.pos.items():
-                pos_copy = copy.copy(pos)
-                on_position_insert(pos_copy, self.db)
+            for pos in pos_list:
+                on_position_insert(pos, self.db)
 
             # 持久化订单数据
             on_orders_clear(token, self.db)
-            orders_copy = copy.deepcopy(trader.orders)
-            orders = [order.__dict__ for order in orders_copy.values()]
             on_orders_insert_many(token, orders, self.db)
 
             # 持久化账户记录数据
             account_record_clear(token, self.db)
-            account_record_list = trader.account_record.to_dict(orient="records")
             account_record_insert_many(token, account_record_list, self.db)
 
             # 持久化持仓记录数据
             pos_record_clear(token, self.db)
-            pos_record_list = trader.pos_record.to_dict(orient="records")
             pos_record_insert_many(token, pos_record_list, self.db)
 
             return True
         else:
             return "账户未登录"
 
+    @staticmethod
+    def trader_snapshot(trader):
+        """账户数据快照，持久化前先加载历史数据，避免覆盖数据库中的历史记录"""
+        trader.ensure_history()
+        return (
+            copy.copy(trader.account),
+            [copy.copy(pos) for pos in trader.pos.values()],
+            [order.to_dict() for order in trader.orders.values()],
+            trader.account_record.to_records(),
+            trader.pos_record.to_records(),
+        )
+
+    def persist(self, data, fn):
+        """提交持久化任务到账户所属的工作线程"""
+        token = data["token"] if isinstance(data, dict) else data.account_id
+        self.pst_pool.put(token, fn, data)
+
     def process_order_insert(self, event):
         """处理订单插入事件"""
         order = event.data
-        on_orders_insert(order, self.db)
+        self.persist(order, on_orders_insert)
 
     def process_account_update(self, event):
         """处理账户更新事件"""
         data = event.data
-        on_account_update(data, self.db)
+        self.persist(data, on_account_update)
 
     def process_account_avl_update(self, event):
         """处理账户可用资金更新"""
         data = event.data
-        on_account_avl_update(data, self.db)
+        self.persist(data, on_account_avl_update)
 
     def process_account_assets_update(self, event):
         """处理账户资产更新"""
         data = event.data
-        on_account_assets_update(data, self.db)
+        self.persist(data, on_account_assets_update)
 
     def process_pos_insert(self, event):
         """处理持仓新增事件"""
         pos = event.data
-        on_position_insert(pos, self.db)
+        self.persist(pos, on_position_insert)
 
     def process_pos_update(self, event):
         """处理持仓更新事件"""
         pos = event.data
-        on_position_update(pos, self.db)
+        self.persist(pos, on_position_update)
 
     def process_pos_avl_update(self, event):
         """处理可用股份更新"""
         data = event.data
-        on_position_avl_update(data, self.db)
+        self.persist(data, on_position_avl_update)
 
     def process_pos_price_update(self, event):
         """处理可用股份更新"""
         data = event.data
-        on_position_price_update(data, self.db)
+        self.persist(data, on_position_price_update)
 
     def process_pos_delete(self, event):
         """处理可用股份更新"""
         data = event.data
-        on_position_delete(data, self.db)
+        self.persist(data, on_position_delete)
 
     def process_order_update(self, event):
         """处理订单更新事件"""
         data = event.data
-        on_order_update(data, self.db)
+        self.persist(data, on_order_update)
 
     def process_order_status_update(self, event):
         """处理订单更新事件"""
         data = event.data
-        on_order_status_update(data, self.db)
+        self.persist(data, on_order_status_update)
 
     def process_account_record_insert(self, event):
         """处理账户记录创建事件"""
         account_daily = event.data
-        account_record_creat(account_daily, self.db)
+        self.persist(account_daily, account_record_creat)
 
     def process_pos_record_insert(self, event):
         """处理持仓记录事件"""
         pos_record = event.data
-        pos_record_creat(pos_record, self.db)
+        self.persist(pos_record, pos_record_creat)
 
     def process_pos_record_buy(self, event):
         """处理持仓记录事件"""
         data = event.data
-        pos_record_update_buy(data, self.db)
+        self.persist(data, pos_record_update_buy)
 
     def process_pos_record_sell(self, event):
         """处理持仓记录事件"""
         data = event.data
-        pos_record_update_sell(data, self.db)
+        self.persist(data, pos_record_update_sell)
 
     def process_pos_record_clear(self, event):
         """处理持仓记录事件"""
         data = event.data
-        pos_record_update_liq(data, self.db)
+        self.persist(data, pos_record_update_liq)
 
     def write_log(self, msg: str, level: int = logging.INFO):
         """"""
@@ -1,12 +1,103 @@
-import copy
 from datetime import datetime
 
 from ..utility.setting import get_token, SETTINGS
 from ..utility.model import Account, Position, Order, DBData
+from ..utility.constant import Status, DBLayout
 
 # 小数点保留位数
 P = SETTINGS["POINT"]
 
+"""数据库布局"""
+
+# 账户数据所在的数据库
+ACCOUNT_DATA_DBS = ["ACCOUNT_DB", "POSITION_DB", "TRADE_DB", "ACCOUNT_RECORD", "POS_RECORD"]
+
+
+def is_single_layout():
+    """是否使用单集合布局"""
+    return DBLayout(SETTINGS["DB_LAYOUT"]) == DBLayout.SINGLE
+
+
+def single_collections():
+    """单集合布局下各数据库使用的集合名"""
+    return {
+        SETTINGS["ACCOUNT_DB"]: "account",
+        SETTINGS["POSITION_DB"]: "position",
+        SETTINGS["TRADE_DB"]: "order",
+        SETTINGS["ACCOUNT_RECORD"]: "account_record",
+        SETTINGS["POS_RECORD"]: "pos_record",
+    }
+
+
+def make_db_data(db_name: str, token: str, raw_data: dict):
+    """
+    生成账户数据的数据库操作参数
+    按账户分集合时集合名为账户token；单集合布局下使用数据库的实体集合，并在查询条件中加入account_id
+    """
+    if not is_single_layout():
+        return DBData(db_name=db_name, db_cl=token, raw_data=raw_data)
+
+    flt = raw_data.get("flt")
+    if flt is not None:
+        if "$match" in flt:
+            raw_data["flt"] = {"$match": {"account_id": token, **flt["$match"]}}
+        else:
+            raw_data["flt"] = {"account_id": token, **flt}
+    return DBData(db_name=db_name, db_cl=single_collections()[db_name], raw_data=raw_data)
+
+
+def on_account_data_clear(db_name: str, token: str, db):
+    """清空账户在某个数据库中的数据，按账户分集合时删除集合"""
+    if is_single_layout():
+        return db.on_delete(make_db_data(db_name, token, {"flt": {}}))
+    else:
+        return db.on_collection_delete(DBData(db_name=db_name, db_cl=token, raw_data={}))
+
+
+# 各数据库查询使用的索引，单集合布局下在每个索引前加入account_id
+ACCOUNT_INDEXES = {
+    "ACCOUNT_DB": [],
+    "POSITION_DB": [[("pt_symbol", 1)]],
+    "TRADE_DB": [[("order_id", 1)], [("order_date", 1)], [("pt_symbol", 1)], [("status", 1)]],
+    "ACCOUNT_RECORD": [[("check_date", 1)]],
+    "POS_RECORD": [[("pt_symbol", 1), ("is_clear", 1)], [("is_clear", 1)], [("first_buy_date", 1)]],
+}
+
+
+def index_keys(db_key: str, single: bool):
+    """数据库在指定布局下的索引，单集合布局下没有其他索引的集合按account_id建立索引"""
+    indexes = ACCOUNT_INDEXES[db_key]
+    if single:
+        return [[("account_id", 1)] + keys for keys in indexes] or [[("account_id", 1)]]
+    return indexes
+
+
+def ensure_indexes(db, token: str = None, single: bool = None):
+    """
+    创建查询所需的索引，索引已存在时不重复创建
+    单集合布局下创建实体集合的索引；按账户分集合时创建指定账户的索引，未指定账户时创建所有账户的索引
+    :param single: 是否按单集合布局创建，为空时使用DB_LAYOUT设置
+    :return: 检查的索引数
+    """
+    if single is None:
+        single = is_single_layout()
+
+    if single:
+        collections = single_collections()
+        targets = [(db_key, collections[SETTINGS[db_key]]) for db_key in ACCOUNT_DATA_DBS]
+    else:
+        tokens = [token] if token else query_account_list(db)
+        targets = [(db_key, t) for t in tokens for db_key in ACCOUNT_DATA_DBS]
+
+    count = 0
+    for db_key, db_cl in targets:
+        for keys in index_keys(db_key, single):
+            db.on_create_index(DBData(db_name=SETTINGS[db_key], db_cl=db_cl, raw_data={"keys": keys}))
+            count += 1
+
+    return count
+
+
 """账户操作"""
 
 
@@ -31,13 +122,16 @@ def on_account_add(account_info: dict, db):
         slippoint=float(param["slippoint"]),
         account_info=param["info"],
     )
-    account_dict = copy.copy(account.__dict__)
+    account_dict = account.to_dict()
 
     raw_data = {}
     raw_data["flt"] = {"account_id": token}
     raw_data["data"] = account
-    db_data = DBData(db_name=SETTINGS["ACCOUNT_DB"], db_cl=token, raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["ACCOUNT_DB"], token, raw_data)
     if db.on_insert(db_data):
+        # 按账户分集合时为新账户的集合创建索引
+        if not is_single_layout():
+            ensure_indexes(db, token)
         return account_dict
 
 
@@ -54,20 +148,8 @@ def on_account_exist(token: str, db):
 def on_account_delete(token: str, db):
     """账户删除"""
     try:
-        account = DBData(db_name=SETTINGS["ACCOUNT_DB"], db_cl=token, raw_data={})
-        db.on_collection_delete(account)
-
-        position = DBData(db_name=SETTINGS["POSITION_DB"], db_cl=token, raw_data={})
-        db.on_collection_delete(position)
-
-        order = DBData(db_name=SETTINGS["TRADE_DB"], db_cl=token, raw_data={})
-        db.on_collection_delete(order)
-
-        account_record = DBData(db_name=SETTINGS["ACCOUNT_RECORD"], db_cl=token, raw_data={})
-        db.on_collection_delete(account_record)
-
-        pos_record = DBData(db_name=SETTINGS["POS_RECORD"], db_cl=token, raw_data={})
-        db.on_collection_delete(pos_record)
+        for db_key in ACCOUNT_DATA_DBS:
+            on_account_data_clear(SETTINGS[db_key], token, db)
 
         return True
     except BaseException:
@@ -79,7 +161,7 @@ def on_account_update(data: dict, db):
     raw_data = {}
     raw_data["flt"] = {"account_id": data["token"]}
     raw_data["set"] = {"$set": {"available": data["avl"], "assets": data["assets"], "market_value": data["market_value"]}}
-    db_data = DBData(db_name=SETTINGS["ACCOUNT_DB"], db_cl=data["token"], raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["ACCOUNT_DB"], data["token"], raw_data)
     return db.on_update(db_data)
 
 
@@ -88,7 +170,7 @@ def on_account_avl_update(data: dict, db):
     raw_data = {}
     raw_data["flt"] = {"account_id": data["token"]}
     raw_data["set"] = {"$set": {"available": data["avl"]}}
-    db_data = DBData(db_name=SETTINGS["ACCOUNT_DB"], db_cl=data["token"], raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["ACCOUNT_DB"], data["token"], raw_data)
     return db.on_update(db_data)
 
 
@@ -97,12 +179,17 @@ def on_account_assets_update(data: dict, db):
     raw_data = {}
     raw_data["flt"] = {"account_id": data["token"]}
     raw_data["set"] = {"$set": {"assets": data["assets"], "market_value": data["market_value"]}}
-    db_data = DBData(db_name=SETTINGS["ACCOUNT_DB"], db_cl=data["token"], raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["ACCOUNT_DB"], data["token"], raw_data)
     return db.on_update(db_data)
 
 
 def query_account_list(db):
     """查询账户列表"""
+    if is_single_layout():
+        raw_data = {"flt": {}, "key": "account_id"}
+        db_data = DBData(db_name=SETTINGS["ACCOUNT_DB"], db_cl=single_collections()[SETTINGS["ACCOUNT_DB"]], raw_data=raw_data)
+        return db.on_distinct(db_data)
+
     db_data = DBData(db_name=SETTINGS["ACCOUNT_DB"], db_cl="", raw_data={})
     return db.on_collections_query(db_data)
 
@@ -112,7 +199,7 @@ def query_account_one(token: str, db):
     if token:
         raw_data = {}
         raw_data["flt"] = {"account_id": token}
-        db_data = DBData(db_name=SETTINGS["ACCOUNT_DB"], db_cl=token, raw_data=raw_data)
+        db_data = make_db_data(SETTINGS["ACCOUNT_DB"], token, raw_data)
         account = db.on_query_one(db_data)
         if account:
             del account["_id"]
@@ -129,7 +216,7 @@ def on_orders_insert(order: Order, db):
     raw_data = {}
     raw_data["flt"] = {"order_id": order.order_id}
     raw_data["data"] = order
-    db_data = DBData(db_name=SETTINGS["TRADE_DB"], db_cl=order.account_id, raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["TRADE_DB"], order.account_id, raw_data)
 
     if db.on_replace_one(db_data):
         return True, ""
@@ -141,7 +228,7 @@ def on_orders_exist(token: str, order_id: str, db):
     """查询订单是否存在"""
     raw_data = {}
     raw_data["flt"] = {"order_id": order_id}
-    db_data = DBData(db_name=SETTINGS["TRADE_DB"], db_cl=token, raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["TRADE_DB"], token, raw_data)
     order = db.on_select(db_data)
     if order.count():
         return True
@@ -154,16 +241,13 @@ def on_orders_insert_many(token, order_list, db):
     raw_data = {}
     raw_data["flt"] = {}
     raw_data["data"] = order_list
-    db_data = DBData(db_name=SETTINGS["TRADE_DB"], db_cl=token, raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["TRADE_DB"], token, raw_data)
     return db.on_insert_many(db_data)
 
 
 def on_orders_clear(token, db):
     """订单数据清空"""
-    raw_data = {}
-    raw_data["flt"] = {}
-    db_data = DBData(db_name=SETTINGS["TRADE_DB"], db_cl=token, raw_data=raw_data)
-    db.on_collection_delete(db_data)
+    on_account_data_clear(SETTINGS["TRADE_DB"], token, db)
 
 
 def on_order_update(order: Order, db):
@@ -173,7 +257,7 @@ def on_order_update(order: Order, db):
     raw_data["set"] = {
         "$set": {"status": order.status, "trade_type": order.trade_type, "trade_price": order.trade_price, "traded": order.traded, "error_msg": order.error_msg}
     }
-    db_data = DBData(db_name=SETTINGS["TRADE_DB"], db_cl=order.account_id, raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["TRADE_DB"], order.account_id, raw_data)
     return db.on_update(db_data)
 
 
@@ -182,7 +266,7 @@ def on_order_status_update(data, db):
     raw_data = {}
     raw_data["flt"] = {"order_id": data["id"]}
     raw_data["set"] = {"$set": {"status": data["status"], "error_msg": data["msg"]}}
-    db_data = DBData(db_name=SETTINGS["TRADE_DB"], db_cl=data["token"], raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["TRADE_DB"], data["token"], raw_data)
     return db.on_update(db_data)
 
 
@@ -190,7 +274,7 @@ def query_orders(token: str, db, flt: dict = None):
     """查询交割单"""
     raw_data = {}
     raw_data["flt"] = flt or {}
-    db_data = DBData(db_name=SETTINGS["TRADE_DB"], db_cl=token, raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["TRADE_DB"], token, raw_data)
     result = db.on_select(db_data)
     orders = []
 
@@ -211,7 +295,7 @@ def query_order_one(token: str, order_id: str, db):
     """查询一条订单数据"""
     raw_data = {}
     raw_data["flt"] = {"order_id": order_id}
-    db_data = DBData(db_name=SETTINGS["TRADE_DB"], db_cl=token, raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["TRADE_DB"], token, raw_data)
     order = db.on_query_one(db_data)
 
     if order:
@@ -224,7 +308,7 @@ def query_order_status(token: str, order_id: str, db):
     """查询订单情况"""
     raw_data = {}
     raw_data["flt"] = {"order_id": order_id}
-    db_data = DBData(db_name=SETTINGS["TRADE_DB"], db_cl=token, raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["TRADE_DB"], token, raw_data)
     order = db.on_query_one(db_data)
 
     if order:
@@ -233,12 +317,44 @@ def query_order_status(token: str, order_id: str, db):
         return False, "无此订单"
 
 
+def query_open_orders(token: str, db):
+    """查询未完成的订单"""
+    open_status = [Status.SUBMITTING.value, Status.NOTTRADED.value, Status.PARTTRADED.value]
+    return query_orders(token, db, {"status": {"$in": open_status}})
+
+
+def query_history(db_name: str, token: str, db, flt: dict = None):
+    """通过游标分批读取账户的历史数据"""
+    raw_data = {}
+    raw_data["flt"] = flt or {}
+    db_data = make_db_data(db_name, token, raw_data)
+    cursor = db.on_select(db_data).batch_size(SETTINGS["HISTORY_BATCH_SIZE"])
+
+    for d in cursor:
+        del d["_id"]
+        yield d
+
+
+def query_max_order_id(token: str, db):
+    """查询已持久化订单中的最大订单编号"""
+    raw_data = {}
+    raw_data["flt"] = {}
+    db_data = make_db_data(SETTINGS["TRADE_DB"], token, raw_data)
+    # 按订单编号倒序取第一条，可以使用order_id索引
+    result = list(db.on_select(db_data).sort("order_id", -1).limit(1))
+
+    if result:
+        return result[0]["order_id"]
+    else:
+        return ""
+
+
 def query_orders_today(token: str, db):
     """查询今天的所有订单"""
     today = datetime.now().strftime("%Y%m%d")
     raw_data = {}
     raw_data["flt"] = {"order_date": today}
-    db_data = DBData(db_name=SETTINGS["TRADE_DB"], db_cl=token, raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["TRADE_DB"], token, raw_data)
     result = db.on_select(db_data)
     orders = []
 
@@ -259,7 +375,7 @@ def query_orders_by_symbol(token: str, symbol: str, db):
     """查询某symbol的所有订单"""
     raw_data = {}
     raw_data["flt"] = {"pt_symbol": symbol}
-    db_data = DBData(db_name=SETTINGS["TRADE_DB"], db_cl=token, raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["TRADE_DB"], token, raw_data)
     result = db.on_select(db_data)
     orders = []
 
@@ -284,7 +400,7 @@ def on_position_insert(pos: Position, db):
     raw_data = {}
     raw_data["flt"] = {"pt_symbol": pos.pt_symbol}
     raw_data["data"] = pos
-    db_data = DBData(db_name=SETTINGS["POSITION_DB"], db_cl=pos.account_id, raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["POSITION_DB"], pos.account_id, raw_data)
     db.on_insert(db_data)
 
 
@@ -292,16 +408,13 @@ def on_position_delete(data: dict, db):
     """持仓删除事件"""
     raw_data = {}
     raw_data["flt"] = {"pt_symbol": data["symbol"]}
-    db_data = DBData(db_name=SETTINGS["POSITION_DB"], db_cl=data["token"], raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["POSITION_DB"], data["token"], raw_data)
     db.on_delete(db_data)
 
 
 def on_position_clear(token: str, db):
     """持仓清空事件"""
-    raw_data = {}
-    raw_data["flt"] = {}
-    db_data = DBData(db_name=SETTINGS["POSITION_DB"], db_cl=token, raw_data=raw_data)
-    db.on_collection_delete(db_data)
+    on_account_data_clear(SETTINGS["POSITION_DB"], token, db)
 
 
 def on_position_update(pos: Position, db):
@@ -309,7 +422,7 @@ def on_position_update(pos: Position, db):
     raw_data = {}
     raw_data["flt"] = {"pt_symbol": pos.pt_symbol}
     raw_data["set"] = {"$set": {"volume": pos.volume, "available": pos.available, "buy_price": pos.buy_price, "now_price": pos.now_price, "profit": pos.profit}}
-    db_data = DBData(db_name=SETTINGS["POSITION_DB"], db_cl=pos.account_id, raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["POSITION_DB"], pos.account_id, raw_data)
     db.on_update(db_data)
 
 
@@ -319,7 +432,7 @@ def on_position_avl_update(data: dict, db):
     raw_data = {}
     raw_data["flt"] = {"pt_symbol": data["symbol"]}
     raw_data["set"] = {"$set": {"available": data["avl"]}}
-    db_data = DBData(db_name=SETTINGS["POSITION_DB"], db_cl=data["token"], raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["POSITION_DB"], data["token"], raw_data)
     return db.on_update(db_data)
 
 
@@ -328,7 +441,7 @@ def on_position_price_update(data: dict, db):
     raw_data = {}
     raw_data["flt"] = {"pt_symbol": data["symbol"]}
     raw_data["set"] = {"$set": {"now_price": data["price"], "profit": data["profit"]}}
-    db_data = DBData(db_name=SETTINGS["POSITION_DB"], db_cl=data["token"], raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["POSITION_DB"], data["token"], raw_data)
     db.on_update(db_data)
 
 
@@ -336,7 +449,7 @@ def query_position(token: str, db):
     """查询所有持仓信息"""
     raw_data = {}
     raw_data["flt"] = {}
-    db_data = DBData(db_name=SETTINGS["POSITION_DB"], db_cl=token, raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["POSITION_DB"], token, raw_data)
     result = list(db.on_select(db_data))
     pos = []
     if isinstance(result, bool):
@@ -356,7 +469,7 @@ def query_position_one(token: str, symbol: str, db):
     """查询某一只证券的持仓"""
     raw_data = {}
     raw_data["flt"] = {"pt_symbol": symbol}
-    db_data = DBData(db_name=SETTINGS["POSITION_DB"], db_cl=token, raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["POSITION_DB"], token, raw_data)
     pos = db.on_query_one(db_data)
     if pos:
         return True, pos
@@ -372,7 +485,7 @@ def account_record_creat(account_record, db):
     raw_data = {}
     raw_data["flt"] = {"check_date": account_record.check_date}
     raw_data["data"] = account_record
-    db_data = DBData(db_name=SETTINGS["ACCOUNT_RECORD"], db_cl=account_record.account_id, raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["ACCOUNT_RECORD"], account_record.account_id, raw_data)
     db.on_replace_one(db_data)
 
 
@@ -381,16 +494,13 @@ def account_record_insert_many(token, record_list, db):
     raw_data = {}
     raw_data["flt"] = {}
     raw_data["data"] = record_list
-    db_data = DBData(db_name=SETTINGS["ACCOUNT_RECORD"], db_cl=token, raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["ACCOUNT_RECORD"], token, raw_data)
     return db.on_insert_many(db_data)
 
 
 def account_record_clear(token, db):
     """账户记录清空"""
-    raw_data = {}
-    raw_data["flt"] = {}
-    db_data = DBData(db_name=SETTINGS["ACCOUNT_RECORD"], db_cl=token, raw_data=raw_data)
-    db.on_collection_delete(db_data)
+    on_account_data_clear(SETTINGS["ACCOUNT_RECORD"], token, db)
 
 
 def query_account_record(token, db, start: str = None, end: str = None):
@@ -403,7 +513,7 @@ def query_account_record(token, db, start: str = None, end: str = None):
         raw_data["flt"] = {"first_buy_date": {"$lte": end}}
     elif start and end:
         raw_data["flt"] = {"first_buy_date": {"$gte": start, "$lte": end}}
-    db_data = DBData(db_name=SETTINGS["ACCOUNT_RECORD"], db_cl=token, raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["ACCOUNT_RECORD"], token, raw_data)
     result = list(db.on_select(db_data))
     account_record = []
     if result:
@@ -423,7 +533,7 @@ def pos_record_creat(pos_record, db):
     raw_data = {}
     raw_data["flt"] = {}
     raw_data["data"] = pos_record
-    db_data = DBData(db_name=SETTINGS["POS_RECORD"], db_cl=pos_record.account_id, raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["POS_RECORD"], pos_record.account_id, raw_data)
     return db.on_insert(db_data)
 
 
@@ -432,16 +542,13 @@ def pos_record_insert_many(token, record_list, db):
     raw_data = {}
     raw_data["flt"] = {}
     raw_data["data"] = record_list
-    db_data = DBData(db_name=SETTINGS["POS_RECORD"], db_cl=token, raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["POS_RECORD"], token, raw_data)
     return db.on_insert_many(db_data)
 
 
 def pos_record_clear(token, db):
     """持仓记录清空"""
-    raw_data = {}
-    raw_data["flt"] = {}
-    db_data = DBData(db_name=SETTINGS["POS_RECORD"], db_cl=token, raw_data=raw_data)
-    db.on_collection_delete(db_data)
+    on_account_data_clear(SETTINGS["POS_RECORD"], token, db)
 
 
 def pos_record_update_buy(data, db):
@@ -449,7 +556,7 @@ def pos_record_update_buy(data, db):
     raw_data = {}
     raw_data["flt"] = {"pt_symbol": data["symbol"], "is_clear": 0}
     raw_data["set"] = {"$set": {"max_vol": data["max_vol"], "buy_price_mean": data["buy_price_mean"], "profit": data["profit"]}}
-    db_data = DBData(db_name=SETTINGS["POS_RECORD"], db_cl=data["token"], raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["POS_RECORD"], data["token"], raw_data)
     return db.on_update(db_data)
 
 
@@ -458,7 +565,7 @@ def pos_record_update_sell(data, db):
     raw_data = {}
     raw_data["flt"] = {"pt_symbol": data["symbol"], "is_clear": 0}
     raw_data["set"] = {"$set": {"sell_price_mean": data["sell_price_mean"], "profit": data["profit"], "last_sell_date": data["date"]}}
-    db_data = DBData(db_name=SETTINGS["POS_RECORD"], db_cl=data["token"], raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["POS_RECORD"], data["token"], raw_data)
     return db.on_update(db_data)
 
 
@@ -467,7 +574,7 @@ def pos_record_update_liq(data, db):
     raw_data = {}
     raw_data["flt"] = {"pt_symbol": data["symbol"], "is_clear": 0}
     raw_data["set"] = {"$set": {"is_clear": 1}}
-    db_data = DBData(db_name=SETTINGS["POS_RECORD"], db_cl=data["token"], raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["POS_RECORD"], data["token"], raw_data)
     return db.on_update(db_data)
 
 
@@ -475,7 +582,7 @@ def query_pos_record_one(token, db, flt):
     """获取持仓记录"""
     raw_data = {}
     raw_data["flt"] = flt
-    db_data = DBData(db_name=SETTINGS["POS_RECORD"], db_cl=token, raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["POS_RECORD"], token, raw_data)
     pos_record = db.on_query_one(db_data)
     if pos_record:
         return pos_record
@@ -495,7 +602,7 @@ def query_pos_records(token, db, start: str = None, end: str = None):
     elif start and end:
         raw_data["flt"] = {"first_buy_date": {"$gte": start, "$lte": end}}
 
-    db_data = DBData(db_name=SETTINGS["POS_RECORD"], db_cl=token, raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["POS_RECORD"], token, raw_data)
     result = list(db.on_select(db_data))
     pos_record = []
     if result:
@@ -511,7 +618,7 @@ def query_pos_records_not_clear(token, db):
     """获取未清仓的持仓记录"""
     raw_data = {}
     raw_data["flt"] = {"is_clear": 0}
-    db_data = DBData(db_name=SETTINGS["POS_RECORD"], db_cl=token, raw_data=raw_data)
+    db_data = make_db_data(SETTINGS["POS_RECORD"], token, raw_data)
     result = list(db.on_select(db_data))
     pos_record = []
     if result:
@@ -0,0 +1,123 @@
+from ..utility.model import Account
+from ..utility.setting import SETTINGS
+
+# 定点数精度，1表示0.0001元
+SCALE = 10000
+
+
+def to_fixed(value: float):
+    """浮点数转换为定点整数"""
+    return int(round(value * SCALE))
+
+
+def to_output(value: int):
+    """定点整数转换为对外输出的浮点数，按POINT设置的小数位数取整"""
+    return round(value / SCALE, SETTINGS["POINT"])
+
+
+def amount(volume, price: float):
+    """按数量及价格计算金额，结果为定点整数"""
+    return int(volume) * to_fixed(price)
+
+
+class Ledger:
+    """
+    账户资金账本
+    1、可用资金、冻结资金及持仓市值均以0.0001元为单位的整数记账，运算结果精确，不再反复取整；
+    2、冻结资金及每个证券的冻结股份单独记录，不再由总资产倒推；
+    3、买入订单按订单记录冻结的资金，成交或撤销时释放该订单实际冻结的金额，市价单按预留价格冻结也不会多释放；
+    4、只在对外输出时转换为浮点数，并按POINT设置取整
+    """
+
+    def __init__(self, account: Account):
+        self.available = to_fixed(account.available)  # 可用资金
+        self.market_value = to_fixed(account.market_value)  # 持仓市值
+        self.frozen = to_fixed(account.assets) - self.available - self.market_value  # 冻结资金
+        self.frozen_shares = dict()  # 冻结股份 pt_symbol: 股数
+        self.frozen_orders = dict()  # 买入订单冻结的资金 order_id: [冻结资金, 未成交数量]
+        self.cost = account.cost  # 佣金费率
+        self.tax = account.tax  # 印花税率
+
+    @property
+    def assets(self):
+        """总资产"""
+        return self.available + self.frozen + self.market_value
+
+    def commission(self, value: int):
+        """佣金"""
+        return int(round(value * self.cost))
+
+    def stamp_tax(self, value: int):
+        """印花税"""
+        return int(round(value * self.tax))
+
+    def buy_need(self, volume, price: float):
+        """买入所需资金，包含佣金"""
+        value = amount(volume, price)
+        return value + self.commission(value)
+
+    def freeze(self, value: int):
+        """冻结资金"""
+        self.available -= value
+        self.frozen += value
+
+    def unfreeze(self, value: int):
+        """解冻资金"""
+        self.available += value
+        self.frozen -= value
+
+    def unfreeze_all(self):
+        """解冻全部资金"""
+        self.available += self.frozen
+        self.frozen = 0
+        self.frozen_orders.clear()
+
+    def track_order(self, order_id: str, value: int, volume):
+        """记录买入订单冻结的资金，用于加载已冻结资金的未完成订单"""
+        self.frozen_orders[order_id] = [value, int(volume)]
+
+    def freeze_order(self, order_id: str, value: int, volume):
+        """冻结买入订单的资金"""
+        self.freeze(value)
+        self.track_order(order_id, value, volume)
+
+    def release_order(self, order_id: str, volume):
+        """
+        释放买入订单成交或撤销部分的冻结资金，按未成交数量比例释放，最后一笔释放全部剩余
+        订单没有冻结记录时（如未经验证的订单）不释放资金
+        :return: 释放的资金
+        """
+        record = self.frozen_orders.get(order_id)
+        if record is None:
+            value = 0
+        else:
+            frozen, remaining = record
+            volume = int(volume)
+            if volume >= remaining:
+                value = frozen
+                del self.frozen_orders[order_id]
+            else:
+                value = frozen * volume // remaining
+                record[0] = frozen - value
+                record[1] = remaining - volume
+
+        self.unfreeze(value)
+        return value
+
+    def freeze_shares(self, symbol: str, volume):
+        """冻结股份"""
+        self.frozen_shares[symbol] = self.frozen_shares.get(symbol, 0) + int(volume)
+
+    def unfreeze_shares(self, symbol: str, volume):
+        """解冻股份"""
+        frozen = self.frozen_shares.get(symbol, 0) - int(volume)
+        if frozen > 0:
+            self.frozen_shares[symbol] = frozen
+        else:
+            self.frozen_shares.pop(symbol, None)
+
+    def sync(self, account: Account):
+        """将账本数据以浮点数写回账户对象"""
+        account.available = to_output(self.available)
+        account.market_value = to_output(self.market_value)
+        account.assets = to_output(self.assets)
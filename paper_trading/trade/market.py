@@ -1,17 +1,31 @@
-import copy
+import math
 import traceback
-from queue import Queue
-from time import sleep
+from queue import Empty, Queue
+from threading import Event as Signal, Lock
 from logging import INFO
-from datetime import datetime, time
+from datetime import datetime
 from collections import OrderedDict
 
+from .order_book import OrderBook
+from .session import TradingSession, CHINA_A_SESSIONS, trading_calendar
 from ..event import Event
 from ..utility.event import EVENT_ERROR, EVENT_LOG, EVENT_MARKET_CLOSE
 from ..utility.model import Order, Status, LogData
+from ..utility.setting import SETTINGS
 from ..utility.constant import OrderType, PriceType, TradeType
 
 
+# 涨跌幅限制，科创板及创业板为20%，其他为10%
+PRICE_LIMITS = {"688": 0.2, "300": 0.2, "301": 0.2}
+DEFAULT_PRICE_LIMIT = 0.1
+
+
+def limit_up_price(code: str, last_close: float):
+    """涨停价，向上取整到分，作为市价买入冻结资金的上限"""
+    limit = PRICE_LIMITS.get(code[:3], DEFAULT_PRICE_LIMIT)
+    return math.ceil(last_close * (1 + limit) * 100 - 1e-6) / 100
+
+
 class Exchange:
     """
     交易所类
@@ -22,7 +36,7 @@ class Exchange:
     def __init__(self, event_engine, account_engine, hq_ser, param):
         self.market_name = ""  # 市场名称
         self._active = False  # 市场状态标识
-        self.orders_book = OrderedDict()  # 订单薄用于成交撮合
+        self.orders_book = OrderBook()  # 订单薄用于成交撮合
 
         # 事件引擎
         self.event_engine = event_engine
@@ -36,11 +50,15 @@ class Exchange:
         self.exchange_symbols = []  # 交易市场标识
         self.turnover_mode = None  # 回转交易模式
         self.verification = OrderedDict()  # 订单验证清单
+        self._signal = Signal()  # 撮合唤醒信号
+        self._book_lock = Lock()  # 订单入薄与关闭市场互斥，关闭后不再有订单进入订单薄
+        self.session = TradingSession(CHINA_A_SESSIONS, trading_calendar)  # 交易时段调度器
 
     def on_init(self):
         """初始化"""
-        # 开启交易撮合开关
+        # 开启交易撮合开关，解除上次收盘时的账户冻结
         self._active = True
+        self.account_engine.frozen.clear()
 
         # 注册验证程序
         self.verification_register()
@@ -56,52 +74,58 @@ class Exchange:
         """订单到达"""
         pass
 
-    def on_orders_match(self, order: Order):
-        """订单撮合"""
+    def wakeup(self):
+        """唤醒撮合线程"""
+        self._signal.set()
+
+    def on_wait(self, timeout: float = None):
+        """
+        撮合线程等待
+        直到有新订单到达、市场关闭或等待超时，空闲时不占用CPU
+        :param timeout: 超时时间（秒），为空时一直等待
+        """
+        self._signal.wait(timeout)
+        self._signal.clear()
+
+    def on_quotes_fetch(self, symbols):
+        """批量获取行情快照"""
         try:
-            hq = self.hq_client.get_realtime_data(order.pt_symbol)
-
-            if len(hq):
-                ask1 = round(hq.loc[0, "ask1"], 5)
-                bid1 = round(hq.loc[0, "bid1"], 5)
-
-                if order.order_type == OrderType.BUY.value:
-                    # 涨停
-                    if ask1 == 0:
-                        return
-                    # 市价委托即时成交
-                    if order.price_type == PriceType.MARKET.value:
-                        order.order_price = ask1
-                        order.trade_price = ask1
-                        self.on_order_deal(order)
-                        return True
-                    # 限价委托
-                    elif order.price_type == PriceType.LIMIT.value:
-                        if order.order_price >= ask1:
-                            order.trade_price = ask1
-                            # 订单成交
-                            self.on_order_deal(order)
-                            return True
-                else:
-                    # 跌停
-                    if bid1 == 0:
-                        return
-                    # 市价委托即时成交
-                    if order.price_type == PriceType.MARKET.value:
-                        order.order_price = bid1
-                        order.trade_price = bid1
-                        self.on_order_deal(order)
-                        return True
-                    # 限价委托
-                    elif order.price_type == PriceType.LIMIT.value:
-                        if order.order_price <= bid1:
-                            order.trade_price = bid1
-                            # 订单成交
-                            self.on_order_deal(order)
-                            return True
+            return self.hq_client.get_realtime_quotes(list(symbols))
         except Exception as e:
             self.write_log(traceback.format_exc())
-            return False
+            return None
+
+    def reserve_price(self, order: Order):
+        """
+        市价买入冻结资金使用的预留价格
+        :return: 不需要预留时返回0，无法确定时返回None
+        """
+        return 0.0
+
+    def on_symbol_match(self, symbol: str, hq):
+        """
+        按证券撮合
+        使用同一份行情，一次切出订单薄中该证券所有可成交的订单
+        :param symbol: 证券代码
+        :param hq: 证券的行情数据
+        """
+        ask1 = round(hq["ask1"], 5)
+        bid1 = round(hq["bid1"], 5)
+
+        # 卖一价为0时涨停，买一价为0时跌停，对应方向不成交
+        buys, sells = self.orders_book.match(symbol, ask1, bid1)
+
+        for order, price in [(o, ask1) for o in buys] + [(o, bid1) for o in sells]:
+            try:
+                # 市价委托即时成交
+                if order.price_type == PriceType.MARKET.value:
+                    order.order_price = price
+                order.trade_price = price
+
+                # 订单成交
+                self.on_order_deal(order)
+            except Exception as e:
+                self.write_log(traceback.format_exc())
 
     def on_order_deal(self, order: Order):
         """订单成交"""
@@ -110,6 +134,14 @@ class Exchange:
 
         self.account_engine.orders_deal(order)
 
+    def on_orders_deal(self, orders: list):
+        """订单批量成交"""
+        for order in orders:
+            order.traded = order.volume
+            order.trade_type = self.turnover_mode
+
+        self.account_engine.orders_deal_batch(orders)
+
     def on_order_cancel(self, order: Order):
         """订单被取消"""
         self.account_engine.orders_cancel(order)
@@ -128,15 +160,18 @@ class Exchange:
         self.orders_book.update(orders_book)
         self.write_log(f"加载未处理订单共计：{str(len(self.orders_book))}条")
 
+    def on_closed_refuse(self, order: Order):
+        """市场关闭时拒绝订单，释放账户已冻结的资金及持仓"""
+        order.status = Status.REJECTED.value
+        order.error_msg = "交易关闭，自动拒单"
+        self.on_order_refused(order)
+        self.write_log("处理订单：账户：{}, 订单号：{}, 结果：{}".format(order.account_id, order.order_id, order.error_msg))
+
     def on_refused_all(self):
         """拒绝所有订单"""
         if self.orders_book:
             for order in self.orders_book.values():
-                order.status = Status.REJECTED.value
-                order.error_msg = "交易关闭，自动拒单"
-                self.on_order_refused(order)
-
-                self.write_log("处理订单：账户：{}, 订单号：{}, 结果：{}".format(order.account_id, order.order_id, order.error_msg))
+                self.on_closed_refuse(order)
 
         self.orders_book.clear()
 
@@ -148,8 +183,13 @@ class Exchange:
 
     def on_close(self):
         """模拟交易市场关闭"""
+        # 冻结账户不再接收新订单，直到下次开市
+        self.account_engine.frozen.set()
+
         # 关闭市场撮合
-        self._active = False
+        with self._book_lock:
+            self._active = False
+        self.wakeup()
 
         # 模拟交易结束，拒绝所有未成交的订单
         self.on_refused_all()
@@ -172,18 +212,7 @@ class Exchange:
 
     def time_verification(self):
         """交易时间验证"""
-        result = False
-        now = datetime.now().time()
-        time_dict = {"1": (time(9, 15), time(11, 30)), "2": (time(13, 0), time(15, 0))}
-        for k, time_check in time_dict.items():
-            if (now >= time_check[0]) and (now <= time_check[1]):
-                result = True
-
-        if now >= time(15, 0):
-            # 市场关闭
-            self.on_close()
-
-        return result
+        return self.session.is_open(datetime.now())
 
     def product_verification(self, order: Order):
         """交易产品验证"""
@@ -239,15 +268,23 @@ class BacktestMarket(Exchange):
 
         try:
             while self._active:
-                if self.orders_queue.empty():
+                try:
+                    orders = [self.orders_queue.get(block=True, timeout=1)]
+                except Empty:
                     continue
 
-                order = self.orders_queue.get(block=True)
+                # 每次唤醒后取出队列中所有待处理的订单
+                while True:
+                    try:
+                        orders.append(self.orders_queue.get_nowait())
+                    except Empty:
+                        break
 
                 # 订单成交
                 # 回测使用委托价格作为成交价格
-                order.trade_price = order.order_price
-                self.on_order_deal(order)
+                for order in orders:
+                    order.trade_price = order.order_price
+                self.on_orders_deal(orders)
 
         except Exception as e:
             event = Event(EVENT_ERROR, traceback.format_exc())
@@ -277,6 +314,14 @@ class ChinaAMarket(Exchange):
         self.exchange_symbols = ["SH", "SZ"]  # 交易市场标识
         self.turnover_mode = TradeType.T_PLUS1.value  # 回转交易模式
 
+    def reserve_price(self, order: Order):
+        """市价买入按涨停价冻结资金，行情获取失败时返回None"""
+        quotes = self.on_quotes_fetch([order.pt_symbol])
+        hq = quotes.get(order.pt_symbol) if quotes is not None else None
+        if hq is None or not hq["last_close"]:
+            return None
+        return limit_up_price(order.code, float(hq["last_close"]))
+
     def on_match(self):
         """交易撮合"""
         self.write_log("{}：交易市场已开启".format(self.market_name))
@@ -288,20 +333,32 @@ class ChinaAMarket(Exchange):
             self.load_data()
 
             while self._active:
-                # 交易时间检验
-                if not self.time_verification():
+                now = datetime.now()
+
+                # 收盘后关闭市场
+                if self.session.is_closed(now):
+                    self.on_close()
+                    break
+
+                # 非交易时段等待到下一个开盘时刻
+                if not self.session.is_open(now):
+                    self.on_wait(self.session.seconds_to_boundary(now))
                     continue
 
+                # 订单薄为空时等待新订单到达
                 if not self.orders_book:
+                    self.on_wait(self.session.seconds_to_boundary(now))
                     continue
 
-                # 复制交易簿
-                orders = copy.copy(self.orders_book)
-                for order_id, order in orders.items():
-                    sleep(1)
-                    # 订单撮合
-                    if self.on_orders_match(order):
-                        del self.orders_book[order_id]
+                # 每轮撮合只按订单薄中的证券批量获取一次行情
+                quotes = self.on_quotes_fetch(self.orders_book.symbols())
+                if quotes is not None:
+                    for symbol, hq in quotes.items():
+                        # 订单撮合
+                        self.on_symbol_match(symbol, hq)
+
+                # 等待行情刷新，期间有新订单到达时立即撮合
+                self.on_wait(min(SETTINGS["PERIOD"], self.session.seconds_to_boundary(datetime.now())))
 
         except Exception as e:
             event = Event(EVENT_ERROR, traceback.format_exc())
@@ -313,8 +370,7 @@ class ChinaAMarket(Exchange):
 
         # 取消订单的处理
         if order.order_type == OrderType.CANCEL.value:
-            if self.orders_book.get(order_id):
-                del self.orders_book[order_id]
+            if self.orders_book.pop(order_id):
                 self.on_order_cancel(order)
                 return True
             else:
@@ -326,14 +382,20 @@ class ChinaAMarket(Exchange):
             # 后端订单验证
             if not self.on_back_verification(order):
                 return False
-            else:
+            with self._book_lock:
+                # 市场已关闭时订单不再进入订单薄
+                if not self._active:
+                    self.on_closed_refuse(order)
+                    return False
+
                 # 更新订单状态及信息
                 order.status = Status.NOTTRADED.value
                 self.on_order_status_update(order)
                 self.write_log(f"收到订单:{order_id}")
-                # 将订单添加到订单薄
+                # 将订单添加到订单薄，并唤醒撮合线程
                 self.orders_book[order_id] = order
-                return True
+            self.wakeup()
+            return True
 
     def verification_register(self):
         """验证注册"""
@@ -0,0 +1,176 @@
+from bisect import bisect_right, insort
+from itertools import count
+from threading import RLock
+
+from ..utility.model import Order
+from ..utility.constant import OrderType, PriceType
+
+# 市价委托的排序价格，保证市价单排在同方向所有限价单之前
+MARKET_KEY = float("-inf")
+
+
+class SymbolBook:
+    """
+    单个证券的订单薄
+    买单按委托价格从高到低排序，卖单按委托价格从低到高排序，同价格按到达顺序排序
+    """
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.bids = []  # 买单排序键[(-委托价格, 序号)]
+        self.asks = []  # 卖单排序键[(委托价格, 序号)]
+        self.orders = dict()  # 排序键: 订单
+
+    def __len__(self):
+        return len(self.orders)
+
+    def add(self, order: Order, seq: int):
+        """添加订单，返回订单的排序键"""
+        is_market = order.price_type == PriceType.MARKET.value
+        if order.order_type == OrderType.BUY.value:
+            key = (MARKET_KEY if is_market else -order.order_price, seq)
+            insort(self.bids, key)
+        else:
+            key = (MARKET_KEY if is_market else order.order_price, seq)
+            insort(self.asks, key)
+
+        self.orders[key] = order
+        return key
+
+    def remove(self, key: tuple):
+        """删除订单"""
+        order = self.orders.pop(key)
+        side = self.bids if order.order_type == OrderType.BUY.value else self.asks
+        del side[bisect_right(side, key) - 1]
+        return order
+
+    def cut(self, ask1: float, bid1: float):
+        """
+        按对手价切出所有可成交的订单
+        :param ask1: 卖一价，为0时表示无卖盘（涨停），不撮合买单
+        :param bid1: 买一价，为0时表示无买盘（跌停），不撮合卖单
+        :return: 可成交的买单列表与卖单列表
+        """
+        buys, sells = [], []
+
+        if ask1:
+            n = bisect_right(self.bids, (-ask1, float("inf")))
+            buys = [self.orders.pop(key) for key in self.bids[:n]]
+            del self.bids[:n]
+
+        if bid1:
+            n = bisect_right(self.asks, (bid1, float("inf")))
+            sells = [self.orders.pop(key) for key in self.asks[:n]]
+            del self.asks[:n]
+
+        return buys, sells
+
+
+class OrderBook:
+    """
+    订单薄
+    1、按pt_symbol分别维护价格排序的买卖订单；
+    2、通过订单编号索引直接定位订单，用于撤单；
+    3、保留订单编号到订单的字典接口，各线程可直接读写
+    """
+
+    def __init__(self):
+        self.books = dict()  # pt_symbol: SymbolBook
+        self.index = dict()  # 订单编号: (pt_symbol, 排序键)
+        self._seq = count()  # 订单到达序号
+        self._lock = RLock()
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, order_id):
+        return order_id in self.index
+
+    def __getitem__(self, order_id):
+        order = self.get(order_id)
+        if order is None:
+            raise KeyError(order_id)
+        return order
+
+    def __setitem__(self, order_id, order: Order):
+        with self._lock:
+            if order_id in self.index:
+                self.pop(order_id)
+
+            book = self.books.get(order.pt_symbol)
+            if book is None:
+                book = SymbolBook(order.pt_symbol)
+                self.books[order.pt_symbol] = book
+
+            key = book.add(order, next(self._seq))
+            self.index[order_id] = (order.pt_symbol, key)
+
+    def __delitem__(self, order_id):
+        if self.pop(order_id) is None:
+            raise KeyError(order_id)
+
+    def get(self, order_id, default=None):
+        """查询订单"""
+        with self._lock:
+            location = self.index.get(order_id)
+            if location is None:
+                return default
+
+            symbol, key = location
+            return self.books[symbol].orders[key]
+
+    def pop(self, order_id, default=None):
+        """删除并返回订单"""
+        with self._lock:
+            location = self.index.pop(order_id, None)
+            if location is None:
+                return default
+
+            symbol, key = location
+            book = self.books[symbol]
+            order = book.remove(key)
+            if not book:
+                del self.books[symbol]
+
+            return order
+
+    def update(self, orders: dict):
+        """批量添加订单"""
+        with self._lock:
+            for order_id, order in orders.items():
+                self[order_id] = order
+
+    def values(self):
+        """所有订单（快照）"""
+        with self._lock:
+            return [order for book in self.books.values() for order in book.orders.values()]
+
+    def symbols(self):
+        """订单薄中所有证券（快照）"""
+        with self._lock:
+            return list(self.books.keys())
+
+    def clear(self):
+        """清空订单薄"""
+        with self._lock:
+            self.books.clear()
+            self.index.clear()
+
+    def match(self, symbol: str, ask1: float, bid1: float):
+        """
+        按行情撮合某一证券
+        :return: 从订单薄中移除的可成交买单列表与卖单列表
+        """
+        with self._lock:
+            book = self.books.get(symbol)
+            if book is None:
+                return [], []
+
+            buys, sells = book.cut(ask1, bid1)
+            for order in buys + sells:
+                del self.index[order.order_id]
+
+            if not book:
+                del self.books[symbol]
+
+            return buys, sells
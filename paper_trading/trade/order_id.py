@@ -0,0 +1,43 @@
+from time import time_ns
+from threading import Lock
+
+# 每秒的微秒数
+US = 1000000
+
+
+def order_id_to_us(order_id: str):
+    """订单编号转换为微秒时间，无法转换时为0"""
+    try:
+        sec, _, frac = str(order_id).partition(".")
+        return int(sec) * US + int((frac + "000000")[:6])
+    except ValueError:
+        return 0
+
+
+class OrderIdGenerator:
+    """
+    订单编号生成器
+    1、编号格式与原有的time.time()一致，为"秒.微秒"，可按时间排序；
+    2、编号取当前微秒时间与上一编号加1中的较大值，同一引擎内单调递增且不重复；
+    3、以已持久化订单中的最大编号为起点，重启或时钟回拨后也不会重复
+    """
+
+    def __init__(self):
+        self._last = 0  # 上一个编号的微秒时间
+        self._lock = Lock()
+
+    def seed(self, order_id: str):
+        """以已有的订单编号为起点"""
+        us = order_id_to_us(order_id)
+        with self._lock:
+            if us > self._last:
+                self._last = us
+
+    def next(self):
+        """生成新的订单编号"""
+        now = time_ns() // 1000
+        with self._lock:
+            us = now if now > self._last else self._last + 1
+            self._last = us
+
+        return f"{us // US}.{us % US:06d}"
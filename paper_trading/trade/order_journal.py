@@ -0,0 +1,119 @@
+import numpy as np
+
+from .record_store import RecordStore
+from ..utility.model import Order
+from ..utility.constant import OrderType, Status
+
+# 订单方向编码
+SIDE_CODES = {t.value: i for i, t in enumerate(OrderType)}
+
+# 订单状态编码
+STATUS_CODES = {s.value: i for i, s in enumerate(Status)}
+
+# 订单流水字段
+ORDER_JOURNAL_COLUMNS = {
+    "order_id": object,
+    "date": "i4",
+    "symbol": "i4",
+    "side": "i1",
+    "price": "f8",
+    "volume": "f8",
+    "traded": "f8",
+    "status": "i1",
+}
+
+
+def date_to_int(date: str):
+    """YYYYMMDD格式的日期转换为整数，无法转换时为0"""
+    try:
+        return int(date)
+    except (TypeError, ValueError):
+        return 0
+
+
+class OrderJournal:
+    """
+    列式订单流水
+    1、每个账户一份，按日期、证券编号、方向、价格、数量及状态分列保存订单；
+    2、按日期区间、证券及状态向量化筛选并分页，返回订单编号；
+    3、订单对象仍保存在Trader.orders中，只对当前页的订单生成字典
+    """
+
+    def __init__(self):
+        self.store = RecordStore(ORDER_JOURNAL_COLUMNS)
+        self.rows = dict()  # 订单编号: 行号
+        self.symbols = list()  # 证券编号: pt_symbol
+        self.symbol_ids = dict()  # pt_symbol: 证券编号
+
+    def __len__(self):
+        return len(self.store)
+
+    def __symbol_id(self, symbol: str):
+        """证券编号，新证券自动分配"""
+        symbol_id = self.symbol_ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = len(self.symbols)
+            self.symbols.append(symbol)
+            self.symbol_ids[symbol] = symbol_id
+        return symbol_id
+
+    def record(self, order: Order):
+        """记录新订单或更新已有订单"""
+        values = {
+            "date": date_to_int(order.order_date),
+            "symbol": self.__symbol_id(order.pt_symbol),
+            "side": SIDE_CODES.get(order.order_type, -1),
+            "price": order.order_price,
+            "volume": order.volume,
+            "traded": order.traded,
+            "status": STATUS_CODES.get(order.status, -1),
+        }
+
+        row = self.rows.get(order.order_id)
+        if row is None:
+            values["order_id"] = order.order_id
+            self.rows[order.order_id] = self.store.append(values)
+        else:
+            self.store.set(row, **values)
+
+    def extend(self, orders):
+        """批量记录订单"""
+        for order in orders:
+            self.record(order)
+
+    def query(self, start=None, end=None, symbol=None, status=None, offset: int = 0, limit: int = None):
+        """
+        筛选订单
+        :param start: 开始日期YYYYMMDD
+        :param end: 结束日期YYYYMMDD
+        :param symbol: pt_symbol
+        :param status: 订单状态
+        :param offset: 分页起始位置
+        :param limit: 分页大小，为空时返回全部
+        :return: 符合条件的订单总数, 当前页的订单编号列表
+        """
+        mask = np.ones(len(self.store), dtype=bool)
+
+        if start:
+            mask &= self.store.column("date") >= date_to_int(start)
+        if end:
+            mask &= self.store.column("date") <= date_to_int(end)
+        if symbol:
+            if symbol not in self.symbol_ids:
+                return 0, []
+            mask &= self.store.column("symbol") == self.symbol_ids[symbol]
+        if status:
+            if status not in STATUS_CODES:
+                return 0, []
+            mask &= self.store.column("status") == STATUS_CODES[status]
+
+        rows = np.flatnonzero(mask)
+        total = len(rows)
+        rows = rows[offset : offset + limit] if limit else rows[offset:]
+
+        return total, self.store.column("order_id")[rows].tolist()
+
+    def clear(self):
+        """清空订单流水"""
+        self.store.clear()
+        self.rows.clear()
@@ -0,0 +1,194 @@
+from time import monotonic
+from threading import Lock
+
+from pymongo import InsertOne, ReplaceOne, UpdateOne, DeleteMany
+from pymongo.errors import BulkWriteError
+
+from ..utility.model import DBData
+
+
+class PendingUpdate:
+    """缓冲区中待合并的$set更新"""
+
+    __slots__ = ("flt", "values")
+
+    def __init__(self, flt: dict, values: dict):
+        self.flt = flt
+        self.values = dict(values)
+
+    def to_request(self):
+        """转换为写操作"""
+        return UpdateOne(self.flt, {"$set": self.values})
+
+
+class WriteBehindDB:
+    """
+    写缓冲数据库
+    1、接口与MongoDBService一致，db_model的写操作只记录到缓冲区，读操作直接访问数据库；
+    2、flush时按集合合并为一次bulk_write，同一集合内保持写入顺序；
+    3、同一集合内条件相同的$set更新合并为一次，只写入最新的字段值；
+    4、记录最早未写入操作的时间，用于度量持久化延迟
+    """
+
+    def __init__(self, db):
+        self.db = db  # 数据库实例
+        self._pending = dict()  # (数据库名, 集合名): [写操作]
+        self._updates = dict()  # (数据库名, 集合名): (条件字段, {条件: 待合并的更新})
+        self._since = None  # 最早未写入操作的时间
+        self._lock = Lock()
+
+        self.flushed = 0  # 累计写入的操作数
+        self.coalesced = 0  # 累计合并的更新数
+        self.last_flush_ops = 0  # 最近一次写入的操作数
+        self.last_flush_time = 0.0  # 最近一次写入耗时
+        self.max_lag = 0.0  # 写入时的最大延迟
+
+    def __getattr__(self, name):
+        """读操作及其他接口直接使用数据库实例"""
+        return getattr(self.db, name)
+
+    def _add(self, pt_db: DBData, *requests):
+        """记录写操作，插入、替换及删除之后的更新不再与之前的更新合并"""
+        key = (pt_db.db_name, pt_db.db_cl)
+        with self._lock:
+            self._pending.setdefault(key, []).extend(requests)
+            self._updates.pop(key, None)
+            if self._since is None:
+                self._since = monotonic()
+        return True
+
+    def _add_update(self, pt_db: DBData):
+        """
+        记录更新操作
+        1、只有$set的更新按条件合并，后写入的字段值覆盖先前的值；
+        2、集合内条件字段与之前不同时不合并，保证合并的更新只作用于同一条数据；
+        3、更新了条件字段的更新之后不再合并，如持仓记录清仓后is_clear不再为0
+        """
+        flt, doc = pt_db.raw_data["flt"], pt_db.raw_data["set"]
+        try:
+            fields = frozenset(flt)
+            flt_key = tuple(sorted(flt.items()))
+            hash(flt_key)
+        except TypeError:
+            return self._add(pt_db, UpdateOne(flt, doc))
+        if len(doc) != 1 or "$set" not in doc:
+            return self._add(pt_db, UpdateOne(flt, doc))
+
+        key = (pt_db.db_name, pt_db.db_cl)
+        with self._lock:
+            index = self._updates.get(key)
+            if index is None or index[0] != fields:
+                index = self._updates[key] = (fields, dict())
+
+            update = index[1].get(flt_key)
+            if update is None:
+                update = PendingUpdate(flt, doc["$set"])
+                self._pending.setdefault(key, []).append(update)
+                index[1][flt_key] = update
+            else:
+                update.values.update(doc["$set"])
+                self.coalesced += 1
+
+            if not fields.isdisjoint(doc["$set"]):
+                del index[1][flt_key]
+            if self._since is None:
+                self._since = monotonic()
+        return True
+
+    def on_insert(self, pt_db: DBData):
+        """插入数据"""
+        return self._add(pt_db, InsertOne(pt_db.raw_data["data"].to_dict()))
+
+    def on_insert_many(self, pt_db: DBData):
+        """批量插入数据"""
+        return self._add(pt_db, *[InsertOne(row) for row in pt_db.raw_data["data"]])
+
+    def on_replace_one(self, pt_db: DBData):
+        """替换数据，不存在时插入"""
+        return self._add(pt_db, ReplaceOne(pt_db.raw_data["flt"], pt_db.raw_data["data"].to_dict(), upsert=True))
+
+    def on_update(self, pt_db: DBData):
+        """更新数据"""
+        return self._add_update(pt_db)
+
+    def on_delete(self, pt_db: DBData):
+        """删除数据"""
+        return self._add(pt_db, DeleteMany(pt_db.raw_data["flt"]))
+
+    def on_collection_delete(self, pt_db: DBData):
+        """删除集合前先写入缓冲区中的操作"""
+        self.flush()
+        return self.db.on_collection_delete(pt_db)
+
+    @property
+    def pending(self):
+        """缓冲区中未写入的操作数"""
+        with self._lock:
+            return sum(len(requests) for requests in self._pending.values())
+
+    @property
+    def lag(self):
+        """最早未写入操作已等待的秒数"""
+        since = self._since
+        return monotonic() - since if since is not None else 0.0
+
+    def flush(self):
+        """
+        写入缓冲区中的所有操作
+        写入失败的操作放回缓冲区，下次写入时重试
+        :return: 写入的操作数
+        """
+        with self._lock:
+            pending, self._pending = self._pending, dict()
+            since, self._since = self._since, None
+            self._updates.clear()
+
+        if not pending:
+            return 0
+
+        start = monotonic()
+        done = 0
+        failed = dict()
+        error = None
+        for (db_name, db_cl), requests in pending.items():
+            requests = [r.to_request() if isinstance(r, PendingUpdate) else r for r in requests]
+            try:
+                self.db.on_bulk_write(DBData(db_name=db_name, db_cl=db_cl, raw_data={"data": requests}))
+                done += len(requests)
+            except BulkWriteError as e:
+                # 有序写入在第一个错误处停止，之前的操作已写入
+                index = e.details["writeErrors"][0]["index"]
+                done += index
+                failed[(db_name, db_cl)] = requests[index + 1 :]
+                error = e
+            except Exception as e:
+                failed[(db_name, db_cl)] = requests
+                error = e
+
+        end = monotonic()
+        self.flushed += done
+        self.last_flush_ops = done
+        self.last_flush_time = end - start
+        self.max_lag = max(self.max_lag, end - since)
+
+        if failed:
+            with self._lock:
+                for key, requests in self._pending.items():
+                    failed.setdefault(key, []).extend(requests)
+                self._pending = failed
+                self._since = since
+            raise error
+
+        return done
+
+    def stats(self):
+        """持久化延迟统计"""
+        return {
+            "pending": self.pending,
+            "lag": round(self.lag, 3),
+            "max_lag": round(self.max_lag, 3),
+            "flushed": self.flushed,
+            "coalesced": self.coalesced,
+            "last_flush_ops": self.last_flush_ops,
+            "last_flush_time": round(self.last_flush_time, 3),
+        }
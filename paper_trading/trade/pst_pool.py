@@ -0,0 +1,215 @@
+from zlib import crc32
+from time import monotonic
+from queue import Queue, Empty, Full
+from collections import deque
+from threading import Thread, Event, Lock, Condition
+
+from .persistence import WriteBehindDB
+
+
+class PersistenceWorker:
+    """
+    持久化工作线程
+    1、从有界队列中批量取出写任务，执行db_model函数写入自身的写缓冲区，缓冲区内合并同一数据的更新；
+    2、写入间隔为0时每批任务写入一次数据库，否则按间隔定时写入；
+    3、写入失败的操作保留在缓冲区中，间隔1秒后重试；
+    4、队列已满时任务暂存到溢出列表，工作线程按顺序取回，积压数量计入统计；
+    5、溢出列表达到上限时入队阻塞，直到工作线程取回任务，阻塞次数计入统计；持久化任务不能丢弃，以阻塞限制内存占用
+    """
+
+    # 写入失败后的重试间隔（秒）
+    RETRY_INTERVAL = 1.0
+
+    def __init__(self, index: int, db, queue_size: int, batch_size: int, interval: float, on_error, overflow_limit: int = 100000):
+        self.index = index
+        self.buffer = WriteBehindDB(db)  # 写缓冲区
+        self.queue = Queue(maxsize=max(int(queue_size), 1))  # 写任务队列，元素为(入队时间, 函数, 数据)
+        self.batch_size = max(int(batch_size), 1)  # 每批处理的任务数
+        self.interval = interval  # 写入间隔（秒）
+        self.on_error = on_error  # 错误回调
+
+        self.processed = 0  # 累计处理的任务数
+        self.errors = 0  # 累计错误数
+        self.spilled = 0  # 累计进入溢出列表的任务数
+        self.blocked = 0  # 累计因溢出列表已满而阻塞的入队次数
+        self.overflow = deque()  # 溢出列表，队列已满时暂存的任务
+        self.overflow_limit = max(int(overflow_limit), 1)  # 溢出列表的最大长度
+        self._overflow_lock = Lock()
+        self._overflow_space = Condition(self._overflow_lock)  # 溢出列表有空位的通知
+        self._failed = False  # 上次写入是否失败
+
+        self._thread = Thread(target=self._run, name=f"PersistenceWorker{index}", daemon=True)
+        self._thread.start()
+
+    def put(self, fn, data):
+        """写任务入队，只在溢出列表已满时阻塞调用线程"""
+        self._put((monotonic(), fn, data))
+
+    def _put(self, item):
+        """溢出列表不为空时任务排在溢出列表之后，保证写入顺序"""
+        with self._overflow_lock:
+            if len(self.overflow) >= self.overflow_limit:
+                self.blocked += 1
+                self.on_error(f"持久化队列{self.index}溢出列表已满，等待写入")
+                self._overflow_space.wait_for(lambda: len(self.overflow) < self.overflow_limit)
+
+            if not self.overflow:
+                try:
+                    self.queue.put_nowait(item)
+                    return
+                except Full:
+                    self.on_error(f"持久化队列{self.index}已满，任务暂存到溢出列表")
+            self.overflow.append(item)
+            self.spilled += 1
+
+    def _refill(self):
+        """将溢出列表中的任务按顺序移回队列"""
+        with self._overflow_lock:
+            while self.overflow:
+                try:
+                    self.queue.put_nowait(self.overflow[0])
+                except Full:
+                    break
+                self.overflow.popleft()
+                self._overflow_space.notify_all()
+
+    def _wait_time(self):
+        """等待新任务的最长时间，缓冲区为空时一直等待"""
+        if self._failed:
+            return self.RETRY_INTERVAL
+        if self.interval > 0 and self.buffer.pending:
+            return max(self.interval - self.buffer.lag, 0)
+        return None
+
+    def _run(self):
+        """批量处理写任务"""
+        active = True
+        while active:
+            self._refill()
+            try:
+                items = [self.queue.get(timeout=self._wait_time())]
+            except Empty:
+                items = []
+            while len(items) < self.batch_size:
+                try:
+                    items.append(self.queue.get_nowait())
+                except Empty:
+                    break
+
+            # 控制任务：数据为Event时写入后通知，数据为None时写入后退出
+            waiters = []
+            for _, fn, data in items:
+                if fn is not None:
+                    try:
+                        fn(data, self.buffer)
+                    except Exception as e:
+                        self.errors += 1
+                        self.on_error(f"持久化任务{getattr(fn, '__name__', fn)}执行失败：{e}")
+                    self.processed += 1
+                elif data is None:
+                    active = False
+                else:
+                    waiters.append(data)
+
+            if waiters or not active or self.interval <= 0 or self.buffer.lag >= self.interval:
+                self._flush()
+
+            for waiter in waiters:
+                waiter.set()
+
+    def _flush(self):
+        """写入缓冲区"""
+        try:
+            self.buffer.flush()
+            self._failed = False
+        except Exception as e:
+            self._failed = True
+            self.errors += 1
+            self.on_error(f"持久化写入失败：{e}")
+
+    def flush(self):
+        """请求写入队列及缓冲区中的所有操作，返回完成通知"""
+        waiter = Event()
+        self._put((monotonic(), None, waiter))
+        return waiter
+
+    def close(self):
+        """处理完队列中的任务后退出"""
+        self._put((monotonic(), None, None))
+        self._thread.join()
+
+    @property
+    def lag(self):
+        """最早未写入任务已等待的秒数"""
+        with self.queue.mutex:
+            since = self.queue.queue[0][0] if self.queue.queue else None
+        queued = monotonic() - since if since is not None else 0.0
+        return max(queued, self.buffer.lag)
+
+    def stats(self):
+        """工作线程统计"""
+        stats = self.buffer.stats()
+        stats.update(
+            queued=self.queue.qsize(),
+            overflow=len(self.overflow),
+            lag=round(self.lag, 3),
+            processed=self.processed,
+            errors=self.errors,
+            spilled=self.spilled,
+            blocked=self.blocked,
+        )
+        return stats
+
+
+class PersistencePool:
+    """
+    持久化工作线程池
+    1、持久化任务按账户分配到固定的工作线程，同一账户的写操作保持顺序；
+    2、事件引擎线程只负责入队，数据库变慢时增加持久化延迟及积压，积压超过溢出列表上限时才阻塞事件引擎；
+    3、关闭后提交的任务直接写入数据库，如关闭时仍在事件队列中的持久化事件
+    """
+
+    def __init__(self, db, workers: int, queue_size: int, batch_size: int, interval: float = 0, on_error=None, overflow_limit: int = 100000):
+        self.db = db  # 数据库实例
+        self.closed = False  # 是否已关闭
+        self.workers = [
+            PersistenceWorker(i, db, queue_size, batch_size, interval, on_error or (lambda msg: None), overflow_limit) for i in range(max(int(workers), 1))
+        ]
+
+    def worker(self, token: str):
+        """账户所属的工作线程"""
+        return self.workers[crc32(token.encode()) % len(self.workers)]
+
+    def put(self, token: str, fn, data):
+        """提交账户的写任务，fn(data, db)为db_model函数"""
+        if self.closed:
+            fn(data, self.db)
+        else:
+            self.worker(token).put(fn, data)
+
+    def flush(self, timeout: float = None):
+        """
+        写入所有已提交的任务并等待完成
+        :return: 是否在超时前完成
+        """
+        if self.closed:
+            return True
+        waiters = [worker.flush() for worker in self.workers]
+        return all(waiter.wait(timeout) for waiter in waiters)
+
+    def close(self):
+        """处理完所有任务后关闭工作线程"""
+        self.closed = True
+        for worker in self.workers:
+            worker.close()
+
+    def stats(self):
+        """持久化统计，lag及max_lag取各工作线程的最大值，其余为合计"""
+        workers = [worker.stats() for worker in self.workers]
+        stats = {
+            key: sum(s[key] for s in workers) for key in ("queued", "overflow", "pending", "processed", "errors", "spilled", "blocked", "flushed", "coalesced")
+        }
+        stats["lag"] = max(s["lag"] for s in workers)
+        stats["max_lag"] = max(s["max_lag"] for s in workers)
+        stats["workers"] = workers
+        return stats
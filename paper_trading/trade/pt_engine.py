@@ -5,14 +5,15 @@ from queue import Empty, Queue
 from threading import Thread
 from email.message import EmailMessage
 
-from ..event import EventEngine, Event
+from ..event import EventEngine, Event, EVENT_TIMER
 from ..api.db import MongoDBService
-from ..api.pytdx_api import PYTDXService
+from ..api.pytdx_api import PYTDXService, QuoteCache
 from ..utility.setting import SETTINGS
 from ..utility.model import LogData
 from ..utility.event import EVENT_LOG, EVENT_ERROR, EVENT_MARKET_CLOSE
-from paper_trading.utility.constant import PersistanceMode
+from paper_trading.utility.constant import PersistanceMode, DBLayout, OrderType
 from paper_trading.trade.market import ChinaAMarket
+from paper_trading.trade.session import trading_calendar
 from paper_trading.trade.account_engine import AccountEngine
 
 
@@ -33,6 +34,8 @@ class MainEngine:
         self._market = market  # 交易市场
         self.account_engine = None  # 账户引擎
         self.order_put = None  # 订单回调函数
+        self.quote_cache = None  # 行情缓存，所有行情源实例共享
+        self.stats_timer = 0  # 距上次输出行情缓存统计的秒数
 
         # 更新参数
         self._settings.update(param)
@@ -57,6 +60,7 @@ class MainEngine:
         """注册事件监听"""
         self.event_engine.register(EVENT_ERROR, self.process_error_event)
         self.event_engine.register(EVENT_MARKET_CLOSE, self.process_market_close)
+        self.event_engine.register(EVENT_TIMER, self.process_timer)
 
     def start(self):
         """引擎初始化"""
@@ -68,6 +72,10 @@ class MainEngine:
         # 持久化配置
         if self._settings["PERSISTENCE_MODE"] == PersistanceMode.REALTIME:
             self.pst_active = True
+        elif self._settings["PERSISTENCE_MODE"] == PersistanceMode.TIMING:
+            if not self._settings["P_TIMING"] or self._settings["P_TIMING"] <= 0:
+                raise ValueError("定时持久化时间间隔参数错误")
+            self.pst_active = True
         elif self._settings["PERSISTENCE_MODE"] == PersistanceMode.MANUAL:
             self.pst_active = False
         else:
@@ -76,11 +84,14 @@ class MainEngine:
         # 连接数据库
         db = self.creat_db()
 
+        # 交易日历从数据库按年份加载
+        trading_calendar.bind(db.db_client)
+
         # 连接行情
         hq_client = self.creat_hq_api()
 
         # 账户引擎启动
-        self.account_engine = AccountEngine(self.event_engine, self.pst_active, self._settings["LOAD_DATA_MODE"], db)
+        self.account_engine = AccountEngine(self.event_engine, self.pst_active, self._settings["LOAD_DATA_MODE"], db, self._settings["PERSISTENCE_MODE"])
         self.account_engine.start()
 
         # 默认使用ChinaAMarket
@@ -106,8 +117,12 @@ class MainEngine:
         """模拟交易引擎关闭"""
         # 关闭市场
         self._market._active = False
+        self._market.wakeup()
         self._thread.join()
 
+        # 关闭账户引擎，写入所有未持久化的数据
+        self.account_engine.close()
+
         self.__active = False
 
         self.write_log("模拟交易主引擎：关闭")
@@ -116,11 +131,19 @@ class MainEngine:
         """引擎工作参数检查"""
         if not self._settings["PERSISTENCE_MODE"]:
             raise ValueError("数据持久化参数未配置")
+        if self._settings["DB_LAYOUT"] not in [layout.value for layout in DBLayout] + list(DBLayout):
+            raise ValueError("数据库布局参数错误")
 
     def on_orders_arrived(self, order):
         """订单到达处理"""
         if self.__active:
-            status, msg = self.account_engine.orders_arrived(order)
+            # 市价买入按交易市场给出的价格上限冻结资金
+            reserve_price = None
+            if order.order_type == OrderType.BUY.value and not order.order_price:
+                reserve_price = self._market.reserve_price(order)
+                if reserve_price is None:
+                    return False, "无法获取市价买入的冻结价格"
+            status, msg = self.account_engine.orders_arrived(order, reserve_price)
             return status, msg
         else:
             return False, "交易市场关闭"
@@ -131,6 +154,13 @@ class MainEngine:
         self.write_log("{}: 交易市场闭市".format(market_name))
         self._close()
 
+    def process_timer(self, event):
+        """定期输出行情缓存统计"""
+        self.stats_timer += 1
+        if self.quote_cache and self.stats_timer >= self._settings["QUOTE_STATS_INTERVAL"]:
+            self.stats_timer = 0
+            self.write_log(f"行情缓存统计：{self.quote_cache.stats()}")
+
     def process_error_event(self, event):
         """系统错误处理"""
         msg = event.data
@@ -147,7 +177,10 @@ class MainEngine:
 
     def creat_hq_api(self):
         """实例化行情源"""
-        tdx = PYTDXService(self.creat_db().db_client)
+        if not self.quote_cache:
+            self.quote_cache = QuoteCache(self._settings["PERIOD"], self._settings["QUOTE_CACHE_IDLE"])
+
+        tdx = PYTDXService(self.creat_db().db_client, self.quote_cache)
         tdx.connect_api()
 
         return tdx
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+# 初始容量
+INIT_CAPACITY = 64
+
+
+class RecordStore:
+    """
+    列式记录存储
+    1、每个字段使用预先分配的NumPy数组保存，容量不足时成倍扩容，追加记录均摊O(1)；
+    2、按行号直接读写字段，按条件向量化查找行号；
+    3、按需生成DataFrame或字典列表，供查询及持久化使用；
+    4、指定索引字段时维护字段值到行号的索引，同一索引值只保留一行，再次写入时覆盖原有记录
+    """
+
+    def __init__(self, columns: dict, capacity: int = INIT_CAPACITY, index: str = None):
+        """
+        :param columns: 字段名: 数据类型，字符串字段使用object
+        :param capacity: 初始容量
+        :param index: 索引字段
+        """
+        self.columns = columns
+        self.index = index
+        self._rows = dict()  # 索引值: 行号
+        self._size = 0
+        self._capacity = capacity
+        self._data = {name: np.empty(capacity, dtype=dtype) for name, dtype in columns.items()}
+        self._defaults = {name: "" if np.dtype(dtype) == object else 0 for name, dtype in columns.items()}
+
+    def __len__(self):
+        return self._size
+
+    def _reserve(self, size: int):
+        """保证容量不小于size"""
+        if size <= self._capacity:
+            return
+
+        capacity = max(self._capacity * 2, size)
+        for name, dtype in self.columns.items():
+            data = np.empty(capacity, dtype=dtype)
+            data[: self._size] = self._data[name][: self._size]
+            self._data[name] = data
+        self._capacity = capacity
+
+    def append(self, record: dict):
+        """追加一条记录，返回行号；索引值已存在时覆盖原有记录"""
+        if self.index:
+            row = self._rows.get(record.get(self.index))
+            if row is not None:
+                self.set(row, **{name: record.get(name, self._defaults[name]) for name in self.columns})
+                return row
+
+        self._reserve(self._size + 1)
+
+        row = self._size
+        for name, data in self._data.items():
+            data[row] = record.get(name, self._defaults[name])
+        self._size += 1
+        if self.index:
+            self._rows[self._data[self.index][row]] = row
+
+        return row
+
+    def extend(self, records: list):
+        """批量追加记录"""
+        self._reserve(self._size + len(records))
+        for record in records:
+            self.append(record)
+
+    def lookup(self, value):
+        """按索引值查找行号，不存在时返回None"""
+        return self._rows.get(value)
+
+    def get(self, row: int, name: str):
+        """读取字段"""
+        return self._data[name][row]
+
+    def set(self, row: int, **values):
+        """修改字段"""
+        if self.index in values:
+            del self._rows[self._data[self.index][row]]
+            self._rows[values[self.index]] = row
+        for name, value in values.items():
+            self._data[name][row] = value
+
+    def column(self, name: str):
+        """字段数据视图"""
+        return self._data[name][: self._size]
+
+    def find(self, **conditions):
+        """查找所有字段值相等的行号"""
+        mask = np.ones(self._size, dtype=bool)
+        for name, value in conditions.items():
+            mask &= self.column(name) == value
+        return np.flatnonzero(mask)
+
+    def to_records(self):
+        """转换为字典列表"""
+        names = list(self.columns.keys())
+        values = [self.column(name).tolist() for name in names]
+        return [dict(zip(names, row)) for row in zip(*values)]
+
+    def to_frame(self):
+        """转换为DataFrame，指定索引字段时以该字段为索引"""
+        df = pd.DataFrame({name: self.column(name) for name in self.columns.keys()})
+        if self.index:
+            df.index = df[self.index].tolist()
+        return df
+
+    def clear(self):
+        """清空记录"""
+        self._size = 0
+        self._rows.clear()
@@ -0,0 +1,129 @@
+from datetime import datetime, date, time, timedelta
+
+from ..utility.setting import SETTINGS
+
+# 中国A股交易时段
+CHINA_A_SESSIONS = [(time(9, 15), time(11, 30)), (time(13, 0), time(15, 0))]
+
+# 时段结束时间所在的一秒仍可交易，如11:30:00至11:30:00.999999
+SESSION_END_GRACE = timedelta(seconds=1)
+
+# 查找下一个交易日的最大天数
+MAX_SEARCH_DAYS = 366
+
+
+class TradingCalendar:
+    """
+    交易日历
+    1、休市日期由tasks.stocks.sync_data同步到数据库，按年份加载并缓存；
+    2、数据库中没有的年份只使用设置中的休市日期，周末默认休市；
+    3、同步交易日历后清空缓存，下次查询时重新加载
+    """
+
+    def __init__(self, holidays=None):
+        self.holidays = set(holidays or [])  # 设置中的休市日期YYYYMMDD
+        self.client = None  # mongo client
+        self._years = dict()  # 年份: 休市日期集合
+
+    def bind(self, client):
+        """绑定数据库并清空缓存"""
+        self.client = client
+        self.clear()
+
+    def clear(self):
+        """清空缓存"""
+        self._years = dict()
+
+    def load(self, year: int):
+        """从数据库加载某年的休市日期"""
+        if self.client is None:
+            return set()
+        return {d["date"] for d in self.client["stocks"]["calendar"].find({"year": year, "is_open": 0}, {"_id": 0, "date": 1})}
+
+    def year_holidays(self, year: int):
+        """某年的休市日期，首次查询时加载"""
+        holidays = self._years.get(year)
+        if holidays is None:
+            try:
+                holidays = self.load(year)
+            except Exception:
+                # 数据库不可用时本年度只使用设置中的休市日期，同步后重新加载
+                holidays = set()
+            holidays |= {d for d in self.holidays if d.startswith(str(year))}
+            self._years[year] = holidays
+
+        return holidays
+
+    def is_trade_date(self, d: date):
+        """是否交易日"""
+        return d.weekday() < 5 and d.strftime("%Y%m%d") not in self.year_holidays(d.year)
+
+
+# 交易日历实例，交易市场与数据同步任务共用
+trading_calendar = TradingCalendar(SETTINGS["HOLIDAYS"])
+
+
+class TradingSession:
+    """
+    交易时段调度器
+    1、按交易日预先计算当日所有开盘、休市及收盘时刻；
+    2、交易日由交易日历判断；
+    3、撮合线程据此计算下一个时段边界，精确等待到开盘或收盘；
+    4、时段的开始及结束时间均可交易，如11:30及15:00整的订单
+    """
+
+    def __init__(self, sessions: list, calendar: TradingCalendar = None):
+        self.sessions = sessions  # 交易时段[(开始时间, 结束时间)]
+        self.calendar = calendar or TradingCalendar()  # 交易日历
+
+        self._date = None  # 当前计算的日期
+        self._instants = []  # 当日交易时段[(开始时刻, 结束时刻)]
+
+    def is_trade_date(self, d: date):
+        """是否交易日"""
+        return self.calendar.is_trade_date(d)
+
+    def instants(self, d: date):
+        """某日的交易时段时刻[(开始时刻, 结束时刻)]，结束时刻不含，非交易日为空"""
+        if d != self._date:
+            if self.is_trade_date(d):
+                self._instants = [(datetime.combine(d, start), datetime.combine(d, end) + SESSION_END_GRACE) for start, end in self.sessions]
+            else:
+                self._instants = []
+            self._date = d
+
+        return self._instants
+
+    def is_open(self, now: datetime):
+        """是否处于交易时段"""
+        for start, end in self.instants(now.date()):
+            if start <= now < end:
+                return True
+
+        return False
+
+    def is_closed(self, now: datetime):
+        """交易日是否已收盘"""
+        instants = self.instants(now.date())
+        return bool(instants) and now >= instants[-1][1]
+
+    def next_boundary(self, now: datetime):
+        """下一个开盘、休市或收盘时刻"""
+        for start, end in self.instants(now.date()):
+            if now < start:
+                return start
+            if now < end:
+                return end
+
+        # 当日已无交易时段，查找下一个交易日的开盘时刻
+        d = now.date()
+        for i in range(MAX_SEARCH_DAYS):
+            d += timedelta(days=1)
+            if self.is_trade_date(d):
+                return datetime.combine(d, self.sessions[0][0])
+
+        raise ValueError("交易日历中没有可用的交易日")
+
+    def seconds_to_boundary(self, now: datetime):
+        """距离下一个时段边界的秒数"""
+        return max((self.next_boundary(now) - now).total_seconds(), 0)
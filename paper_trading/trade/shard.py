@@ -0,0 +1,54 @@
+from zlib import crc32
+from threading import local
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class ShardExecutor:
+    """
+    按账户分片的执行器
+    1、每个分片为一个单线程执行器，同一账户固定分配到同一分片，账户的所有修改严格按提交顺序执行；
+    2、不同分片的账户并行处理，账户数据无需加锁；
+    3、在分片线程内再次提交同一分片的任务时直接执行，避免等待自身造成死锁
+    """
+
+    def __init__(self, workers: int):
+        self.workers = max(int(workers), 1)
+        self._local = local()
+        self._executors = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"AccountShard{i}", initializer=self._bind, initargs=(i,)) for i in range(self.workers)
+        ]
+
+    def _bind(self, index: int):
+        """记录当前线程所属的分片"""
+        self._local.index = index
+
+    def shard(self, token: str):
+        """账户所属的分片编号"""
+        return crc32(token.encode()) % self.workers
+
+    def submit(self, token: str, fn, *args, **kwargs):
+        """提交账户任务，返回Future"""
+        index = self.shard(token)
+        if getattr(self._local, "index", None) == index:
+            future = Future()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            return future
+
+        return self._executors[index].submit(fn, *args, **kwargs)
+
+    def call(self, token: str, fn, *args, **kwargs):
+        """执行账户任务并等待结果"""
+        return self.submit(token, fn, *args, **kwargs).result()
+
+    def drain(self):
+        """等待所有分片中已提交的任务执行完毕，分片继续可用"""
+        for future in [executor.submit(int) for executor in self._executors]:
+            future.result()
+
+    def shutdown(self, wait: bool = True):
+        """关闭所有分片"""
+        for executor in self._executors:
+            executor.shutdown(wait)
@@ -38,10 +38,17 @@ class PersistanceMode(Enum):
     """数据持久化模式"""
 
     REALTIME = "realtime"  # 实时持久化
-    TIMING = "timing"  # 定时持久化, 暂未实现
+    TIMING = "timing"  # 定时持久化
     MANUAL = "manual"  # 手动持久化
 
 
+class DBLayout(Enum):
+    """数据库布局"""
+
+    PER_ACCOUNT = "per_account"  # 每个账户一个集合
+    SINGLE = "single"  # 每类数据一个集合，按account_id区分账户
+
+
 class Direction(Enum):
     """
     Direction of order/trade/position.
@@ -1,17 +1,45 @@
+from sys import intern
 from logging import INFO
 from datetime import datetime
-from dataclasses import dataclass
+from dataclasses import dataclass, field, fields
 
 from ..utility.constant import Status
 
 
+def slots(cls):
+    """
+    为数据类添加__slots__
+    实例不再创建__dict__，数据量大的订单、持仓等对象内存占用显著降低
+    """
+    names = tuple(f.name for f in fields(cls))
+    cls_dict = dict(cls.__dict__)
+    for name in names:
+        cls_dict.pop(name, None)
+    cls_dict.pop("__dict__", None)
+    cls_dict.pop("__weakref__", None)
+    cls_dict["__slots__"] = names
+
+    return type(cls)(cls.__name__, cls.__bases__, cls_dict)
+
+
+def make_symbol(code: str, exchange: str):
+    """生成pt_symbol，同一证券共用一个字符串对象"""
+    return intern(f"{code}.{exchange}")
+
+
 @dataclass
 class BaseData(object):
     """
     数据的基础类，其他数据类继承于此
     """
 
-    pass
+    __slots__ = ()
+
+    def to_dict(self):
+        """转换为字典，替代__dict__用于序列化；未使用@slots的数据类（如LogData、DBData）直接复制__dict__"""
+        if hasattr(self, "__dict__"):
+            return dict(self.__dict__)
+        return {name: getattr(self, name) for name in self.__slots__}
 
 
 @dataclass
@@ -34,6 +62,7 @@ class LogData(BaseData):
         self.log_time = datetime.now()  # 日志生成时间
 
 
+@slots
 @dataclass
 class Account(BaseData):
     """账户数据类"""
@@ -49,6 +78,7 @@ class Account(BaseData):
     account_info: str = ""  # 账户描述信息
 
 
+@slots
 @dataclass
 class AccountRecord(BaseData):
     """账户数据记录"""
@@ -60,6 +90,7 @@ class AccountRecord(BaseData):
     market_value: float = 0  # 总市值
 
 
+@slots
 @dataclass
 class Position(BaseData):
     """持仓数据类"""
@@ -73,12 +104,14 @@ class Position(BaseData):
     buy_price: float = 0  # 买入均价
     now_price: float = 0  # 当前价格
     profit: float = 0  # 收益
+    pt_symbol: str = field(default="", init=False)
 
     def __post_init__(self):
         """"""
-        self.pt_symbol = f"{self.code}.{self.exchange}"
+        self.pt_symbol = make_symbol(self.code, self.exchange)
 
 
+@slots
 @dataclass
 class PosRecord(BaseData):
     """持仓记录"""
@@ -93,12 +126,14 @@ class PosRecord(BaseData):
     sell_price_mean: float = 0  # 卖出均价
     profit: float = 0  # 收益
     is_clear: int = 0  # 是否清仓
+    pt_symbol: str = field(default="", init=False)
 
     def __post_init__(self):
         """"""
-        self.pt_symbol = f"{self.code}.{self.exchange}"
+        self.pt_symbol = make_symbol(self.code, self.exchange)
 
 
+@slots
 @dataclass
 class Order(BaseData):
     """订单数据类"""
@@ -118,7 +153,8 @@ class Order(BaseData):
     order_date: str = ""
     order_time: str = ""
     error_msg: str = ""
+    pt_symbol: str = field(default="", init=False)
 
     def __post_init__(self):
         """"""
-        self.pt_symbol = f"{self.code}.{self.exchange}"
+        self.pt_symbol = make_symbol(self.code, self.exchange)
@@ -15,17 +15,46 @@ SETTINGS = {
     "VOLUME_SIMULATION": False,
     # 是否开启账户与持仓信息的验证
     "VERIFICATION": True,
-    # 引擎撮合速度（秒）
+    # 引擎撮合速度（秒），同时也是行情缓存的有效期
     # 设置此参数时请参考行情的刷新速度
     "PERIOD": 3,
+    # 行情缓存的闲置时间（秒），超过该时间未被请求的证券从缓存中清理
+    "QUOTE_CACHE_IDLE": 60,
+    # 行情缓存统计的输出间隔（秒）
+    "QUOTE_STATS_INTERVAL": 300,
+    # 证券列表的有效天数，超过该天数未同步时下单不检查证券是否存在
+    "SECURITY_MAX_DAYS": 4,
+    # 交易日历：额外的休市日期列表（YYYYMMDD），周末默认休市
+    # 交易日历由数据同步任务从tushare同步到数据库，需设置TUSHARE_TOKEN
+    "HOLIDAYS": [],
+    # 账户分片执行器的线程数，账户的成交、撤单及收盘清算在所属分片内执行
+    "ACCOUNT_WORKERS": 4,
+    # 回测模式下按需加载历史数据时，每批从数据库读取的条数
+    "HISTORY_BATCH_SIZE": 1000,
     # 数据持久化模式
     # 实时持久化，会大幅降低整个模拟交易程序的执行效率，建议在手工交易时使用
     # 定时持久化，系统会在指定的时间间隔进行自动持久化，时间间隔越低，效率越低，建议进行低频程序化交易时使用
     # 手动持久化，系统会在接收到命令时进行持久化操作，建议在回测时使用
     "PERSISTENCE_MODE": "",
-    # 数据持久化时间间隔
-    # TODO 暂时没有实现相关功能
+    # 定时持久化的时间间隔（秒），收盘及程序关闭时会强制写入
     "P_TIMING": 0,
+    # 持久化工作线程数，同一账户的持久化任务在固定的线程内顺序写入
+    "PST_WORKERS": 4,
+    # 每个持久化工作线程的队列长度，队列已满时任务暂存到溢出列表，事件引擎不等待
+    "PST_QUEUE_SIZE": 10000,
+    # 每个持久化工作线程溢出列表的最大长度，达到上限时事件引擎等待写入，持久化任务不会丢弃
+    "PST_OVERFLOW_LIMIT": 100000,
+    # 持久化工作线程每批处理的任务数
+    "PST_BATCH_SIZE": 500,
+    # 持久化延迟超过写入间隔加此秒数时记录警告，同时也是检查间隔
+    "PST_LAG_WARNING": 10,
+    # 账户数据的数据库布局
+    # per_account：每个账户在各数据库中单独一个集合
+    # single：各数据库只有一个集合，通过account_id复合索引区分账户，适合账户数量较多时使用，旧数据可使用tasks/db_tools.py迁移
+    "DB_LAYOUT": "per_account",
+    # 启动时按当前数据库布局检查并创建查询所需的索引，按账户分集合时检查所有账户
+    # 账户数量很多时启动耗时增加，可关闭后使用tasks/db_tools.py的indexes命令创建
+    "ENSURE_INDEXES": True,
     # mongoDB 参数
     "MONGO_HOST": "",
     "MONGO_PORT": 0,
@@ -42,6 +71,14 @@ SETTINGS = {
     # pytdx行情参数（可以去各家券商下载通达信交易软件找到相关的地址）
     "TDX_HOST": "210.51.39.201",
     "TDX_PORT": 7709,
+    # 是否使用异步行情客户端，多服务器并行获取实时行情，慢请求自动向其他服务器补发
+    "TDX_ASYNC": False,
+    # 异步行情服务器列表[(ip, port)]，为空时从pytdx内置服务器列表中随机选取
+    "TDX_ASYNC_HOSTS": [],
+    # 随机选取的服务器数量
+    "TDX_ASYNC_HOST_NUM": 5,
+    # 每个服务器的连接数
+    "TDX_ASYNC_CONNECTIONS": 5,
     # 账户初始参数
     "CAPITAL": 1000000.00,  # 初始资金
     "COST": 0.0003,  # 交易佣金
@@ -0,0 +1,151 @@
+import logging
+import threading
+
+from paper_trading.utility.model import Order
+from paper_trading.utility.setting import SETTINGS
+from paper_trading.utility.constant import LoadDataMode, PersistanceMode, Status
+from paper_trading.trade.account_engine import AccountEngine
+from paper_trading.trade.market import ChinaAMarket
+from tests.test_orders_deal import FakeEventEngine, make_trader, buy
+
+
+class FakeEngine(FakeEventEngine):
+    def register(self, event_name, handler):
+        pass
+
+    def logs(self, level=logging.ERROR):
+        return [e.data.log_content for e in self.events if hasattr(e.data, "log_level") and e.data.log_level == level]
+
+
+def make_engine():
+    return AccountEngine(FakeEngine(), False, LoadDataMode.CREAT, None, PersistanceMode.MANUAL)
+
+
+def test_unknown_account_is_logged():
+    engine = make_engine()
+    order = Order(code="000001", exchange="SZSE", account_id="missing", order_type="buy", order_price=10.0, volume=100, order_id="1")
+
+    engine.orders_deal(order)
+    engine.orders_cancel(order)
+    engine.orders_deal_batch([order])
+
+    logs = engine.event_engine.logs()
+    assert len(logs) == 3
+    assert all("missing" in msg for msg in logs)
+
+
+def test_trader_error_is_logged():
+    engine = make_engine()
+    trader, _ = make_trader()
+    engine.trader_dict[trader.token] = trader
+
+    # 订单不在账户中，撤单处理失败
+    order = Order(code="000001", exchange="SZSE", account_id=trader.token, order_type="buy", order_price=10.0, volume=100, order_id="unknown")
+    engine.orders_cancel(order)
+
+    assert "订单撤销" in engine.event_engine.logs()[0]
+
+    # 其他订单正常处理
+    engine.orders_deal(buy(trader, 100))
+    assert trader.pos["000001.SZSE"].volume == 100
+
+
+def test_frozen_rejects_orders():
+    engine = make_engine()
+    engine.frozen.set()
+    assert engine.orders_arrived(Order(code="000001", exchange="SZSE", account_id="token")) == (False, "账户清算中，暂停接收订单")
+
+
+def test_liquidation_failure_is_per_account():
+    engine = make_engine()
+    good, _ = make_trader()
+    bad, _ = make_trader()
+    bad.token = "bad"
+
+    def fail(liq_date):
+        raise ValueError("boom")
+
+    bad.on_liquidation = fail
+    engine.trader_dict.update({good.token: good, bad.token: bad})
+
+    records = engine.liquidation(None)
+
+    assert [r.account_id for r in records] == [good.token]
+    assert "bad" in engine.event_engine.logs()[0]
+    # 清算完成后保持冻结，直到下次开市
+    assert engine.frozen.is_set()
+
+
+class FakeHq:
+    def close(self):
+        pass
+
+
+def test_orders_refused_after_market_close():
+    engine = make_engine()
+    market = ChinaAMarket(engine.event_engine, engine, FakeHq(), {})
+    market.on_init()
+    market.on_close()
+
+    order = Order(code="000001", exchange="SZ", account_id="token", order_type="buy", order_price=10.0, volume=100, order_id="1")
+    assert engine.frozen.is_set()
+    assert market.on_orders_arrived(order) is False
+    assert order.status == Status.REJECTED.value
+    assert not market.orders_book
+
+    # 下次开市时解除冻结
+    market.on_init()
+    assert not engine.frozen.is_set()
+
+
+class IndexDB:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.indexes = []
+
+    def on_collections_query(self, db_data):
+        return self.tokens
+
+    def on_create_index(self, db_data):
+        self.indexes.append((db_data.db_name, db_data.db_cl))
+
+
+def test_start_ensures_per_account_indexes(monkeypatch):
+    monkeypatch.setitem(SETTINGS, "DB_LAYOUT", "per_account")
+    db = IndexDB(["a", "b"])
+    AccountEngine(FakeEngine(), False, LoadDataMode.CREAT, db, PersistanceMode.MANUAL).start()
+
+    assert {cl for _, cl in db.indexes} == {"a", "b"}
+
+    # 关闭ENSURE_INDEXES时启动不创建索引
+    monkeypatch.setitem(SETTINGS, "ENSURE_INDEXES", False)
+    db = IndexDB(["a"])
+    AccountEngine(FakeEngine(), False, LoadDataMode.CREAT, db, PersistanceMode.MANUAL).start()
+    assert not db.indexes
+
+
+class ThreadRecordingDict(dict):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.threads = set()
+
+    def values(self):
+        self.threads.add(threading.current_thread().name)
+        return super().values()
+
+
+def test_queries_run_in_account_shard():
+    engine = make_engine()
+    trader, _ = make_trader()
+    engine.trader_dict[trader.token] = trader
+    engine.orders_deal(buy(trader, 100))
+
+    trader.orders = ThreadRecordingDict(trader.orders)
+    trader.pos = ThreadRecordingDict(trader.pos)
+    status, orders = engine.query_orders_today(trader.token)
+    assert status and len(orders) == 1
+    status, pos = engine.query_pos_data(trader.token)
+    assert status and pos[0]["volume"] == 100
+
+    # 读取在账户所属分片的线程内执行，不与分片内的修改并发
+    assert all(name.startswith("AccountShard") for name in trader.orders.threads | trader.pos.threads)
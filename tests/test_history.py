@@ -0,0 +1,102 @@
+from paper_trading.utility.setting import SETTINGS
+from paper_trading.utility.constant import LoadDataMode
+from paper_trading.trade.account import Trader
+from tests.test_orders_deal import FakeEventEngine, make_trader
+from tests.test_model import order_doc
+
+
+def match(doc: dict, flt: dict):
+    """支持相等、$gte、$lt及$in条件"""
+    for key, cond in flt.items():
+        value = doc.get(key)
+        if isinstance(cond, dict):
+            if "$gte" in cond and not value >= cond["$gte"]:
+                return False
+            if "$lt" in cond and not value < cond["$lt"]:
+                return False
+            if "$in" in cond and value not in cond["$in"]:
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+class FakeCursor(list):
+    def batch_size(self, n):
+        return self
+
+    def sort(self, key, direction):
+        return FakeCursor(sorted(self, key=lambda d: d[key], reverse=direction < 0))
+
+    def limit(self, n):
+        return FakeCursor(self[:n])
+
+
+class FakeDB:
+    """按数据库名保存账户数据，记录每次查询的条件"""
+
+    def __init__(self, data: dict):
+        self.data = data
+        self.selects = []
+
+    def on_select(self, db_data):
+        flt = db_data.raw_data["flt"]
+        self.selects.append((db_data.db_name, flt))
+        return FakeCursor(dict(d, _id=0) for d in self.data.get(db_data.db_name, []) if match(d, flt))
+
+
+def make_db():
+    orders = [order_doc(order_id=f"1577000000.{i:06d}", order_date=f"202001{i:02d}") for i in range(1, 21)]
+    records = [{"account_id": "token", "check_date": f"202001{i:02d}", "assets": float(i), "available": float(i), "market_value": 0.0} for i in range(1, 21)]
+    return FakeDB({SETTINGS["TRADE_DB"]: orders, SETTINGS["ACCOUNT_RECORD"]: records})
+
+
+def backtest_trader(db):
+    trader, _ = make_trader()
+    return Trader(FakeEventEngine(), trader.account.to_dict(), True, LoadDataMode.BACKTEST, db)
+
+
+def history_selects(db, db_name):
+    return [flt for name, flt in db.selects if name == db_name and "status" not in flt and flt]
+
+
+def test_history_loaded_by_range():
+    db = make_db()
+    trader = backtest_trader(db)
+    assert len(trader.orders) == 0
+
+    trader.ensure_history("20200115", ["orders"])
+    assert sorted(o.order_date for o in trader.orders.values())[0] == "20200115"
+    assert len(trader.orders) == 6
+    assert trader.history_pending
+
+    # 已加载的范围不再读取，更早的开始日期只读取缺少的区间
+    trader.ensure_history("20200118", ["orders"])
+    trader.ensure_history("20200110", ["orders"])
+    assert len(trader.orders) == 11
+    assert list(trader.orders)[0] == "1577000000.000010"
+    assert history_selects(db, SETTINGS["TRADE_DB"])[-2:] == [
+        {"order_date": {"$gte": "20200115"}},
+        {"order_date": {"$gte": "20200110", "$lt": "20200115"}},
+    ]
+
+    # 未加载账户记录
+    assert len(trader.account_record) == 0
+
+
+def test_full_history_loads_rest_once():
+    db = make_db()
+    trader = backtest_trader(db)
+
+    trader.ensure_history("20200111", ["account_record"])
+    assert len(trader.account_record) == 10
+
+    trader.ensure_history()
+    assert len(trader.orders) == 20
+    assert len(trader.account_record) == 20
+    assert trader.account_record.column("check_date").tolist()[0] == "20200101"
+    assert not trader.history_pending
+
+    count = len(db.selects)
+    trader.ensure_history("20200101")
+    assert len(db.selects) == count
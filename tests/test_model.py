@@ -0,0 +1,59 @@
+from paper_trading.utility.model import LogData, DBData, Order
+from paper_trading.trade.account import order_generate
+
+
+def order_doc(**kwargs):
+    doc = {
+        "code": "000001",
+        "exchange": "SZSE",
+        "account_id": "token",
+        "order_id": "1600000000.000001",
+        "order_type": "buy",
+        "price_type": "limit",
+        "trade_type": "t1",
+        "order_price": 10.0,
+        "trade_price": 10.0,
+        "volume": 100,
+        "traded": 100,
+        "status": "全部成交",
+        "order_date": "20200102",
+        "order_time": "09:30:00",
+        "error_msg": "",
+    }
+    doc.update(kwargs)
+    return doc
+
+
+def test_slotted_to_dict():
+    order = Order(code="000001", exchange="SZSE", account_id="token")
+
+    d = order.to_dict()
+    assert not hasattr(order, "__dict__")
+    assert d["pt_symbol"] == "000001.SZSE"
+    assert d["account_id"] == "token"
+
+
+def test_unslotted_to_dict():
+    log = LogData(log_content="msg")
+    assert log.to_dict()["log_content"] == "msg"
+    assert "log_time" in log.to_dict()
+
+    db_data = DBData(db_name="db", db_cl="cl", raw_data={})
+    assert db_data.to_dict() == {"db_name": "db", "db_cl": "cl", "raw_data": {}}
+
+
+def test_order_generate_legacy_values():
+    # 历史数据中的字段可能为None或非字符串
+    order = order_generate(order_doc(error_msg=None, trade_type=None, order_date=20200102))
+
+    assert order.error_msg is None
+    assert order.trade_type is None
+    assert order.order_date == 20200102
+
+
+def test_order_generate_shares_strings():
+    a = order_generate(order_doc(status="".join(["全部", "成交"])))
+    b = order_generate(order_doc(status="".join(["全部", "成交"])))
+
+    assert a.status is b.status
+    assert a.pt_symbol is b.pt_symbol
@@ -0,0 +1,91 @@
+from paper_trading.utility.model import Order
+from paper_trading.utility.constant import PriceType
+from paper_trading.trade.order_book import OrderBook
+
+
+def make_order(order_id, order_type, price, market=False, code="000001"):
+    price_type = PriceType.MARKET.value if market else PriceType.LIMIT.value
+    return Order(code=code, exchange="SZ", account_id="token", order_id=order_id, order_type=order_type, price_type=price_type, order_price=price, volume=100)
+
+
+def make_book(*orders):
+    book = OrderBook()
+    for order in orders:
+        book[order.order_id] = order
+    return book
+
+
+def ids(orders):
+    return [order.order_id for order in orders]
+
+
+def test_limit_orders_match_at_and_through_price():
+    book = make_book(
+        make_order("b1", "buy", 10.0),
+        make_order("b2", "buy", 10.5),
+        make_order("b3", "buy", 9.9),
+        make_order("s1", "sell", 9.8),
+        make_order("s2", "sell", 9.7),
+        make_order("s3", "sell", 9.9),
+    )
+
+    # 买单委托价不低于卖一价、卖单委托价不高于买一价时成交，按价格优先排序
+    buys, sells = book.match("000001.SZ", 10.0, 9.8)
+
+    assert ids(buys) == ["b2", "b1"]
+    assert ids(sells) == ["s2", "s1"]
+    assert sorted(ids(book.values())) == ["b3", "s3"]
+    assert "b1" not in book and "b3" in book
+
+
+def test_same_price_keeps_arrival_order():
+    book = make_book(make_order("b1", "buy", 10.0), make_order("b2", "buy", 10.0), make_order("b3", "buy", 10.0))
+
+    buys, _ = book.match("000001.SZ", 10.0, 0)
+
+    assert ids(buys) == ["b1", "b2", "b3"]
+
+
+def test_market_orders_match_first():
+    book = make_book(
+        make_order("b1", "buy", 11.0),
+        make_order("bm", "buy", 0, market=True),
+        make_order("s1", "sell", 9.0),
+        make_order("sm", "sell", 0, market=True),
+    )
+
+    buys, sells = book.match("000001.SZ", 10.0, 9.5)
+
+    assert ids(buys) == ["bm", "b1"]
+    assert ids(sells) == ["sm", "s1"]
+    assert not book
+    assert book.symbols() == []
+
+
+def test_cancel_removes_order():
+    book = make_book(make_order("b1", "buy", 10.0), make_order("b2", "buy", 10.0), make_order("s1", "sell", 10.0, code="000002"))
+
+    assert book.pop("b1").order_id == "b1"
+    assert book.pop("b1") is None
+    assert len(book) == 2
+
+    # 撤单后的订单不再参与撮合
+    buys, _ = book.match("000001.SZ", 10.0, 0)
+    assert ids(buys) == ["b2"]
+
+    # 证券的订单全部移除后不再保留该证券
+    del book["s1"]
+    assert book.symbols() == []
+
+
+def test_zero_quote_side_does_not_match():
+    book = make_book(make_order("b1", "buy", 10.0), make_order("bm", "buy", 0, market=True), make_order("s1", "sell", 9.0))
+
+    # 卖一价为0（涨停）时买单不成交，买一价为0（跌停）时卖单不成交
+    buys, sells = book.match("000001.SZ", 0, 0)
+    assert buys == [] and sells == []
+    assert len(book) == 3
+
+    buys, sells = book.match("000001.SZ", 0, 9.0)
+    assert buys == []
+    assert ids(sells) == ["s1"]
@@ -0,0 +1,66 @@
+from threading import Thread
+
+from paper_trading.trade import order_id as order_id_module
+from paper_trading.trade.order_id import OrderIdGenerator, order_id_to_us
+
+THREADS = 8
+IDS_PER_THREAD = 20000
+
+
+def generate_concurrently(generator: OrderIdGenerator):
+    """多个线程同时生成订单编号"""
+    results = [[] for _ in range(THREADS)]
+
+    def submitter(out: list):
+        for _ in range(IDS_PER_THREAD):
+            out.append(generator.next())
+
+    threads = [Thread(target=submitter, args=(out,)) for out in results]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    return [i for out in results for i in out]
+
+
+def test_concurrent_submitters_no_collision():
+    ids = generate_concurrently(OrderIdGenerator())
+
+    assert len(ids) == THREADS * IDS_PER_THREAD
+    assert len(set(ids)) == THREADS * IDS_PER_THREAD
+
+
+def test_no_collision_across_restart():
+    before = generate_concurrently(OrderIdGenerator())
+
+    # 重启后以已持久化的最大编号为起点
+    generator = OrderIdGenerator()
+    generator.seed(max(before, key=order_id_to_us))
+    after = generate_concurrently(generator)
+
+    ids = before + after
+    assert len(set(ids)) == len(ids)
+    assert min(order_id_to_us(i) for i in after) > max(order_id_to_us(i) for i in before)
+
+
+def test_no_collision_when_clock_goes_back(monkeypatch):
+    generator = OrderIdGenerator()
+    before = generate_concurrently(generator)
+
+    # 时钟回拨一小时，并且不再前进
+    frozen = order_id_to_us(max(before, key=order_id_to_us)) * 1000 - 3600 * 10 ** 9
+    monkeypatch.setattr(order_id_module, "time_ns", lambda: frozen)
+    after = generate_concurrently(generator)
+
+    ids = before + after
+    assert len(set(ids)) == len(ids)
+
+
+def test_ids_are_time_ordered():
+    generator = OrderIdGenerator()
+    ids = [generator.next() for _ in range(10000)]
+
+    us = [order_id_to_us(i) for i in ids]
+    assert us == sorted(us)
+    assert all(len(i.split(".")[1]) == 6 for i in ids)
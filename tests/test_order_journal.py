@@ -0,0 +1,58 @@
+from paper_trading.utility.model import Order
+from paper_trading.utility.constant import Status
+from paper_trading.trade.order_journal import OrderJournal
+from paper_trading.trade.record_store import INIT_CAPACITY
+
+
+def make_order(n, date, code="000001", status=Status.NOTTRADED.value):
+    return Order(
+        code=code, exchange="SZ", account_id="token", order_id=f"{n:04d}", order_type="buy", order_price=10.0, volume=100, order_date=date, status=status
+    )
+
+
+def test_grows_past_capacity():
+    journal = OrderJournal()
+    orders = [make_order(n, f"202001{n % 28 + 1:02d}") for n in range(INIT_CAPACITY * 3 + 1)]
+    journal.extend(orders)
+
+    assert len(journal) == len(orders)
+    total, order_ids = journal.query()
+    assert total == len(orders)
+    assert order_ids == [order.order_id for order in orders]
+
+
+def test_query_filters_and_pages():
+    journal = OrderJournal()
+    journal.extend(
+        [
+            make_order(1, "20200102"),
+            make_order(2, "20200103", code="000002"),
+            make_order(3, "20200104", status=Status.ALLTRADED.value),
+            make_order(4, "20200105"),
+        ]
+    )
+
+    assert journal.query(start="20200103", end="20200104") == (2, ["0002", "0003"])
+    assert journal.query(symbol="000001.SZ") == (3, ["0001", "0003", "0004"])
+    assert journal.query(symbol="000001.SZ", status=Status.NOTTRADED.value) == (2, ["0001", "0004"])
+    assert journal.query(symbol="600000.SH") == (0, [])
+    assert journal.query(status="unknown") == (0, [])
+
+    # 分页返回当前页，总数为筛选后的数量
+    assert journal.query(offset=1, limit=2) == (4, ["0002", "0003"])
+    assert journal.query(offset=3, limit=2) == (4, ["0004"])
+
+
+def test_record_updates_existing_order():
+    journal = OrderJournal()
+    order = make_order(1, "20200102")
+    journal.record(order)
+
+    order.status = Status.ALLTRADED.value
+    order.traded = 100
+    journal.record(order)
+
+    assert len(journal) == 1
+    assert journal.query(status=Status.NOTTRADED.value) == (0, [])
+    assert journal.query(status=Status.ALLTRADED.value) == (1, ["0001"])
+    assert journal.store.get(0, "traded") == 100
@@ -0,0 +1,158 @@
+from paper_trading.utility.event import EVENT_ACCOUNT_UPDATE, EVENT_POS_UPDATE, EVENT_ORDER_UPDATE, EVENT_POS_INSERT
+from paper_trading.utility.model import Order
+from paper_trading.utility.constant import LoadDataMode
+from paper_trading.trade.account import Trader
+from paper_trading.trade.ledger import to_fixed
+from paper_trading.trade.market import limit_up_price
+
+
+class FakeEventEngine:
+    """记录推送的事件"""
+
+    def __init__(self):
+        self.events = []
+
+    def put(self, event):
+        self.events.append(event)
+
+
+def make_trader():
+    account = {
+        "account_id": "token",
+        "assets": 1000000.0,
+        "available": 1000000.0,
+        "market_value": 0.0,
+        "capital": 1000000.0,
+        "cost": 0.0003,
+        "tax": 0.001,
+        "slippoint": 0.0,
+        "account_info": "",
+    }
+    engine = FakeEventEngine()
+    return Trader(engine, account, True, LoadDataMode.CREAT, None), engine
+
+
+def buy(trader, volume, price=10.0):
+    order = Order(code="000001", exchange="SZSE", account_id="token", order_type="buy", trade_type="t0", order_price=price, volume=volume)
+    result, order = trader.on_orders_arrived(order)
+    assert result, order
+    order.trade_price = price
+    order.traded = volume
+    return order
+
+
+def test_batch_events_coalesced():
+    trader, engine = make_trader()
+    orders = [buy(trader, 100), buy(trader, 200), buy(trader, 300)]
+    engine.events.clear()
+
+    assert trader.on_orders_deal(orders) == []
+
+    names = [e.type for e in engine.events]
+    # 账户及持仓更新只推送一次，每个订单各推送一次
+    assert names.count(EVENT_ACCOUNT_UPDATE) == 1
+    assert names.count(EVENT_POS_INSERT) == 1
+    assert names.count(EVENT_POS_UPDATE) == 1
+    assert names.count(EVENT_ORDER_UPDATE) == 3
+    assert names.index(EVENT_POS_INSERT) < names.index(EVENT_POS_UPDATE)
+
+    pos = [e.data for e in engine.events if e.type == EVENT_POS_UPDATE][0]
+    assert pos.volume == 600
+    assert pos is not trader.pos["000001.SZSE"]
+    account = [e.data for e in engine.events if e.type == EVENT_ACCOUNT_UPDATE][0]
+    assert account["avl"] == trader.account.available
+
+
+def test_batch_failed_order_does_not_stop_batch():
+    trader, engine = make_trader()
+    good = buy(trader, 100)
+    bad = Order(code="600000", exchange="SH", account_id="token", order_type="sell", order_price=10.0, volume=100, order_id="missing")
+    engine.events.clear()
+
+    failed = trader.on_orders_deal([bad, good])
+
+    assert [order for order, _ in failed] == [bad]
+    assert trader.pos["000001.SZSE"].volume == 100
+    assert EVENT_ORDER_UPDATE in [e.type for e in engine.events]
+
+
+def test_trader_owns_its_orders():
+    trader, engine = make_trader()
+    order = buy(trader, 100)
+
+    # 交易所撮合时修改的是自己持有的订单
+    assert trader.orders[order.order_id] is not order
+    assert trader.orders[order.order_id].traded == 0
+
+    trader.on_order_deal(order)
+    order.trade_price = 99.0
+    order.traded = 0
+
+    own = trader.orders[order.order_id]
+    assert own is not order
+    assert (own.trade_price, own.traded) == (10.0, 100)
+
+
+def test_market_buy_reserves_and_releases():
+    trader, _ = make_trader()
+    order = Order(code="000001", exchange="SZSE", account_id="token", order_type="buy", trade_type="t0", order_price=0, volume=1000)
+    result, order = trader.on_orders_arrived(order, reserve_price=11.0)
+    assert result
+    assert trader.ledger.frozen == trader.ledger.buy_need(1000, 11.0)
+
+    # 市价单按卖一价成交，释放全部冻结资金后扣除实际支付
+    order.order_price = order.trade_price = 10.0
+    order.traded = 1000
+    trader.on_order_deal(order)
+
+    assert trader.ledger.frozen == 0
+    assert trader.ledger.available == to_fixed(1000000.0) - trader.ledger.buy_need(1000, 10.0)
+    assert trader.ledger.frozen_orders == {}
+
+
+def test_buy_cancel_releases_reserved():
+    trader, _ = make_trader()
+    order = Order(code="000001", exchange="SZSE", account_id="token", order_type="buy", trade_type="t0", order_price=0, volume=1000)
+    _, order = trader.on_orders_arrived(order, reserve_price=11.0)
+
+    order.error_msg = ""
+    trader.on_order_cancel(order)
+
+    assert trader.ledger.frozen == 0
+    assert trader.ledger.available == to_fixed(1000000.0)
+
+
+def test_sell_validation_uses_frozen_shares():
+    trader, _ = make_trader()
+    trader.on_order_deal(buy(trader, 300))
+
+    def sell(volume):
+        order = Order(code="000001", exchange="SZSE", account_id="token", order_type="sell", trade_type="t0", order_price=10.0, volume=volume)
+        return trader.on_orders_arrived(order)
+
+    assert sell(200)[0]
+    assert trader.ledger.frozen_shares["000001.SZSE"] == 200
+
+    # 可用持仓与冻结股份不一致时，以冻结股份为准拒绝超卖
+    trader.pos["000001.SZSE"].available = 300
+    result, msg = sell(200)
+    assert not result
+    assert msg == "可用持仓不足"
+
+
+def test_limit_up_price():
+    assert limit_up_price("600000", 10.0) == 11.0
+    assert limit_up_price("300750", 10.0) == 12.0
+    assert limit_up_price("000001", 10.01) == 11.02
+
+
+def test_output_rounded_to_point():
+    trader, _ = make_trader()
+    trader.on_order_deal(buy(trader, 100, price=10.01))
+
+    # 账本保留0.0001元精度，对外输出按POINT设置取整
+    assert trader.ledger.available % 100 != 0
+    account = trader.account.to_dict()
+    for key in ("available", "assets", "market_value"):
+        assert account[key] == round(account[key], 2)
+    assert trader.pos["000001.SZSE"].profit == round(trader.pos["000001.SZSE"].profit, 2)
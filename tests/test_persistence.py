@@ -0,0 +1,85 @@
+from paper_trading.utility.model import DBData
+from paper_trading.trade.persistence import WriteBehindDB
+
+
+class FakeDB:
+    """记录每次bulk_write的写操作"""
+
+    def __init__(self):
+        self.writes = []
+
+    def on_bulk_write(self, db_data):
+        self.writes.extend(db_data.raw_data["data"])
+
+
+class Row:
+    def __init__(self, **data):
+        self.data = data
+
+    def to_dict(self):
+        return dict(self.data)
+
+
+def update(db, flt, values, db_cl="cl"):
+    db.on_update(DBData(db_name="db", db_cl=db_cl, raw_data={"flt": flt, "set": {"$set": values}}))
+
+
+def flushed(buffer):
+    buffer.flush()
+    return [(type(r).__name__, r._filter if hasattr(r, "_filter") else r._doc, getattr(r, "_doc", None)) for r in buffer.db.writes]
+
+
+def test_set_updates_on_same_key_merge():
+    buffer = WriteBehindDB(FakeDB())
+    update(buffer, {"order_id": "1"}, {"status": "未成交", "traded": 0})
+    update(buffer, {"order_id": "2"}, {"status": "未成交"})
+    update(buffer, {"order_id": "1"}, {"status": "全部成交", "traded": 100})
+
+    assert buffer.pending == 2
+    assert buffer.coalesced == 1
+    assert flushed(buffer) == [
+        ("UpdateOne", {"order_id": "1"}, {"$set": {"status": "全部成交", "traded": 100}}),
+        ("UpdateOne", {"order_id": "2"}, {"$set": {"status": "未成交"}}),
+    ]
+
+
+def test_insert_or_delete_breaks_coalescing():
+    buffer = WriteBehindDB(FakeDB())
+    update(buffer, {"pt_symbol": "000001.SZ"}, {"volume": 100})
+    buffer.on_insert(DBData(db_name="db", db_cl="cl", raw_data={"data": Row(pt_symbol="000002.SZ")}))
+    update(buffer, {"pt_symbol": "000001.SZ"}, {"volume": 200})
+    buffer.on_delete(DBData(db_name="db", db_cl="cl", raw_data={"flt": {"pt_symbol": "000001.SZ"}}))
+    update(buffer, {"pt_symbol": "000001.SZ"}, {"volume": 300})
+
+    # 插入及删除前后的更新分别写入，保持与插入、删除的先后顺序
+    kinds = [kind for kind, _, _ in flushed(buffer)]
+    assert kinds == ["UpdateOne", "InsertOne", "UpdateOne", "DeleteMany", "UpdateOne"]
+    assert buffer.coalesced == 0
+
+
+def test_filter_field_change_breaks_coalescing():
+    buffer = WriteBehindDB(FakeDB())
+
+    # 更新条件字段的更新之后不再合并，如清仓后is_clear不再为0
+    update(buffer, {"pt_symbol": "000001.SZ", "is_clear": 0}, {"sell_price": 10.0})
+    update(buffer, {"pt_symbol": "000001.SZ", "is_clear": 0}, {"is_clear": 1})
+    update(buffer, {"pt_symbol": "000001.SZ", "is_clear": 0}, {"sell_price": 11.0})
+
+    # 条件字段不同的更新不合并
+    update(buffer, {"pt_symbol": "000001.SZ"}, {"volume": 100})
+
+    assert buffer.coalesced == 1
+    assert [doc for _, _, doc in flushed(buffer)] == [
+        {"$set": {"sell_price": 10.0, "is_clear": 1}},
+        {"$set": {"sell_price": 11.0}},
+        {"$set": {"volume": 100}},
+    ]
+
+
+def test_collections_coalesce_separately():
+    buffer = WriteBehindDB(FakeDB())
+    update(buffer, {"order_id": "1"}, {"status": "未成交"}, db_cl="a")
+    update(buffer, {"order_id": "1"}, {"status": "全部成交"}, db_cl="b")
+
+    assert buffer.pending == 2
+    assert buffer.coalesced == 0
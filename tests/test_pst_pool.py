@@ -0,0 +1,139 @@
+from time import monotonic, sleep
+from threading import Event, Thread
+
+from paper_trading.utility.model import DBData
+from paper_trading.trade.pst_pool import PersistenceWorker, PersistencePool
+
+
+class FakeDB:
+    """记录bulk_write，fail大于0时写入失败并递减"""
+
+    def __init__(self, fail=0):
+        self.fail = fail
+        self.writes = []
+
+    def on_bulk_write(self, db_data):
+        if self.fail:
+            self.fail -= 1
+            raise ConnectionError("db down")
+        self.writes.append([r._filter for r in db_data.raw_data["data"]])
+
+
+def delete(data, db):
+    """持久化任务：按编号删除数据"""
+    db.on_delete(DBData(db_name="db", db_cl="cl", raw_data={"flt": {"n": data}}))
+
+
+def written(db):
+    return [flt["n"] for batch in db.writes for flt in batch]
+
+
+def test_batch_written_once():
+    db = FakeDB()
+    gate = Event()
+    worker = PersistenceWorker(0, db, 100, 100, 0, lambda msg: None)
+
+    # 工作线程阻塞时积压的任务在下一批中一次写入
+    worker.put(lambda data, db: gate.wait(), None)
+    for n in range(10):
+        worker.put(delete, n)
+    gate.set()
+    worker.flush().wait(5)
+    worker.close()
+
+    assert written(db) == list(range(10))
+    assert len(db.writes) <= 2
+
+
+def test_failed_write_retried(monkeypatch):
+    monkeypatch.setattr(PersistenceWorker, "RETRY_INTERVAL", 0.01)
+    db = FakeDB(fail=2)
+    errors = []
+    worker = PersistenceWorker(0, db, 100, 100, 0, errors.append)
+
+    worker.put(delete, 1)
+    worker.put(delete, 2)
+    deadline = monotonic() + 5
+    while (worker.processed < 2 or worker.buffer.pending) and monotonic() < deadline:
+        sleep(0.01)
+    worker.close()
+
+    # 写入失败的操作保留在缓冲区，重试成功后按原顺序写入
+    assert written(db) == [1, 2]
+    assert worker.errors == 2
+    assert all("持久化写入失败" in msg for msg in errors)
+
+
+def test_close_flushes_timed_writes():
+    db = FakeDB()
+    pool = PersistencePool(db, 2, 100, 100, interval=3600)
+
+    for n in range(6):
+        pool.put(f"token{n}", delete, n)
+    assert db.writes == []
+
+    # 定时持久化未到写入时间，关闭时强制写入
+    pool.close()
+    assert sorted(written(db)) == list(range(6))
+
+    # 关闭后提交的任务直接写入数据库
+    pool.put("token", lambda data, db: db.writes.append(["closed"]), None)
+    assert db.writes[-1] == ["closed"]
+
+
+def test_put_blocks_when_overflow_full():
+    db = FakeDB()
+    gate = Event()
+    errors = []
+    worker = PersistenceWorker(0, db, 1, 1, 0, errors.append, overflow_limit=2)
+
+    # 工作线程阻塞，队列及溢出列表占满后入队等待
+    worker.put(lambda data, db: gate.wait(), None)
+    deadline = monotonic() + 5
+    while not worker.queue.empty() and monotonic() < deadline:
+        sleep(0.01)
+    for n in range(3):
+        worker.put(delete, n)
+    assert len(worker.overflow) == 2
+
+    done = Event()
+    producer = Thread(target=lambda: (worker.put(delete, 3), done.set()))
+    producer.start()
+    assert not done.wait(0.1)
+    assert worker.blocked == 1
+
+    # 工作线程取回任务后入队继续，任务不丢弃且保持顺序
+    gate.set()
+    assert done.wait(5)
+    producer.join()
+    worker.close()
+    assert written(db) == [0, 1, 2, 3]
+
+
+def test_saturated_queue_spills_without_blocking():
+    db = FakeDB()
+    gate = Event()
+    errors = []
+    pool = PersistencePool(db, 1, 2, 10, on_error=errors.append)
+    worker = pool.workers[0]
+
+    # 数据库写入阻塞时，队列占满后任务进入溢出列表，入队立即返回
+    pool.put("token", lambda data, db: gate.wait(), None)
+    start = monotonic()
+    for n in range(20):
+        pool.put("token", delete, n)
+    assert monotonic() - start < 1
+
+    stats = pool.stats()
+    assert stats["overflow"] > 0
+    assert stats["spilled"] == stats["overflow"]
+    assert stats["blocked"] == 0
+    assert stats["queued"] == 2
+    assert any("溢出列表" in msg for msg in errors)
+
+    # 恢复后积压的任务按提交顺序全部写入
+    gate.set()
+    assert pool.flush(5)
+    assert written(db) == list(range(20))
+    assert not worker.overflow
+    pool.close()
@@ -0,0 +1,164 @@
+import asyncio
+import struct
+from threading import Thread
+
+import pytest
+
+from paper_trading.api.pytdx_async import TdxConnection, AsyncTdxQuoteClient
+
+
+def encode_price(value: int):
+    """按pytdx的get_price格式编码整数"""
+    sign = 0x40 if value < 0 else 0
+    value = abs(value)
+    first = (value & 0x3F) | sign
+    value >>= 6
+    out = bytearray([first | (0x80 if value else 0)])
+    while value:
+        b = value & 0x7F
+        value >>= 7
+        out.append(b | (0x80 if value else 0))
+    return bytes(out)
+
+
+def encode_quote(market: int, code: str, price: int):
+    """编码单个证券的行情，价格单位为分"""
+    buf = bytearray(struct.pack("<B6sH", market, code.encode(), 0))
+    # price, last_close, open, high, low, servertime, reversed_bytes1, vol, cur_vol
+    for v in (price, -10, 0, 5, -5, 14300000, -price, 1000, 10):
+        buf += encode_price(v)
+    buf += struct.pack("<I", 0)  # amount
+    # s_vol, b_vol, reversed_bytes2, reversed_bytes3, 五档买卖盘
+    for v in [500, 500, 0, 0] + [-1, 1, 100, 100] * 5:
+        buf += encode_price(v)
+    buf += struct.pack("<H", 0)
+    for v in (0, 0, 0, 0):
+        buf += encode_price(v)
+    buf += struct.pack("<hH", 0, 0)
+    return bytes(buf)
+
+
+class FakeTdxServer:
+    """
+    本地模拟的TDX行情服务器
+    初始化命令返回空数据，行情请求返回prices中的价格
+    """
+
+    def __init__(self, prices: dict):
+        self.prices = prices  # code: 价格（分）
+        self.connections = 0  # 累计连接数
+        self.quote_requests = 0  # 累计行情请求数
+        self.drop_quotes = 0  # 接下来需要直接断开的行情请求数
+        self.silent = False  # 是否不响应任何请求
+        self.loop = asyncio.new_event_loop()
+        self.port = None
+        self._server = None
+        self._thread = Thread(target=self.loop.run_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        self._server = asyncio.run_coroutine_threadsafe(asyncio.start_server(self._handle, "127.0.0.1", 0), self.loop).result()
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    def close(self):
+        async def _close():
+            self._server.close()
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(_close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readexactly(10)
+                (length,) = struct.unpack("<H", head[6:8])
+                body = await reader.readexactly(length)
+                if self.silent:
+                    continue
+
+                pkg = head + body
+                if struct.unpack("<I", pkg[2:6])[0] == 0x02006320:
+                    self.quote_requests += 1
+                    if self.drop_quotes:
+                        self.drop_quotes -= 1
+                        break
+                    writer.write(self._quotes(pkg))
+                else:
+                    writer.write(self._response(b"\x00"))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _quotes(self, pkg: bytes):
+        (num,) = struct.unpack("<H", pkg[20:22])
+        body = bytearray(b"\xb1\xcb" + struct.pack("<H", num))
+        for i in range(num):
+            market, code = struct.unpack("<B6s", pkg[22 + 7 * i : 29 + 7 * i])
+            body += encode_quote(market, code.decode(), self.prices[code.decode()])
+        return self._response(bytes(body))
+
+    @staticmethod
+    def _response(body: bytes):
+        return struct.pack("<IIIHH", 0, 0, 0, len(body), len(body)) + body
+
+
+@pytest.fixture
+def server():
+    server = FakeTdxServer({"000001": 1234, "600000": 1050}).start()
+    yield server
+    server.close()
+
+
+def test_connect_and_fetch(server):
+    client = AsyncTdxQuoteClient([("127.0.0.1", server.port)], connections=2, timeout=1).start()
+    try:
+        data = client.get_security_quotes([(0, "000001"), (1, "600000")])
+    finally:
+        client.close()
+
+    assert server.connections == 2
+    assert [(d["code"], d["price"], d["last_close"]) for d in data] == [("000001", 12.34, 12.24), ("600000", 10.5, 10.4)]
+
+
+def test_fetch_many_batches(server):
+    server.prices.update({f"{i:06d}": 1000 + i for i in range(200)})
+    stocks = [(0, f"{i:06d}") for i in range(200)]
+    client = AsyncTdxQuoteClient([("127.0.0.1", server.port)], connections=3, timeout=1).start()
+    try:
+        data = client.get_security_quotes(stocks)
+    finally:
+        client.close()
+
+    assert [d["code"] for d in data] == [code for _, code in stocks]
+    assert [d["price"] for d in data] == [(1000 + i) / 100 for i in range(200)]
+
+
+def test_reconnect_after_dropped_connection(server):
+    client = AsyncTdxQuoteClient([("127.0.0.1", server.port)], connections=1, timeout=1).start()
+    try:
+        server.drop_quotes = 1
+        data = client.get_security_quotes([(0, "000001")])
+    finally:
+        client.close()
+
+    # 第一次请求时服务器断开，补发请求重新连接后获取成功
+    assert server.connections == 2
+    assert server.quote_requests == 2
+    assert data[0]["price"] == 12.34
+
+
+def test_handshake_timeout_closes_connection(server):
+    server.silent = True
+    conn = TdxConnection("127.0.0.1", server.port, timeout=0.2)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(conn.connect())
+
+    assert conn.writer is None
+    assert conn.reader is None
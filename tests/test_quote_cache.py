@@ -0,0 +1,121 @@
+from threading import Thread, Event
+from datetime import datetime, timedelta
+
+import pytest
+
+import paper_trading.api.pytdx_api as pytdx_api
+from paper_trading.api.pytdx_api import QuoteCache, SecurityMaster
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(pytdx_api, "monotonic", clock)
+    return clock
+
+
+def test_hits_within_ttl(clock):
+    cache = QuoteCache(3)
+    fetch = lambda symbols: {s: s.lower() for s in symbols}
+
+    assert cache.get(["A", "B"], fetch) == {"A": "a", "B": "b"}
+    clock.now += 1
+    assert cache.get(["A"], lambda symbols: pytest.fail("应使用缓存")) == {"A": "a"}
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_idle_symbols_evicted(clock):
+    cache = QuoteCache(3, idle=30)
+    cache.get(["A", "B"], lambda symbols: {s: 1 for s in symbols})
+
+    clock.now += 20
+    cache.get(["A"], lambda symbols: {s: 2 for s in symbols})
+
+    # B超过闲置时间未被请求，A在20秒时刷新过
+    clock.now += 15
+    cache.get(["C"], lambda symbols: {s: 3 for s in symbols})
+    assert cache.stats()["evicted"] == 1
+    assert cache.stats()["size"] == 2
+
+
+def test_leader_error_propagates_to_waiters():
+    cache = QuoteCache(3)
+    started = Event()
+    release = Event()
+    errors = []
+
+    def failing_fetch(symbols):
+        started.set()
+        release.wait()
+        raise ValueError("股票数据获取失败")
+
+    def leader():
+        try:
+            cache.get(["A"], failing_fetch)
+        except ValueError as e:
+            errors.append(("leader", str(e)))
+
+    thread = Thread(target=leader)
+    thread.start()
+    started.wait()
+
+    def waiter():
+        try:
+            cache.get(["A"], lambda symbols: pytest.fail("应合并到正在进行的请求"))
+        except ValueError as e:
+            errors.append(("waiter", str(e)))
+
+    waiter_thread = Thread(target=waiter)
+    waiter_thread.start()
+    while cache.stats()["coalesced"] == 0:
+        pass
+    release.set()
+    thread.join()
+    waiter_thread.join()
+
+    assert sorted(errors) == [("leader", "股票数据获取失败"), ("waiter", "股票数据获取失败")]
+    assert cache.stats()["errors"] == 1
+
+    # 失败后下次请求重新获取
+    assert cache.get(["A"], lambda symbols: {"A": 1}) == {"A": 1}
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, flt=None, projection=None):
+        return iter(self.docs)
+
+    def find_one(self, flt=None):
+        return self.docs[0] if self.docs else None
+
+
+def security_client(securities, synced_at=None):
+    meta = [{"name": "security", "synced_at": synced_at}] if synced_at else []
+    return {"stocks": {"security": FakeCollection(securities), "meta": FakeCollection(meta)}}
+
+
+def test_security_master_freshness():
+    securities = [{"market": 0, "code": "000001", "decimal_point": 2}]
+    master = SecurityMaster()
+
+    # 证券列表为空或没有同步时间时不作为判断依据
+    master.load(security_client([], datetime.now()))
+    assert not master.is_fresh(4)
+    master.load(security_client(securities))
+    assert not master.is_fresh(4)
+
+    master.load(security_client(securities, datetime.now() - timedelta(days=1)))
+    assert master.is_fresh(4)
+    master.load(security_client(securities, datetime.now() - timedelta(days=5)))
+    assert not master.is_fresh(4)
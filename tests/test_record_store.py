@@ -0,0 +1,58 @@
+from paper_trading.trade.record_store import RecordStore
+from paper_trading.trade.account import ACCOUNT_RECORD_COLUMNS, POS_RECORD_COLUMNS
+
+
+def account_record(date, assets):
+    return {"account_id": "token", "check_date": date, "assets": assets, "available": assets, "market_value": 0.0}
+
+
+def test_append_grows_and_finds():
+    store = RecordStore(POS_RECORD_COLUMNS, capacity=2)
+    for i in range(10):
+        store.append({"pt_symbol": f"{i:06d}.SZSE", "max_vol": 100 * i, "is_clear": i % 2})
+
+    assert len(store) == 10
+    assert store.find(is_clear=0).tolist() == [0, 2, 4, 6, 8]
+    assert store.find(pt_symbol="000003.SZSE").tolist() == [3]
+
+
+def test_max_vol_is_integer():
+    store = RecordStore(POS_RECORD_COLUMNS)
+    row = store.append({"pt_symbol": "000001.SZSE", "max_vol": 2 ** 53 + 1})
+
+    assert store.get(row, "max_vol") == 2 ** 53 + 1
+    assert type(store.to_records()[0]["max_vol"]) is int
+
+
+def test_index_lookup_and_overwrite():
+    store = RecordStore(ACCOUNT_RECORD_COLUMNS, index="check_date")
+    store.extend([account_record("20200102", 1.0), account_record("20200103", 2.0)])
+
+    assert store.lookup("20200103") == 1
+    assert store.lookup("20200104") is None
+
+    # 同一日期再次写入时覆盖原有记录
+    assert store.append(account_record("20200102", 3.0)) == 0
+    assert len(store) == 2
+    assert store.get(0, "assets") == 3.0
+
+    df = store.to_frame()
+    assert df.loc["20200103", "assets"] == 2.0
+
+    store.clear()
+    assert store.lookup("20200102") is None
+
+
+def test_to_frame_round_trip():
+    store = RecordStore(ACCOUNT_RECORD_COLUMNS, capacity=2, index="check_date")
+    records = [account_record(f"202001{day:02d}", 1000.0 + day) for day in range(1, 8)]
+    store.extend(records)
+
+    # DataFrame转换回字典列表后重建，数据保持一致
+    df = store.to_frame()
+    assert list(df.index) == [r["check_date"] for r in records]
+    rebuilt = RecordStore(ACCOUNT_RECORD_COLUMNS, index="check_date")
+    rebuilt.extend(df.to_dict(orient="records"))
+
+    assert rebuilt.to_records() == store.to_records()
+    assert [{k: r[k] for k in records[0]} for r in store.to_records()] == records
@@ -0,0 +1,62 @@
+from datetime import datetime, date
+
+from paper_trading.trade.session import TradingSession, TradingCalendar, CHINA_A_SESSIONS
+
+
+class FakeCalendarCollection:
+    """按年份返回休市日期，并记录查询次数"""
+
+    def __init__(self, holidays: list):
+        self.holidays = holidays
+        self.queries = []
+
+    def find(self, flt, projection=None):
+        self.queries.append(flt["year"])
+        return [{"date": d} for d in self.holidays if int(d[:4]) == flt["year"] and flt["is_open"] == 0]
+
+
+def make_calendar(holidays: list, settings_holidays=None):
+    collection = FakeCalendarCollection(holidays)
+    calendar = TradingCalendar(settings_holidays)
+    calendar.bind({"stocks": {"calendar": collection}})
+    return calendar, collection
+
+
+def test_session_end_is_inclusive():
+    session = TradingSession(CHINA_A_SESSIONS)
+
+    assert session.is_open(datetime(2020, 3, 2, 9, 15))
+    assert session.is_open(datetime(2020, 3, 2, 11, 30))
+    assert session.is_open(datetime(2020, 3, 2, 11, 30, 0, 500000))
+    assert not session.is_open(datetime(2020, 3, 2, 11, 30, 1))
+    assert session.is_open(datetime(2020, 3, 2, 15, 0))
+    assert not session.is_closed(datetime(2020, 3, 2, 15, 0, 0, 999999))
+    assert session.is_closed(datetime(2020, 3, 2, 15, 0, 1))
+    assert session.next_boundary(datetime(2020, 3, 2, 12, 0)) == datetime(2020, 3, 2, 13, 0)
+
+
+def test_calendar_holidays_loaded_per_year():
+    calendar, collection = make_calendar(["20200101", "20200124", "20210101"], ["20201231"])
+
+    assert not calendar.is_trade_date(date(2020, 1, 24))
+    assert calendar.is_trade_date(date(2020, 1, 23))
+    assert not calendar.is_trade_date(date(2020, 12, 31))
+    assert not calendar.is_trade_date(date(2020, 2, 1))  # 周六
+    assert collection.queries == [2020]
+
+    assert not calendar.is_trade_date(date(2021, 1, 1))
+    assert collection.queries == [2020, 2021]
+
+    # 同步后清空缓存重新加载
+    collection.holidays.append("20200123")
+    calendar.clear()
+    assert not calendar.is_trade_date(date(2020, 1, 23))
+    assert collection.queries == [2020, 2021, 2020]
+
+
+def test_next_open_skips_holidays():
+    calendar, _ = make_calendar(["20200124", "20200127"])
+    session = TradingSession(CHINA_A_SESSIONS, calendar)
+
+    # 周四收盘后，周五及下周一休市
+    assert session.next_boundary(datetime(2020, 1, 23, 16, 0)) == datetime(2020, 1, 28, 9, 15)